@@ -6,7 +6,10 @@ import asyncio
 
 # Import models for autogenerate
 from app.database import Base
-from app.models import Organization, User, Pkcs11Key, SigningConfig, Project, AuditLog  # noqa: F401
+from app.models import Organization, OrganizationCounter, User, Pkcs11Key, SigningConfig, Project, AuditLog, AuditCheckpoint, AuditRollup  # noqa: F401
+from app.models.signing import SigningJob, SignatureRecord, SigningIdempotencyKey  # noqa: F401
+from app.models.key_pool import PooledKey  # noqa: F401
+from app.models.quorum import ApprovalRequest, ApprovalVote, QuorumPolicy, ApprovalOperation  # noqa: F401
 from app.config import get_settings
 
 settings = get_settings()
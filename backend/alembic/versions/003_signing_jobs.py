@@ -0,0 +1,44 @@
+"""Add signing job queue table
+
+Revision ID: 003_signing_jobs
+Revises: 002_quorum_tables
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '003_signing_jobs'
+down_revision = '002_quorum_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'signing_jobs',
+        sa.Column('id', sa.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('config_id', sa.dialects.postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('signing_configs.id'), nullable=False),
+        sa.Column('organization_id', sa.dialects.postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('organizations.id'), nullable=True),
+        sa.Column('digest', sa.String(128), nullable=False),
+        sa.Column('hash_algorithm', sa.String(50), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer, server_default='0'),
+        sa.Column('signature', sa.Text, nullable=True),
+        sa.Column('algorithm', sa.String(100), nullable=True),
+        sa.Column('key_fingerprint', sa.String(128), nullable=True),
+        sa.Column('error', sa.Text, nullable=True),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime, nullable=True),
+        sa.Column('completed_at', sa.DateTime, nullable=True)
+    )
+    
+    op.create_index('ix_signing_jobs_status_created', 'signing_jobs', ['status', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_signing_jobs_status_created')
+    op.drop_table('signing_jobs')
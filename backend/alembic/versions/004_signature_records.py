@@ -0,0 +1,50 @@
+"""Add content-addressed signature store and idempotency keys
+
+Revision ID: 004_signature_records
+Revises: 003_signing_jobs
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '004_signature_records'
+down_revision = '003_signing_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'signature_records',
+        sa.Column('id', sa.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('digest', sa.String(128), nullable=False),
+        sa.Column('hash_algorithm', sa.String(50), nullable=False),
+        sa.Column('config_id', sa.dialects.postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('signing_configs.id'), nullable=False),
+        sa.Column('key_id', sa.dialects.postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('pkcs11_keys.id'), nullable=False),
+        sa.Column('key_fingerprint', sa.String(128), nullable=False),
+        sa.Column('signature', sa.Text, nullable=False),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+        sa.UniqueConstraint('digest', 'hash_algorithm', 'config_id', 'key_fingerprint',
+                            name='uq_signature_records_address')
+    )
+    
+    op.create_table(
+        'signing_idempotency_keys',
+        sa.Column('id', sa.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('config_id', sa.dialects.postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('signing_configs.id'), nullable=False),
+        sa.Column('idempotency_key', sa.String(255), nullable=False),
+        sa.Column('digest', sa.String(128), nullable=False),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+        sa.UniqueConstraint('config_id', 'idempotency_key',
+                            name='uq_signing_idempotency_keys_config_key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('signing_idempotency_keys')
+    op.drop_table('signature_records')
@@ -0,0 +1,35 @@
+"""Add pre-generated key pool table
+
+Revision ID: 005_key_pool
+Revises: 004_signature_records
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '005_key_pool'
+down_revision = '004_signature_records'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'pooled_keys',
+        sa.Column('id', sa.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('family', sa.String(10), nullable=False),
+        sa.Column('key_size', sa.Integer, nullable=True),
+        sa.Column('curve', sa.String(50), nullable=True),
+        sa.Column('hsm_slot', sa.Integer, nullable=False),
+        sa.Column('fingerprint', sa.String(128), nullable=False),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now())
+    )
+    
+    op.create_index('ix_pooled_keys_spec', 'pooled_keys', ['family', 'key_size', 'curve', 'hsm_slot'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pooled_keys_spec')
+    op.drop_table('pooled_keys')
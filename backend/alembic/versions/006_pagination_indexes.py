@@ -0,0 +1,83 @@
+"""Add (created_at, id) indexes for keyset pagination, make created_at NOT NULL
+
+Revision ID: 006_pagination_indexes
+Revises: 005_key_pool
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '006_pagination_indexes'
+down_revision = '005_key_pool'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_organizations_created_id', 'organizations', ['created_at', 'id']),
+    ('ix_users_created_id', 'users', ['created_at', 'id']),
+    ('ix_users_org_created_id', 'users', ['organization_id', 'created_at', 'id']),
+    ('ix_pkcs11_keys_created_id', 'pkcs11_keys', ['created_at', 'id']),
+    ('ix_pkcs11_keys_org_created_id', 'pkcs11_keys', ['organization_id', 'created_at', 'id']),
+    ('ix_audit_logs_created_id', 'audit_logs', ['created_at', 'id']),
+    ('ix_audit_logs_user_created_id', 'audit_logs', ['user_id', 'created_at', 'id']),
+    ('ix_audit_logs_entity_created_id', 'audit_logs', ['entity_type', 'created_at', 'id']),
+    ('ix_approval_requests_created_id', 'approval_requests', ['created_at', 'id']),
+    ('ix_approval_requests_status_created_id', 'approval_requests', ['status', 'created_at', 'id']),
+    ('ix_approval_requests_org_created_id', 'approval_requests', ['organization_id', 'created_at', 'id']),
+]
+
+# Paginated tables: a row with a NULL created_at cannot be encoded in a
+# cursor, and the row comparison that starts each page never matches it
+PAGINATED = ['organizations', 'users', 'pkcs11_keys', 'audit_logs', 'approval_requests']
+
+# Rows per UPDATE while backfilling created_at
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    # Everything runs outside the migration's transaction so audit_logs stays
+    # writable: indexes build CONCURRENTLY, the backfill commits per batch,
+    # and NOT NULL is proven by a CHECK validated under a lock that lets
+    # writes through, so SET NOT NULL (PostgreSQL 12+) skips its own scan
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+        # Superseded by the composite indexes above
+        op.drop_index('ix_approval_requests_status', postgresql_concurrently=True)
+        op.drop_index('ix_approval_requests_org', postgresql_concurrently=True)
+
+        bind = op.get_bind()
+        for table in PAGINATED:
+            # Rows without a timestamp sort first, at the table's oldest created_at
+            oldest = bind.scalar(sa.text(f"SELECT coalesce(min(created_at), now()) FROM {table}"))
+            backfill = sa.text(
+                f"UPDATE {table} SET created_at = :oldest WHERE id IN "
+                f"(SELECT id FROM {table} WHERE created_at IS NULL LIMIT {BATCH_SIZE})"
+            )
+            updated = None
+            while updated != 0:
+                updated = bind.execute(backfill, {"oldest": oldest}).rowcount
+
+            op.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_created_at_not_null "
+                f"CHECK (created_at IS NOT NULL) NOT VALID"
+            )
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_created_at_not_null")
+            op.alter_column(table, 'created_at', existing_type=sa.DateTime, nullable=False)
+            op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_created_at_not_null")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_approval_requests_org', 'approval_requests', ['organization_id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_approval_requests_status', 'approval_requests', ['status'],
+                        postgresql_concurrently=True)
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, postgresql_concurrently=True)
+
+    for table in PAGINATED:
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime, nullable=True)
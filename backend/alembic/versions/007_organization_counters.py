@@ -0,0 +1,80 @@
+"""Add trigger-maintained organization counters
+
+Revision ID: 007_organization_counters
+Revises: 006_pagination_indexes
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '007_organization_counters'
+down_revision = '006_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+# One function serves both tables; an UPDATE that moves a row to another
+# organization decrements the old one and increments the new one
+COUNTER_FUNCTION = """
+CREATE OR REPLACE FUNCTION organization_counters_apply() RETURNS trigger AS $$
+DECLARE
+    users_delta integer := CASE WHEN TG_TABLE_NAME = 'users' THEN 1 ELSE 0 END;
+    keys_delta integer := 1 - users_delta;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.organization_id IS NOT NULL THEN
+        UPDATE organization_counters
+        SET users_count = users_count - users_delta,
+            keys_count = keys_count - keys_delta
+        WHERE organization_id = OLD.organization_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.organization_id IS NOT NULL THEN
+        INSERT INTO organization_counters (organization_id, users_count, keys_count)
+        VALUES (NEW.organization_id, users_delta, keys_delta)
+        ON CONFLICT (organization_id) DO UPDATE
+        SET users_count = organization_counters.users_count + users_delta,
+            keys_count = organization_counters.keys_count + keys_delta;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'organization_counters',
+        sa.Column('organization_id', sa.dialects.postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('organizations.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('users_count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('keys_count', sa.Integer, nullable=False, server_default='0')
+    )
+    
+    op.execute(COUNTER_FUNCTION)
+    for table in ('users', 'pkcs11_keys'):
+        op.execute(
+            f"CREATE TRIGGER {table}_organization_counters "
+            f"AFTER INSERT OR DELETE OR UPDATE OF organization_id ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION organization_counters_apply()"
+        )
+    
+    # Backfill after the triggers exist; a row inserted in between is counted
+    # by its trigger and then overwritten with the exact count here
+    op.execute("""
+        INSERT INTO organization_counters (organization_id, users_count, keys_count)
+        SELECT o.id,
+               (SELECT count(*) FROM users u WHERE u.organization_id = o.id),
+               (SELECT count(*) FROM pkcs11_keys k WHERE k.organization_id = o.id)
+        FROM organizations o
+        ON CONFLICT (organization_id) DO UPDATE
+        SET users_count = EXCLUDED.users_count,
+            keys_count = EXCLUDED.keys_count
+    """)
+
+
+def downgrade() -> None:
+    for table in ('users', 'pkcs11_keys'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_organization_counters ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS organization_counters_apply()")
+    op.drop_table('organization_counters')
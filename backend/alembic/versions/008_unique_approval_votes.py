@@ -0,0 +1,38 @@
+"""Allow one vote per user per approval request
+
+Revision ID: 008_unique_approval_votes
+Revises: 007_organization_counters
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+
+# revision identifiers
+revision = '008_unique_approval_votes'
+down_revision = '007_organization_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Drop duplicate votes left by the old check-then-insert race, keeping
+    # each user's first vote. Request counts are left as they were.
+    op.execute("""
+        DELETE FROM approval_votes v
+        USING approval_votes earlier
+        WHERE v.request_id = earlier.request_id
+          AND v.user_id = earlier.user_id
+          AND (COALESCE(v.created_at, 'epoch'), v.id)
+              > (COALESCE(earlier.created_at, 'epoch'), earlier.id)
+    """)
+    
+    op.create_unique_constraint(
+        'uq_approval_votes_request_user', 'approval_votes', ['request_id', 'user_id']
+    )
+    # The unique index leads with request_id and covers lookups by request
+    op.drop_index('ix_approval_votes_request')
+
+
+def downgrade() -> None:
+    op.create_index('ix_approval_votes_request', 'approval_votes', ['request_id'])
+    op.drop_constraint('uq_approval_votes_request_user', 'approval_votes', type_='unique')
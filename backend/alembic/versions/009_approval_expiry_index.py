@@ -0,0 +1,25 @@
+"""Add (status, expires_at) index for the approval expiry sweep
+
+Revision ID: 009_approval_expiry_index
+Revises: 008_unique_approval_votes
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+
+# revision identifiers
+revision = '009_approval_expiry_index'
+down_revision = '008_unique_approval_votes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_approval_requests_status_expires', 'approval_requests',
+                        ['status', 'expires_at'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_approval_requests_status_expires', postgresql_concurrently=True)
@@ -0,0 +1,39 @@
+"""Add approved-operation outbox
+
+Revision ID: 010_approval_operations
+Revises: 009_approval_expiry_index
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '010_approval_operations'
+down_revision = '009_approval_expiry_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'approval_operations',
+        sa.Column('request_id', sa.dialects.postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('approval_requests.id'), primary_key=True),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('available_at', sa.DateTime, nullable=False, server_default=sa.func.now()),
+        sa.Column('error', sa.Text, nullable=True),
+        sa.Column('result', sa.Text, nullable=True),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime, nullable=True),
+        sa.Column('completed_at', sa.DateTime, nullable=True)
+    )
+    
+    op.create_index('ix_approval_operations_status_available', 'approval_operations',
+                    ['status', 'available_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_approval_operations_status_available')
+    op.drop_table('approval_operations')
@@ -0,0 +1,27 @@
+"""Add organization_id to audit_logs
+
+Revision ID: 011_audit_organization
+Revises: 010_approval_operations
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '011_audit_organization'
+down_revision = '010_approval_operations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable and without a default, so this is a catalog-only change
+    op.add_column(
+        'audit_logs',
+        sa.Column('organization_id', sa.dialects.postgresql.UUID(as_uuid=True), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('audit_logs', 'organization_id')
@@ -0,0 +1,49 @@
+"""Hash-chain audit_logs and add signed audit checkpoints
+
+Revision ID: 012_audit_hash_chain
+Revises: 011_audit_organization
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '012_audit_hash_chain'
+down_revision = '011_audit_organization'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing entries stay unchained (NULL); the chain starts with the
+    # first entry written after this migration
+    op.add_column('audit_logs', sa.Column('sequence', sa.BigInteger(), nullable=True))
+    op.add_column('audit_logs', sa.Column('prev_hash', sa.String(64), nullable=True))
+    op.add_column('audit_logs', sa.Column('entry_hash', sa.String(64), nullable=True))
+
+    op.create_table(
+        'audit_checkpoints',
+        sa.Column('id', sa.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('sequence', sa.BigInteger(), nullable=False, unique=True),
+        sa.Column('entry_hash', sa.String(64), nullable=False),
+        sa.Column('algorithm', sa.String(50), nullable=False),
+        sa.Column('key_id', sa.dialects.postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('pkcs11_keys.id'), nullable=True),
+        sa.Column('signature', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('verified_at', sa.DateTime(), nullable=True),
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_audit_logs_sequence', 'audit_logs', ['sequence'],
+                        unique=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_audit_logs_sequence', postgresql_concurrently=True)
+    op.drop_table('audit_checkpoints')
+    op.drop_column('audit_logs', 'entry_hash')
+    op.drop_column('audit_logs', 'prev_hash')
+    op.drop_column('audit_logs', 'sequence')
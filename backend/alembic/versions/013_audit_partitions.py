@@ -0,0 +1,114 @@
+"""Partition audit_logs by month on created_at
+
+Revision ID: 013_audit_partitions
+Revises: 012_audit_hash_chain
+Create Date: 2026-10-16
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '013_audit_partitions'
+down_revision = '012_audit_hash_chain'
+branch_labels = None
+depends_on = None
+
+# Monthly partitions created ahead of time; core/audit_partitions.py keeps
+# creating them at runtime
+MONTHS_AHEAD = 3
+
+INDEXES = (
+    ('ix_audit_logs_created_id', 'created_at, id'),
+    ('ix_audit_logs_user_created_id', 'user_id, created_at, id'),
+    ('ix_audit_logs_entity_created_id', 'entity_type, created_at, id'),
+    ('ix_audit_logs_sequence', 'sequence'),
+)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    now = datetime.utcnow()
+    boundary = _add_months(datetime(now.year, now.month, 1), 1)
+
+    # The existing table becomes the partition for everything before next
+    # month, so no rows are copied. Everything that scans it runs first,
+    # outside the migration's transaction, so audit_logs stays writable: the
+    # CHECK constraint that proves its bound (ATTACH then skips its own
+    # scan), and CONCURRENTLY built indexes matching the parent's new
+    # primary key and its non-unique sequence index, which ATTACH adopts
+    # instead of building them under lock. created_at is NOT NULL since 006.
+    with op.get_context().autocommit_block():
+        op.execute(
+            f"ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_legacy_bound "
+            f"CHECK (created_at < '{boundary:%Y-%m-%d}') NOT VALID"
+        )
+        op.execute("ALTER TABLE audit_logs VALIDATE CONSTRAINT audit_logs_legacy_bound")
+        op.create_index('audit_logs_legacy_id_created', 'audit_logs', ['id', 'created_at'],
+                        unique=True, postgresql_concurrently=True)
+        op.create_index('audit_logs_legacy_sequence', 'audit_logs', ['sequence'],
+                        postgresql_concurrently=True)
+
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_legacy")
+    op.execute("ALTER INDEX audit_logs_pkey RENAME TO audit_logs_legacy_pkey")
+    for name, _ in INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_legacy")
+
+    op.execute(
+        "CREATE TABLE audit_logs (LIKE audit_logs_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE audit_logs ADD PRIMARY KEY (id, created_at)")
+    op.execute("ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_user_id_fkey "
+               "FOREIGN KEY (user_id) REFERENCES users (id)")
+    for name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON audit_logs ({columns})")
+
+    op.execute(
+        f"ALTER TABLE audit_logs ATTACH PARTITION audit_logs_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{boundary:%Y-%m-%d}')"
+    )
+    op.execute("ALTER TABLE audit_logs_legacy DROP CONSTRAINT audit_logs_legacy_bound")
+    # Unique, so the parent adopted audit_logs_legacy_sequence instead
+    op.execute("DROP INDEX ix_audit_logs_sequence_legacy")
+
+    for i in range(MONTHS_AHEAD + 1):
+        start, end = _add_months(boundary, i), _add_months(boundary, i + 1)
+        op.execute(
+            f"CREATE TABLE audit_logs_y{start:%Y}m{start:%m} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+
+    # Partitions detached past retention and not archived yet, see
+    # core/audit_partitions.py
+    op.create_table(
+        'audit_detached_partitions',
+        sa.Column('name', sa.String(63), primary_key=True),
+        sa.Column('last_sequence', sa.BigInteger(), nullable=True),
+        sa.Column('detached_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('audit_detached_partitions')
+    # Copies every row back into a plain table
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_partitioned")
+    op.execute("ALTER INDEX audit_logs_pkey RENAME TO audit_logs_partitioned_pkey")
+    for name, _ in INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_partitioned")
+    op.execute("CREATE TABLE audit_logs (LIKE audit_logs_partitioned INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO audit_logs SELECT * FROM audit_logs_partitioned")
+    op.execute("DROP TABLE audit_logs_partitioned")
+    op.execute("ALTER TABLE audit_logs ADD PRIMARY KEY (id)")
+    op.execute("ALTER TABLE audit_logs ALTER COLUMN created_at DROP NOT NULL")
+    op.execute("ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_user_id_fkey "
+               "FOREIGN KEY (user_id) REFERENCES users (id)")
+    for name, columns in INDEXES:
+        unique = "UNIQUE " if name == 'ix_audit_logs_sequence' else ""
+        op.execute(f"CREATE {unique}INDEX {name} ON audit_logs ({columns})")
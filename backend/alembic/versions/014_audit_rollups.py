@@ -0,0 +1,43 @@
+"""Add audit_rollups activity counters
+
+Revision ID: 014_audit_rollups
+Revises: 013_audit_partitions
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '014_audit_rollups'
+down_revision = '013_audit_partitions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'audit_rollups',
+        sa.Column('organization_id', sa.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('granularity', sa.String(10), primary_key=True),
+        sa.Column('bucket', sa.DateTime(), primary_key=True),
+        sa.Column('action', sa.String(100), primary_key=True),
+        sa.Column('count', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_audit_rollups_granularity_bucket', 'audit_rollups', ['granularity', 'bucket'])
+
+    # Backfill from the existing log; the audit pipeline keeps it current
+    # from here on
+    for granularity in ('hour', 'day'):
+        op.execute(f"""
+            INSERT INTO audit_rollups (organization_id, granularity, bucket, action, count)
+            SELECT COALESCE(organization_id, '00000000-0000-0000-0000-000000000000'),
+                   '{granularity}', date_trunc('{granularity}', created_at), action, count(*)
+            FROM audit_logs
+            GROUP BY 1, 3, 4
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audit_rollups_granularity_bucket', table_name='audit_rollups')
+    op.drop_table('audit_rollups')
@@ -1,35 +1,214 @@
 """
 KT Secure - Audit API
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Select, literal, select, tuple_
 from uuid import UUID
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+import csv
+import io
+import json
+import zlib
 
-from ..database import get_db
+from ..config import get_settings
+from ..database import get_db, AsyncSessionLocal
+from ..core.audit_rollups import (
+    DEFAULT_WINDOWS, GRANULARITIES, activity_series, totals_by_action, weekly_heatmap
+)
 from ..models import AuditLog
-from ..schemas import AuditLogResponse
+from ..schemas import AuditLogResponse, AuditStatsPoint, AuditStatsResponse
+from ..utils.pagination import fetch_page
 
 router = APIRouter()
+settings = get_settings()
+
+EXPORT_COLUMNS = [column.name for column in AuditLog.__table__.columns]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _filtered(
+    query: Select,
+    user_id: Optional[UUID] = None,
+    entity_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    entity_id: Optional[UUID] = None,
+    action: Optional[str] = None
+) -> Select:
+    if user_id:
+        query = query.where(AuditLog.user_id == user_id)
+    if entity_type:
+        query = query.where(AuditLog.entity_type == entity_type)
+    if entity_id:
+        query = query.where(AuditLog.entity_id == entity_id)
+    if action:
+        query = query.where(AuditLog.action == action)
+    if since:
+        query = query.where(AuditLog.created_at >= since)
+    if until:
+        query = query.where(AuditLog.created_at < until)
+    return query
 
 
 @router.get("/", response_model=List[AuditLogResponse])
 async def list_audit_logs(
+    response: Response,
     user_id: Optional[UUID] = None,
     entity_type: Optional[str] = None,
-    skip: int = 0,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     limit: int = 100,
+    skip: int = 0,
     db: AsyncSession = Depends(get_db)
 ):
-    """List audit logs with optional filters"""
-    query = select(AuditLog).order_by(AuditLog.created_at.desc())
+    """
+    List audit logs with optional filters, newest first.
+    `since`/`until` bound created_at, which limits the scan to the monthly
+    partitions in range. Pass the X-Next-Cursor response header as `cursor`
+    for the next page.
+    """
+    query = _filtered(select(AuditLog), user_id, entity_type, since, until)
     
-    if user_id:
-        query = query.where(AuditLog.user_id == user_id)
-    if entity_type:
-        query = query.where(AuditLog.entity_type == entity_type)
+    return await fetch_page(db, query, AuditLog, response, cursor, limit, descending=True, skip=skip)
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _csv_value(value):
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True)
+    return _json_value(value) if value is not None else ""
+
+
+async def _export_chunks(query: Select, format: str, chunk_size: int) -> AsyncIterator[str]:
+    """
+    Rows of `query` in (created_at, id) order, encoded `chunk_size` at a
+    time. Each chunk is a keyset query in its own short-lived session, so
+    no transaction (or snapshot holding back vacuum) spans the export.
+    """
+    columns = [AuditLog.__table__.c[name] for name in EXPORT_COLUMNS]
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+    
+    position = None
+    while True:
+        chunk_query = query.with_only_columns(*columns).order_by(AuditLog.created_at, AuditLog.id)
+        if position:
+            chunk_query = chunk_query.where(tuple_(AuditLog.created_at, AuditLog.id) > tuple_(
+                literal(position[0], AuditLog.created_at.type), literal(position[1], AuditLog.id.type)
+            ))
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(chunk_query.limit(chunk_size))
+            rows = result.all()
+        if not rows:
+            return
+        
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_value) + "\n" for row in rows
+            )
+        if len(rows) < chunk_size:
+            return
+        position = (rows[-1].created_at, rows[-1].id)
+
+
+async def _gzipped(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def _encoded(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        yield chunk.encode()
+
+
+@router.get("/export")
+async def export_audit_logs(
+    format: str = "ndjson",
+    compress: bool = False,
+    user_id: Optional[UUID] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[UUID] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    Stream matching audit logs, oldest first, as NDJSON or CSV (`format`),
+    gzipped when `compress` is set. Memory use is bounded by one chunk of
+    rows however large the export. `until` defaults to the time of the
+    request, so entries written while the export runs are left out.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Format must be 'ndjson' or 'csv'")
+    
+    started = datetime.utcnow()
+    query = _filtered(select(AuditLog), user_id, entity_type, since, until or started, entity_id, action)
+    chunks = _export_chunks(query, format, settings.AUDIT_EXPORT_CHUNK_SIZE)
+    
+    filename = f"audit-{started:%Y%m%dT%H%M%S}.{format}"
+    if compress:
+        body, media_type, filename = _gzipped(chunks), "application/gzip", filename + ".gz"
+    else:
+        body, media_type = _encoded(chunks), EXPORT_MEDIA_TYPES[format]
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/stats", response_model=AuditStatsResponse)
+async def audit_stats(
+    granularity: str = "day",
+    organization_id: Optional[UUID] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Activity time series per action from the audit rollups, in hour or day
+    buckets; hourly queries also return a weekday x hour heatmap. Reads
+    one row per (bucket, action), never the raw log. Defaults to the last
+    7 days (hour) or 30 days (day).
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Granularity must be 'hour' or 'day'")
+    
+    until = until or datetime.utcnow()
+    since = since or until - DEFAULT_WINDOWS[granularity]
+    if until - since > timedelta(days=366):
+        raise HTTPException(status_code=400, detail="Stats range is limited to one year")
+    
+    series = await activity_series(db, granularity, since, until, organization_id, action)
+    by_action = totals_by_action(series)
     
-    query = query.offset(skip).limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    return AuditStatsResponse(
+        granularity=granularity,
+        since=since,
+        until=until,
+        total=sum(by_action.values()),
+        by_action=by_action,
+        series=[AuditStatsPoint(bucket=bucket, action=name, count=count) for bucket, name, count in series],
+        heatmap=weekly_heatmap(series) if granularity == "hour" else None
+    )
@@ -3,15 +3,13 @@ KT Secure - Certificate Authority Integration API
 EJBCA/MSCA integration for certificate issuance
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-import json
 
-from ..database import get_db
-from ..models import User, AuditLog
+from ..core.audit import audit
+from ..models import User
 from .auth import get_current_active_user
 
 router = APIRouter()
@@ -189,7 +187,6 @@ async def get_certificate_profile(
 @router.post("/certificates/request", response_model=Certificate)
 async def request_certificate(
     request: CertificateRequest,
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
     """
@@ -230,23 +227,19 @@ async def request_certificate(
     # Store certificate
     issued_certificates[cert_id] = certificate.model_dump()
     
-    # Create audit log
-    audit_log = AuditLog(
-        action="certificate_issued",
+    await audit.record(
+        "certificate_issued",
         entity_type="certificate",
-        entity_id=None,
-        entity_name=request.common_name,
         user_id=current_user.id,
-        user_name=current_user.name,
-        changes=json.dumps({
+        organization_id=current_user.organization_id,
+        changes={
             "certificate_id": cert_id,
+            "common_name": request.common_name,
             "serial_number": serial,
             "profile": profile.name,
             "validity_days": profile.validity_days
-        })
+        }
     )
-    db.add(audit_log)
-    await db.commit()
     
     return certificate
 
@@ -283,7 +276,6 @@ async def get_certificate(
 async def revoke_certificate(
     cert_id: str,
     reason: str = "unspecified",
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
     """Revoke a certificate."""
@@ -296,21 +288,17 @@ async def revoke_certificate(
     
     cert["status"] = "revoked"
     
-    # Create audit log
-    audit_log = AuditLog(
-        action="certificate_revoked",
+    await audit.record(
+        "certificate_revoked",
         entity_type="certificate",
-        entity_id=None,
-        entity_name=cert["common_name"],
         user_id=current_user.id,
-        user_name=current_user.name,
-        changes=json.dumps({
+        organization_id=current_user.organization_id,
+        changes={
             "certificate_id": cert_id,
+            "common_name": cert["common_name"],
             "reason": reason
-        })
+        }
     )
-    db.add(audit_log)
-    await db.commit()
     
     return {"status": "revoked", "message": "Certificate has been revoked"}
 
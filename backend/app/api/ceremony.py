@@ -9,10 +9,11 @@ from uuid import UUID
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
-import json
 
+from ..core.audit import audit
+from ..core.signer import SignerError, get_signer, key_params
 from ..database import get_db
-from ..models import User, Organization, AuditLog
+from ..models import User, Organization, Pkcs11Key
 from .auth import get_current_active_user
 
 router = APIRouter()
@@ -43,6 +44,7 @@ class CeremonyStatus(BaseModel):
     key_name: str
     algorithm: str
     purpose: str
+    organization_id: UUID
     status: str  # pending_witnesses, ready, generating, completed, failed
     witnesses: List[WitnessInfo]
     created_by: str
@@ -108,6 +110,7 @@ async def create_ceremony(
         key_name=data.key_name,
         algorithm=data.algorithm,
         purpose=data.purpose,
+        organization_id=data.organization_id,
         status="pending_witnesses",
         witnesses=witnesses,
         created_by=current_user.name,
@@ -117,23 +120,19 @@ async def create_ceremony(
     # Store in memory (use Redis/DB in production)
     active_ceremonies[ceremony_id] = ceremony.model_dump()
     
-    # Create audit log
-    audit_log = AuditLog(
-        action="ceremony_initiated",
+    await audit.record(
+        "ceremony_initiated",
         entity_type="key_ceremony",
-        entity_id=None,
-        entity_name=data.key_name,
         user_id=current_user.id,
-        user_name=current_user.name,
-        changes=json.dumps({
+        organization_id=data.organization_id,
+        changes={
             "ceremony_id": ceremony_id,
+            "key_name": data.key_name,
             "algorithm": data.algorithm,
             "purpose": data.purpose,
             "witnesses": [str(w) for w in data.witness_ids]
-        })
+        }
     )
-    db.add(audit_log)
-    await db.commit()
     
     return ceremony
 
@@ -164,7 +163,6 @@ async def get_ceremony(
 @router.post("/ceremonies/{ceremony_id}/approve")
 async def approve_ceremony(
     ceremony_id: str,
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -194,18 +192,13 @@ async def approve_ceremony(
     if all_approved:
         ceremony["status"] = "ready"
     
-    # Create audit log
-    audit_log = AuditLog(
-        action="ceremony_witness_approved",
+    await audit.record(
+        "ceremony_witness_approved",
         entity_type="key_ceremony",
-        entity_id=None,
-        entity_name=ceremony["key_name"],
         user_id=current_user.id,
-        user_name=current_user.name,
-        changes=json.dumps({"ceremony_id": ceremony_id})
+        organization_id=ceremony["organization_id"],
+        changes={"ceremony_id": ceremony_id, "key_name": ceremony["key_name"]}
     )
-    db.add(audit_log)
-    await db.commit()
     
     return {"status": ceremony["status"], "message": "Approval recorded"}
 
@@ -231,36 +224,56 @@ async def generate_key(
         )
     
     ceremony["status"] = "generating"
+    try:
+        # Always fresh key material, generated in front of the witnesses; a
+        # ceremony never takes a key from the pre-generated key pool
+        org_result = await db.execute(
+            select(Organization).where(Organization.id == ceremony["organization_id"])
+        )
+        org = org_result.scalar_one_or_none()
+        hsm_slot = org.hsm_slot if org and org.hsm_slot is not None else 0
+        try:
+            family, key_size, curve = key_params(ceremony["algorithm"])
+            key_fingerprint = await get_signer().generate_key(family, key_size, curve, hsm_slot)
+        except SignerError as e:
+            raise HTTPException(status_code=400, detail=f"Key generation failed: {e}")
+        
+        key = Pkcs11Key(
+            name=ceremony["key_name"],
+            algorithm="RSA" if family == "RSA" else "ECDSA",
+            key_size=key_size,
+            curve=curve,
+            fingerprint=key_fingerprint,
+            hsm_slot=hsm_slot,
+            organization_id=ceremony["organization_id"]
+        )
+        db.add(key)
+        await db.flush()
+        await db.commit()
+        key_id = str(key.id)
+        
+        ceremony["status"] = "completed"
+        ceremony["completed_at"] = datetime.utcnow().isoformat()
+        ceremony["key_id"] = key_id
+        ceremony["key_fingerprint"] = key_fingerprint
+    finally:
+        # Any failure (signer, database, cancellation) hands the ceremony
+        # back to the witnesses' approved state so generation can be retried
+        if ceremony["status"] == "generating":
+            ceremony["status"] = "ready"
     
-    # Simulate HSM key generation
-    import hashlib
-    import secrets
-    
-    # Generate mock key data
-    key_id = f"key-{secrets.token_hex(8)}"
-    key_fingerprint = hashlib.sha256(secrets.token_bytes(32)).hexdigest()[:40]
-    
-    ceremony["status"] = "completed"
-    ceremony["completed_at"] = datetime.utcnow().isoformat()
-    ceremony["key_id"] = key_id
-    ceremony["key_fingerprint"] = key_fingerprint
-    
-    # Create audit log
-    audit_log = AuditLog(
-        action="ceremony_key_generated",
-        entity_type="key_ceremony",
-        entity_id=None,
-        entity_name=ceremony["key_name"],
+    await audit.record(
+        "ceremony_key_generated",
+        entity_type="key",
+        entity_id=key.id,
         user_id=current_user.id,
-        user_name=current_user.name,
-        changes=json.dumps({
+        organization_id=key.organization_id,
+        changes={
             "ceremony_id": ceremony_id,
-            "key_id": key_id,
+            "key_name": ceremony["key_name"],
             "key_fingerprint": key_fingerprint
-        })
+        }
     )
-    db.add(audit_log)
-    await db.commit()
     
     return {
         "status": "completed",
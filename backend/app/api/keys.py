@@ -1,46 +1,68 @@
 """
 KT Secure - Keys API
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from uuid import UUID
-from typing import List
-import hashlib
-import secrets
+from typing import List, Optional
 
+from ..core.audit import audit
+from ..core.key_pool import key_pool, key_spec
+from ..core.signer import SignerError, get_signer
+from ..core.signing_cache import signing_targets
 from ..database import get_db
 from ..models import Pkcs11Key
 from ..schemas import KeyCreate, KeyResponse
+from ..utils.pagination import fetch_page
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[KeyResponse])
 async def list_keys(
+    response: Response,
     organization_id: UUID = None,
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
+    skip: int = 0,
     db: AsyncSession = Depends(get_db)
 ):
-    """List all keys"""
+    """List all keys (cursor paginated, see X-Next-Cursor)"""
     query = select(Pkcs11Key)
     if organization_id:
         query = query.where(Pkcs11Key.organization_id == organization_id)
-    query = query.offset(skip).limit(limit)
     
-    result = await db.execute(query)
-    return result.scalars().all()
+    return await fetch_page(db, query, Pkcs11Key, response, cursor, limit, skip=skip)
 
 
 @router.post("/generate", response_model=KeyResponse)
 async def generate_key(
     key: KeyCreate,
+    fresh: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """Generate a new key in HSM"""
-    # Generate mock fingerprint (in production, this comes from HSM)
-    fingerprint = hashlib.sha256(secrets.token_bytes(32)).hexdigest()[:40]
+    """
+    Generate a new key in HSM.
+    Takes pre-generated key material from the key pool when one is
+    configured for the algorithm and slot; `fresh=true` always generates.
+    """
+    fingerprint = None
+    if not fresh:
+        try:
+            spec = key_spec(key.algorithm, key.key_size, key.curve, key.hsm_slot)
+        except SignerError:
+            # Not a pooled algorithm; whether it can be generated is up to the signer
+            spec = None
+        if spec is not None:
+            fingerprint = await key_pool.claim(db, spec)
+    if fingerprint is None:
+        try:
+            fingerprint = await get_signer().generate_key(
+                key.algorithm, key.key_size, key.curve, key.hsm_slot
+            )
+        except SignerError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
     db_key = Pkcs11Key(
         **key.model_dump(),
@@ -49,9 +71,23 @@ async def generate_key(
     db.add(db_key)
     await db.commit()
     await db.refresh(db_key)
+    
+    await audit.record(
+        "key_generated",
+        entity_type="key",
+        entity_id=db_key.id,
+        organization_id=db_key.organization_id,
+        changes={"name": db_key.name, "algorithm": db_key.algorithm, "fingerprint": fingerprint}
+    )
     return db_key
 
 
+@router.get("/pool")
+async def key_pool_stats():
+    """Pre-generated key pool levels and counters"""
+    return key_pool.stats()
+
+
 @router.get("/{key_id}", response_model=KeyResponse)
 async def get_key(key_id: UUID, db: AsyncSession = Depends(get_db)):
     """Get key by ID"""
@@ -72,4 +108,8 @@ async def revoke_key(key_id: UUID, db: AsyncSession = Depends(get_db)):
     
     key.status = "revoked"
     await db.commit()
+    await signing_targets.invalidate_key(key.id)
+    await audit.record(
+        "key_revoked", entity_type="key", entity_id=key.id, organization_id=key.organization_id
+    )
     return {"status": "revoked"}
@@ -1,18 +1,21 @@
 """
 KT Secure - Organizations API
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from uuid import UUID
 from typing import List, Optional
 
+from ..config import get_settings
 from ..database import get_db
-from ..models import Organization, User, Pkcs11Key
+from ..models import Organization, OrganizationCounter, User, Pkcs11Key
 from ..schemas import OrganizationCreate, OrganizationUpdate, OrganizationResponse
+from ..utils.pagination import fetch_page
 from .auth import get_current_active_user
 
 router = APIRouter()
+settings = get_settings()
 
 
 def require_admin(current_user: User = Depends(get_current_active_user)) -> User:
@@ -35,29 +38,47 @@ def optional_admin(current_user: Optional[User] = None) -> Optional[User]:
     return current_user
 
 
-@router.get("/", response_model=List[OrganizationResponse])
-async def list_organizations(
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db)
-):
-    """List all organizations with user and key counts"""
-    result = await db.execute(
-        select(Organization).offset(skip).limit(limit)
-    )
-    orgs = result.scalars().all()
-    
-    response = []
-    for org in orgs:
-        # Get counts
-        users_count = await db.scalar(
-            select(func.count(User.id)).where(User.organization_id == org.id)
+async def _load_org_summaries(
+    db: AsyncSession,
+    orgs: List[Organization]
+) -> List[OrganizationResponse]:
+    """
+    Build responses with user and key counts for a page of organizations.
+    The counts come from one query: correlated counts per org (served by the
+    organization_id indexes) or, with ORG_COUNTS_SOURCE=counters, the
+    trigger-maintained organization_counters table.
+    """
+    ids = [org.id for org in orgs]
+    counts = {}
+    if ids and settings.ORG_COUNTS_SOURCE == "counters":
+        result = await db.execute(
+            select(
+                OrganizationCounter.organization_id,
+                OrganizationCounter.users_count,
+                OrganizationCounter.keys_count
+            ).where(OrganizationCounter.organization_id.in_(ids))
+        )
+        counts = {row[0]: (row[1], row[2]) for row in result.all()}
+    elif ids:
+        users_count = (
+            select(func.count(User.id))
+            .where(User.organization_id == Organization.id)
+            .correlate(Organization)
+            .scalar_subquery()
+        )
+        keys_count = (
+            select(func.count(Pkcs11Key.id))
+            .where(Pkcs11Key.organization_id == Organization.id)
+            .correlate(Organization)
+            .scalar_subquery()
         )
-        keys_count = await db.scalar(
-            select(func.count(Pkcs11Key.id)).where(Pkcs11Key.organization_id == org.id)
+        result = await db.execute(
+            select(Organization.id, users_count, keys_count).where(Organization.id.in_(ids))
         )
-        
-        response.append(OrganizationResponse(
+        counts = {row[0]: (row[1], row[2]) for row in result.all()}
+    
+    return [
+        OrganizationResponse(
             id=org.id,
             name=org.name,
             slug=org.slug,
@@ -66,11 +87,24 @@ async def list_organizations(
             status=org.status,
             hsm_slot=org.hsm_slot,
             created_at=org.created_at,
-            users_count=users_count or 0,
-            keys_count=keys_count or 0
-        ))
-    
-    return response
+            users_count=counts.get(org.id, (0, 0))[0] or 0,
+            keys_count=counts.get(org.id, (0, 0))[1] or 0
+        )
+        for org in orgs
+    ]
+
+
+@router.get("/", response_model=List[OrganizationResponse])
+async def list_organizations(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    db: AsyncSession = Depends(get_db)
+):
+    """List all organizations with user and key counts (cursor paginated, see X-Next-Cursor)"""
+    orgs = await fetch_page(db, select(Organization), Organization, response, cursor, limit, skip=skip)
+    return await _load_org_summaries(db, orgs)
 
 
 @router.post("/", response_model=OrganizationResponse)
@@ -119,25 +153,7 @@ async def get_organization(
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     
-    users_count = await db.scalar(
-        select(func.count(User.id)).where(User.organization_id == org.id)
-    )
-    keys_count = await db.scalar(
-        select(func.count(Pkcs11Key.id)).where(Pkcs11Key.organization_id == org.id)
-    )
-    
-    return OrganizationResponse(
-        id=org.id,
-        name=org.name,
-        slug=org.slug,
-        admin_email=org.admin_email,
-        parent_id=org.parent_id,
-        status=org.status,
-        hsm_slot=org.hsm_slot,
-        created_at=org.created_at,
-        users_count=users_count or 0,
-        keys_count=keys_count or 0
-    )
+    return (await _load_org_summaries(db, [org]))[0]
 
 
 @router.put("/{org_id}", response_model=OrganizationResponse)
@@ -211,26 +227,7 @@ async def approve_organization(
     await db.commit()
     await db.refresh(org)
     
-    # Get counts for response
-    users_count = await db.scalar(
-        select(func.count(User.id)).where(User.organization_id == org.id)
-    )
-    keys_count = await db.scalar(
-        select(func.count(Pkcs11Key.id)).where(Pkcs11Key.organization_id == org.id)
-    )
-    
-    return OrganizationResponse(
-        id=org.id,
-        name=org.name,
-        slug=org.slug,
-        admin_email=org.admin_email,
-        parent_id=org.parent_id,
-        status=org.status,
-        hsm_slot=org.hsm_slot,
-        created_at=org.created_at,
-        users_count=users_count or 0,
-        keys_count=keys_count or 0
-    )
+    return (await _load_org_summaries(db, [org]))[0]
 
 
 @router.put("/{org_id}/reject", response_model=OrganizationResponse)
@@ -257,24 +254,5 @@ async def reject_organization(
     await db.commit()
     await db.refresh(org)
     
-    # Get counts for response
-    users_count = await db.scalar(
-        select(func.count(User.id)).where(User.organization_id == org.id)
-    )
-    keys_count = await db.scalar(
-        select(func.count(Pkcs11Key.id)).where(Pkcs11Key.organization_id == org.id)
-    )
-    
-    return OrganizationResponse(
-        id=org.id,
-        name=org.name,
-        slug=org.slug,
-        admin_email=org.admin_email,
-        parent_id=org.parent_id,
-        status=org.status,
-        hsm_slot=org.hsm_slot,
-        created_at=org.created_at,
-        users_count=users_count or 0,
-        keys_count=keys_count or 0
-    )
+    return (await _load_org_summaries(db, [org]))[0]
 
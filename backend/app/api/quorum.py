@@ -2,21 +2,29 @@
 KT Secure - Quorum Approval API
 M-of-N multi-signature approval workflow endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from uuid import UUID
 from typing import List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 import json
 
+from ..config import get_settings
+from ..core.approval_executor import HANDLERS, ApprovalExecutor
+from ..core.policy_cache import quorum_policies
+from ..core.quorum import ApprovalExpirySweeper, VoteError, cast_vote
 from ..database import get_db
 from ..models import User
-from ..models.quorum import ApprovalRequest, ApprovalVote, QuorumPolicy, ApprovalStatus
+from ..models.quorum import ApprovalOperation, ApprovalRequest, ApprovalStatus, ApprovalVote, QuorumPolicy
+from ..utils.pagination import fetch_page
 from .auth import get_current_active_user
+from .websocket import notify_approval_completed, notify_approval_expired
 
 router = APIRouter()
+settings = get_settings()
 
 
 # Schemas
@@ -72,6 +80,21 @@ class ApprovalRequestResponse(BaseModel):
         from_attributes = True
 
 
+class ApprovalOperationResponse(BaseModel):
+    request_id: UUID
+    status: str
+    attempts: int
+    error: Optional[str]
+    result: Optional[dict] = None
+    created_at: datetime
+    available_at: datetime
+    started_at: Optional[datetime]
+    completed_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
 class QuorumPolicyCreate(BaseModel):
     organization_id: Optional[UUID] = None
     approval_type: str
@@ -102,17 +125,106 @@ def require_admin(current_user: User = Depends(get_current_active_user)) -> User
     return current_user
 
 
+def _with_details(query):
+    """
+    Eager-load creators and votes (with voters) for every request the query
+    returns, so a page costs three queries however many rows it has.
+    """
+    return query.options(
+        selectinload(ApprovalRequest.created_by),
+        selectinload(ApprovalRequest.votes).joinedload(ApprovalVote.user)
+    ).execution_options(populate_existing=True)
+
+
+def _request_response(request: ApprovalRequest) -> ApprovalRequestResponse:
+    """Build the response from a request loaded with _with_details."""
+    votes = [
+        ApprovalVoteResponse(
+            id=vote.id,
+            user_id=vote.user_id,
+            user_name=vote.user.name,
+            vote=vote.vote,
+            comment=vote.comment,
+            created_at=vote.created_at
+        )
+        for vote in sorted(request.votes, key=lambda vote: vote.created_at)
+    ]
+    
+    return ApprovalRequestResponse(
+        id=request.id,
+        approval_type=request.approval_type,
+        title=request.title,
+        description=request.description,
+        entity_type=request.entity_type,
+        entity_id=request.entity_id,
+        required_approvals=request.required_approvals,
+        total_approvers=request.total_approvers,
+        status=request.status,
+        current_approvals=request.current_approvals,
+        current_rejections=request.current_rejections,
+        created_by_id=request.created_by_id,
+        created_by_name=request.created_by.name if request.created_by else None,
+        created_at=request.created_at,
+        expires_at=request.expires_at,
+        completed_at=request.completed_at,
+        votes=votes
+    )
+
+
+async def _notify_expired(expired):
+    for request in expired:
+        await notify_approval_expired(
+            str(request.id),
+            request.title,
+            str(request.organization_id) if request.organization_id else None
+        )
+
+
+approval_expiry = ApprovalExpirySweeper(
+    on_expired=_notify_expired,
+    interval=settings.APPROVAL_EXPIRY_SWEEP_SECONDS,
+    batch_size=settings.APPROVAL_EXPIRY_BATCH_SIZE
+)
+
+
+async def _notify_executed(request, operation):
+    await notify_approval_completed(
+        str(request.id),
+        request.title,
+        "executed" if operation.status == "completed" else "failed",
+        str(request.organization_id) if request.organization_id else None
+    )
+
+
+# Runs approved operations from the outbox, started from the app lifespan
+approval_executor = ApprovalExecutor(
+    HANDLERS,
+    on_finished=_notify_executed,
+    workers=settings.APPROVAL_EXECUTOR_WORKERS,
+    poll_interval=settings.APPROVAL_EXECUTOR_POLL_SECONDS,
+    max_attempts=settings.APPROVAL_EXECUTOR_MAX_ATTEMPTS,
+    retry_delay=settings.APPROVAL_EXECUTOR_RETRY_SECONDS,
+    min_approvals=settings.QUORUM_MIN_APPROVALS
+)
+
+
 # Approval Request Endpoints
 @router.get("/requests", response_model=List[ApprovalRequestResponse])
 async def list_approval_requests(
+    response: Response,
     status: Optional[str] = None,
     organization_id: Optional[UUID] = None,
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 50,
+    skip: int = 0,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """List approval requests, optionally filtered by status or organization."""
+    """
+    List approval requests, newest first, optionally filtered by status or
+    organization. Pass the X-Next-Cursor response header as `cursor` for
+    the next page.
+    """
     query = select(ApprovalRequest)
     
     if status:
@@ -120,54 +232,10 @@ async def list_approval_requests(
     if organization_id:
         query = query.where(ApprovalRequest.organization_id == organization_id)
     
-    query = query.order_by(ApprovalRequest.created_at.desc()).offset(skip).limit(limit)
-    result = await db.execute(query)
-    requests = result.scalars().all()
-    
-    response = []
-    for req in requests:
-        # Get creator name
-        creator_result = await db.execute(select(User).where(User.id == req.created_by_id))
-        creator = creator_result.scalar_one_or_none()
-        
-        # Get votes with user names
-        votes_result = await db.execute(
-            select(ApprovalVote, User)
-            .join(User, ApprovalVote.user_id == User.id)
-            .where(ApprovalVote.request_id == req.id)
-        )
-        votes = []
-        for vote, user in votes_result:
-            votes.append(ApprovalVoteResponse(
-                id=vote.id,
-                user_id=vote.user_id,
-                user_name=user.name,
-                vote=vote.vote,
-                comment=vote.comment,
-                created_at=vote.created_at
-            ))
-        
-        response.append(ApprovalRequestResponse(
-            id=req.id,
-            approval_type=req.approval_type,
-            title=req.title,
-            description=req.description,
-            entity_type=req.entity_type,
-            entity_id=req.entity_id,
-            required_approvals=req.required_approvals,
-            total_approvers=req.total_approvers,
-            status=req.status,
-            current_approvals=req.current_approvals,
-            current_rejections=req.current_rejections,
-            created_by_id=req.created_by_id,
-            created_by_name=creator.name if creator else None,
-            created_at=req.created_at,
-            expires_at=req.expires_at,
-            completed_at=req.completed_at,
-            votes=votes
-        ))
-    
-    return response
+    requests = await fetch_page(
+        db, _with_details(query), ApprovalRequest, response, cursor, limit, descending=True, skip=skip
+    )
+    return [_request_response(req) for req in requests]
 
 
 @router.post("/requests", response_model=ApprovalRequestResponse)
@@ -177,15 +245,22 @@ async def create_approval_request(
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new approval request."""
-    # Check for existing policy
-    policy_result = await db.execute(
-        select(QuorumPolicy)
-        .where(QuorumPolicy.approval_type == data.approval_type)
-        .where(QuorumPolicy.is_enabled.is_(True))
-    )
-    policy = policy_result.scalar_one_or_none()
+    organization_id = data.organization_id or current_user.organization_id
     
-    # Use policy settings or request settings
+    # Nearest policy up the org hierarchy, else the global one
+    policy = await quorum_policies.resolve(db, organization_id, data.approval_type)
+    
+    # Use policy settings or request settings; without a policy the request
+    # may not pick a quorum below the minimum for operations that execute
+    if policy is None and data.approval_type in HANDLERS and (
+        data.required_approvals < settings.QUORUM_MIN_APPROVALS
+        or data.required_approvals > data.total_approvers
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"No quorum policy applies; at least {settings.QUORUM_MIN_APPROVALS} "
+                   f"of total_approvers approvals are required"
+        )
     required_approvals = policy.required_approvals if policy else data.required_approvals
     total_approvers = policy.total_approvers if policy else data.total_approvers
     expiry_hours = policy.expiry_hours if policy else 72
@@ -199,7 +274,7 @@ async def create_approval_request(
         entity_data=json.dumps(data.entity_data) if data.entity_data else None,
         required_approvals=required_approvals,
         total_approvers=total_approvers,
-        organization_id=data.organization_id or current_user.organization_id,
+        organization_id=organization_id,
         created_by_id=current_user.id,
         expires_at=datetime.utcnow() + timedelta(hours=expiry_hours)
     )
@@ -236,53 +311,14 @@ async def get_approval_request(
 ):
     """Get a specific approval request with its votes."""
     result = await db.execute(
-        select(ApprovalRequest).where(ApprovalRequest.id == request_id)
+        _with_details(select(ApprovalRequest).where(ApprovalRequest.id == request_id))
     )
     request = result.scalar_one_or_none()
     
     if not request:
         raise HTTPException(status_code=404, detail="Approval request not found")
     
-    # Get creator
-    creator_result = await db.execute(select(User).where(User.id == request.created_by_id))
-    creator = creator_result.scalar_one_or_none()
-    
-    # Get votes
-    votes_result = await db.execute(
-        select(ApprovalVote, User)
-        .join(User, ApprovalVote.user_id == User.id)
-        .where(ApprovalVote.request_id == request.id)
-    )
-    votes = []
-    for vote, user in votes_result:
-        votes.append(ApprovalVoteResponse(
-            id=vote.id,
-            user_id=vote.user_id,
-            user_name=user.name,
-            vote=vote.vote,
-            comment=vote.comment,
-            created_at=vote.created_at
-        ))
-    
-    return ApprovalRequestResponse(
-        id=request.id,
-        approval_type=request.approval_type,
-        title=request.title,
-        description=request.description,
-        entity_type=request.entity_type,
-        entity_id=request.entity_id,
-        required_approvals=request.required_approvals,
-        total_approvers=request.total_approvers,
-        status=request.status,
-        current_approvals=request.current_approvals,
-        current_rejections=request.current_rejections,
-        created_by_id=request.created_by_id,
-        created_by_name=creator.name if creator else None,
-        created_at=request.created_at,
-        expires_at=request.expires_at,
-        completed_at=request.completed_at,
-        votes=votes
-    )
+    return _request_response(request)
 
 
 @router.post("/requests/{request_id}/vote", response_model=ApprovalRequestResponse)
@@ -294,75 +330,46 @@ async def vote_on_request(
 ):
     """
     Submit a vote (approve/reject) on an approval request.
-    Only admins can vote. M-of-N logic is evaluated after each vote.
+    Only admins can vote. M-of-N logic is evaluated atomically with each
+    vote, so concurrent votes are neither lost nor double counted.
     """
-    if vote_data.vote not in ["approve", "reject"]:
-        raise HTTPException(status_code=400, detail="Vote must be 'approve' or 'reject'")
-    
-    # Get the request
-    result = await db.execute(
-        select(ApprovalRequest).where(ApprovalRequest.id == request_id)
-    )
-    request = result.scalar_one_or_none()
-    
-    if not request:
-        raise HTTPException(status_code=404, detail="Approval request not found")
-    
-    if request.status != ApprovalStatus.PENDING.value:
-        raise HTTPException(status_code=400, detail=f"Request is already {request.status}")
-    
-    # Check if expired
-    if request.expires_at and datetime.utcnow() > request.expires_at:
-        request.status = ApprovalStatus.EXPIRED.value
-        await db.commit()
-        raise HTTPException(status_code=400, detail="Request has expired")
-    
-    # Check if user already voted
-    existing_vote = await db.execute(
-        select(ApprovalVote)
-        .where(ApprovalVote.request_id == request_id)
-        .where(ApprovalVote.user_id == current_user.id)
-    )
-    if existing_vote.scalar_one_or_none():
-        raise HTTPException(status_code=400, detail="You have already voted on this request")
+    try:
+        result = await cast_vote(db, request_id, current_user.id, vote_data.vote, vote_data.comment)
+    except VoteError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     
-    # Creator cannot vote on their own request
-    if request.created_by_id == current_user.id:
-        raise HTTPException(status_code=400, detail="Cannot vote on your own request")
-    
-    # Create the vote
-    vote = ApprovalVote(
-        request_id=request_id,
-        user_id=current_user.id,
-        vote=vote_data.vote,
-        comment=vote_data.comment
-    )
-    db.add(vote)
-    
-    # Update counts
-    if vote_data.vote == "approve":
-        request.current_approvals += 1
-    else:
-        request.current_rejections += 1
-    
-    # Check if quorum is reached
-    if request.current_approvals >= request.required_approvals:
-        request.status = ApprovalStatus.APPROVED.value
-        request.completed_at = datetime.utcnow()
-        # TODO: Execute the approved operation (key generation, etc.)
-    
-    # Check if rejection threshold is reached
-    remaining_voters = request.total_approvers - request.current_approvals - request.current_rejections
-    if request.current_approvals + remaining_voters < request.required_approvals:
-        request.status = ApprovalStatus.REJECTED.value
-        request.completed_at = datetime.utcnow()
-    
-    await db.commit()
+    # The operation is already in the outbox; this only starts it right away
+    if result.status == ApprovalStatus.APPROVED.value:
+        approval_executor.submit(request_id)
     
     # Return updated request
     return await get_approval_request(request_id, db)
 
 
+@router.get("/requests/{request_id}/operation", response_model=ApprovalOperationResponse)
+async def get_approval_operation(
+    request_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Execution status of an approved request's operation."""
+    operation = await db.get(ApprovalOperation, request_id)
+    if not operation:
+        raise HTTPException(status_code=404, detail="No operation for this request")
+    
+    return ApprovalOperationResponse(
+        request_id=operation.request_id,
+        status=operation.status,
+        attempts=operation.attempts,
+        error=operation.error,
+        result=json.loads(operation.result) if operation.result else None,
+        created_at=operation.created_at,
+        available_at=operation.available_at,
+        started_at=operation.started_at,
+        completed_at=operation.completed_at
+    )
+
+
 # Quorum Policy Endpoints
 @router.get("/policies", response_model=List[QuorumPolicyResponse])
 async def list_quorum_policies(
@@ -404,6 +411,7 @@ async def create_quorum_policy(
     db.add(policy)
     await db.commit()
     await db.refresh(policy)
+    await quorum_policies.invalidate(policy.approval_type)
     
     return policy
 
@@ -430,6 +438,7 @@ async def update_quorum_policy(
             detail="Required approvals cannot exceed total approvers"
         )
     
+    previous_type = policy.approval_type
     policy.approval_type = data.approval_type
     policy.required_approvals = data.required_approvals
     policy.total_approvers = data.total_approvers
@@ -438,6 +447,9 @@ async def update_quorum_policy(
     
     await db.commit()
     await db.refresh(policy)
+    await quorum_policies.invalidate(policy.approval_type)
+    if previous_type != policy.approval_type:
+        await quorum_policies.invalidate(previous_type)
     
     return policy
 
@@ -459,5 +471,6 @@ async def delete_quorum_policy(
     
     await db.delete(policy)
     await db.commit()
+    await quorum_policies.invalidate(policy.approval_type)
     
     return {"status": "deleted"}
@@ -1,37 +1,191 @@
 """
 KT Secure - Signing API
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from pydantic import BaseModel
+from sqlalchemy import select, update, or_
+from pydantic import BaseModel, Field
 from uuid import UUID
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import binascii
 import hashlib
 import base64
+import logging
 
-from ..database import get_db
+from ..config import get_settings
+from ..core.audit import audit
+from ..core.signer import SignerError, get_signer, hash_name
+from ..core.jobs import JobWorkerPool
+from ..core.scheduler import scheduler
+from ..core.signature_store import SignatureAddress, signature_store
+from ..core.signing_cache import signing_targets
+from ..core.timestamping import TimestampError, get_timestamper
+from ..core.verification_cache import verified_signatures
+from ..database import get_db, AsyncSessionLocal
 from ..models import SigningConfig, Pkcs11Key
-from ..schemas import SigningConfigCreate, SigningConfigResponse
+from ..models.signing import SigningJob, SigningJobStatus
+from ..utils.merkle import MerkleTree, verify_proof
+from ..schemas import SigningConfigCreate, SigningConfigUpdate, SigningConfigResponse
+from .websocket import notify_signing_job
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
+settings = get_settings()
+
+IDEMPOTENCY_CONFLICT = "Idempotency key was already used with a different payload"
 
 
 class SignRequest(BaseModel):
     config_id: UUID
     data: str  # Base64 encoded
+    idempotency_key: Optional[str] = Field(None, max_length=255)
+
+
+class MerkleProofStep(BaseModel):
+    position: str  # Side of the sibling: left or right
+    hash: str  # Hex encoded
+
+
+class TimestampInfo(BaseModel):
+    tsa: str
+    token: str  # Base64 DER RFC 3161 timeStampToken over root
+    root: str  # Hex encoded; root_from_proof(sha256(signature), proof)
+    proof: List[MerkleProofStep]
+    batch_size: int  # Signatures covered by the same token
 
 
 class SignResponse(BaseModel):
     signature: str
     algorithm: str
     key_fingerprint: str
+    reused: bool = False  # Served from the signature store, not the signer
+    timestamp: Optional[TimestampInfo] = None  # Set when the config has a timestamp_authority
+
+
+class DigestSignRequest(BaseModel):
+    config_id: UUID
+    digest: str  # Hex encoded, computed by the client
+    hash_algorithm: str  # Must match the config, e.g. SHA-256
+    idempotency_key: Optional[str] = Field(None, max_length=255)
+
+
+class BatchSignRequest(BaseModel):
+    items: List[SignRequest]
+
+
+class BatchSignResult(BaseModel):
+    index: int
+    config_id: UUID
+    signature: Optional[str] = None
+    algorithm: Optional[str] = None
+    key_fingerprint: Optional[str] = None
+    reused: bool = False
+    timestamp: Optional[TimestampInfo] = None
+    error: Optional[str] = None
+
+
+class BatchSignResponse(BaseModel):
+    results: List[BatchSignResult]
+    succeeded: int
+    failed: int
+
+
+class ManifestFile(BaseModel):
+    name: str
+    digest: str  # Hex encoded, config's hash algorithm
+
+
+class ManifestSignRequest(BaseModel):
+    config_id: UUID
+    hash_algorithm: str  # Must match the config, e.g. SHA-256
+    files: List[ManifestFile]
+    idempotency_key: Optional[str] = Field(None, max_length=255)
+
+
+class ManifestFileProof(BaseModel):
+    name: str
+    digest: str
+    index: int
+    proof: List[MerkleProofStep]
+
+
+class ManifestSignResponse(BaseModel):
+    root: str  # Hex encoded Merkle root; the signature covers this digest
+    signature: str
+    algorithm: str
+    key_fingerprint: str
+    reused: bool = False
+    timestamp: Optional[TimestampInfo] = None
+    files: List[ManifestFileProof]
+
+
+class ManifestProofVerifyRequest(BaseModel):
+    key_id: UUID
+    hash_algorithm: str = "SHA-256"
+    digest: str  # Hex encoded file digest
+    proof: List[MerkleProofStep]
+    root: str
+    signature: str
+
+
+class SigningJobCreate(BaseModel):
+    config_id: UUID
+    data: Optional[str] = None  # Base64 encoded payload, or
+    digest: Optional[str] = None  # hex digest computed by the client
+    hash_algorithm: Optional[str] = None  # Required with digest
+
+
+class SigningJobResponse(BaseModel):
+    id: UUID
+    config_id: UUID
+    status: str
+    signature: Optional[str] = None
+    algorithm: Optional[str] = None
+    key_fingerprint: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
 
 
 class VerifyRequest(BaseModel):
     signature: str
     data: str
     key_id: UUID
+    hash_algorithm: str = "SHA-256"
+
+
+class VerifyBatchItem(BaseModel):
+    key_id: UUID
+    signature: str  # Hex encoded
+    data: Optional[str] = None  # Base64 encoded payload, or
+    digest: Optional[str] = None  # hex digest computed by the client
+    hash_algorithm: str = "SHA-256"
+
+
+class VerifyBatchRequest(BaseModel):
+    items: List[VerifyBatchItem]
+
+
+class VerifyBatchResult(BaseModel):
+    index: int
+    key_id: UUID
+    valid: bool = False
+    key_status: Optional[str] = None
+    error: Optional[str] = None
+
+
+class VerifyBatchResponse(BaseModel):
+    results: List[VerifyBatchResult]
+    valid: int
+    invalid: int
+    failed: int
 
 
 @router.get("/configs", response_model=List[SigningConfigResponse])
@@ -58,44 +212,697 @@ async def create_config(
     db.add(db_config)
     await db.commit()
     await db.refresh(db_config)
+    await signing_targets.invalidate_config(db_config.id)
     return db_config
 
 
-@router.post("/sign", response_model=SignResponse)
-async def sign_data(
-    request: SignRequest,
+@router.patch("/configs/{config_id}", response_model=SigningConfigResponse)
+async def update_config(
+    config_id: UUID,
+    config_update: SigningConfigUpdate,
     db: AsyncSession = Depends(get_db)
 ):
-    """Sign data using a signing configuration"""
+    """Update a signing configuration (e.g. enable or disable it)"""
     result = await db.execute(
-        select(SigningConfig).where(SigningConfig.id == request.config_id)
+        select(SigningConfig).where(SigningConfig.id == config_id)
     )
     config = result.scalar_one_or_none()
     if not config:
         raise HTTPException(status_code=404, detail="Signing config not found")
     
+    for field, value in config_update.model_dump(exclude_unset=True).items():
+        setattr(config, field, value)
+    
+    await db.commit()
+    await db.refresh(config)
+    await signing_targets.invalidate_config(config.id)
+    return config
+
+
+async def _load_signing_targets(
+    db: AsyncSession,
+    config_ids: Iterable[UUID]
+) -> Tuple[Dict[UUID, SigningConfig], Dict[UUID, Pkcs11Key]]:
+    """
+    Resolve configs and their keys for a set of config ids.
+    Cached pairs are served from memory; misses are loaded with two IN
+    queries and cached.
+    """
+    configs: Dict[UUID, SigningConfig] = {}
+    keys: Dict[UUID, Pkcs11Key] = {}
+    missing = set()
+    for config_id in set(config_ids):
+        cached = signing_targets.get(config_id)
+        if cached:
+            config, key = cached
+            configs[config.id] = config
+            keys[key.id] = key
+        else:
+            missing.add(config_id)
+    
+    if not missing:
+        return configs, keys
+    
+    result = await db.execute(
+        select(SigningConfig).where(SigningConfig.id.in_(missing))
+    )
+    loaded = {config.id: config for config in result.scalars().all()}
+    configs.update(loaded)
+    
+    key_ids = {config.key_id for config in loaded.values() if config.key_id} - keys.keys()
+    if key_ids:
+        key_result = await db.execute(
+            select(Pkcs11Key).where(Pkcs11Key.id.in_(key_ids))
+        )
+        keys.update({key.id: key for key in key_result.scalars().all()})
+    
+    for config in loaded.values():
+        if config.key_id in keys:
+            signing_targets.put(config, keys[config.key_id])
+    
+    return configs, keys
+
+
+def _select_signing_target(
+    config_id: UUID,
+    configs: Dict[UUID, SigningConfig],
+    keys: Dict[UUID, Pkcs11Key]
+) -> Tuple[SigningConfig, Pkcs11Key]:
+    """Pick a loaded (config, key) pair, raising the same errors as /sign."""
+    config = configs.get(config_id)
+    if not config:
+        raise HTTPException(status_code=404, detail="Signing config not found")
+    
     if not config.is_enabled:
         raise HTTPException(status_code=400, detail="Signing config is disabled")
     
-    # Get the key
-    key_result = await db.execute(
-        select(Pkcs11Key).where(Pkcs11Key.id == config.key_id)
-    )
-    key = key_result.scalar_one_or_none()
+    key = keys.get(config.key_id)
     if not key:
         raise HTTPException(status_code=404, detail="Key not found")
     
-    # Mock signature (in production, use HSM)
-    data_bytes = base64.b64decode(request.data)
-    signature = hashlib.sha256(data_bytes + key.fingerprint.encode()).hexdigest()
+    if key.status != "active":
+        raise HTTPException(status_code=400, detail=f"Key is {key.status}")
+    
+    return config, key
+
+
+def _new_hasher(hash_algorithm: str):
+    """Create a hashlib object for a config hash_algorithm (e.g. SHA-256)."""
+    try:
+        return hashlib.new(hash_name(hash_algorithm))
+    except SignerError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _decode_digest(digest: str, hash_algorithm: str) -> bytes:
+    """Decode a hex digest and check its length against the hash algorithm."""
+    try:
+        digest_bytes = bytes.fromhex(digest)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Digest must be hex encoded")
+    
+    expected_size = _new_hasher(hash_algorithm).digest_size
+    if len(digest_bytes) != expected_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{hash_algorithm} digest must be {expected_size} bytes, got {len(digest_bytes)}"
+        )
+    return digest_bytes
+
+
+def _hash_payload(data: str, hash_algorithm: str) -> bytes:
+    """Decode a base64 payload and hash it with the config's algorithm."""
+    hasher = _new_hasher(hash_algorithm)
+    try:
+        payload = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid base64 data")
+    hasher.update(payload)
+    return hasher.digest()
+
+
+async def _sign_digest(
+    key: Pkcs11Key,
+    digest: bytes,
+    hash_algorithm: str,
+    interactive: bool = True
+) -> str:
+    """
+    Sign a digest with the configured signer backend (hex encoded).
+    Waits for the organization's fair share of the signer first; bulk
+    callers (batches, jobs) queue behind interactive requests of their org.
+    """
+    try:
+        async with scheduler.slot(key.organization_id, key.hsm_slot, interactive=interactive):
+            signature = await get_signer().sign_digest(key, digest, hash_algorithm)
+    except SignerError as e:
+        raise HTTPException(status_code=500, detail=f"Signing failed: {e}")
+    return signature.hex()
+
+
+async def _audit_signature(
+    config: SigningConfig,
+    key: Pkcs11Key,
+    digest: str,
+    reused: bool,
+    source: str
+):
+    """Queue the audit entry for a signature (write-behind, see core/audit.py)."""
+    await audit.record(
+        "sign",
+        entity_type="signing_config",
+        entity_id=config.id,
+        organization_id=config.organization_id,
+        changes={
+            "digest": digest,
+            "hash_algorithm": config.hash_algorithm,
+            "key_id": str(key.id),
+            "key_fingerprint": key.fingerprint,
+            "reused": reused,
+            "source": source
+        }
+    )
+
+
+async def _sign_or_reuse(
+    db: AsyncSession,
+    config: SigningConfig,
+    key: Pkcs11Key,
+    digest: bytes,
+    idempotency_key: Optional[str] = None,
+    interactive: bool = True,
+    source: str = "sign"
+) -> Tuple[str, bool]:
+    """
+    Sign a digest unless the same digest was already signed with this
+    config and key, in which case the stored signature is returned without
+    touching the signer. The key must already be checked to be active.
+    Either way the signature is audited as coming from `source`.
+    Returns (signature, reused).
+    """
+    address = SignatureAddress(digest.hex(), config.hash_algorithm, config.id, key.fingerprint)
+    if idempotency_key:
+        conflicts = await signature_store.claim_idempotency_keys(
+            db, config.id, {idempotency_key: address.digest}
+        )
+        if conflicts:
+            raise HTTPException(status_code=409, detail=IDEMPOTENCY_CONFLICT)
+    
+    stored = await signature_store.lookup(db, [address])
+    if address in stored:
+        await signature_store.commit(db)
+        await _audit_signature(config, key, address.digest, True, source)
+        return stored[address], True
+    
+    signature = await _sign_digest(key, digest, config.hash_algorithm, interactive=interactive)
+    signature_store.add(db, address, key.id, signature)
+    await signature_store.commit(db)
+    await _audit_signature(config, key, address.digest, False, source)
+    return signature, False
+
+
+async def _timestamp(config: SigningConfig, signature: str) -> Optional[TimestampInfo]:
+    """
+    Timestamp a signature with the config's TSA, if it has one.
+    Concurrent signatures for the same TSA share one token (see
+    TimestampService), so this adds at most one batch window of latency.
+    """
+    if not config.timestamp_authority:
+        return None
+    try:
+        stamp = await get_timestamper().timestamp(config.timestamp_authority, bytes.fromhex(signature))
+    except TimestampError as e:
+        raise HTTPException(status_code=502, detail=f"Timestamping failed: {e}")
+    return TimestampInfo(
+        tsa=stamp.tsa,
+        token=base64.b64encode(stamp.token).decode(),
+        root=stamp.root.hex(),
+        proof=[MerkleProofStep(position=position, hash=sibling.hex()) for position, sibling in stamp.proof],
+        batch_size=stamp.batch_size
+    )
+
+
+@router.post("/sign", response_model=SignResponse)
+async def sign_data(
+    request: SignRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Sign data using a signing configuration"""
+    configs, keys = await _load_signing_targets(db, [request.config_id])
+    config, key = _select_signing_target(request.config_id, configs, keys)
+    
+    digest = _hash_payload(request.data, config.hash_algorithm)
+    signature, reused = await _sign_or_reuse(
+        db, config, key, digest, idempotency_key=request.idempotency_key
+    )
+    
+    return SignResponse(
+        signature=signature,
+        algorithm=f"{key.algorithm}-{config.hash_algorithm}",
+        key_fingerprint=key.fingerprint,
+        reused=reused,
+        timestamp=await _timestamp(config, signature)
+    )
+
+
+@router.post("/sign/digest", response_model=SignResponse)
+async def sign_digest(
+    request: DigestSignRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Sign a digest computed by the client ("hash and sign remotely").
+    The client hashes the artifact locally with the config's hash algorithm
+    and uploads only the digest.
+    """
+    configs, keys = await _load_signing_targets(db, [request.config_id])
+    config, key = _select_signing_target(request.config_id, configs, keys)
+    
+    if request.hash_algorithm.upper() != config.hash_algorithm.upper():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Signing config requires {config.hash_algorithm} digests"
+        )
+    digest = _decode_digest(request.digest, config.hash_algorithm)
+    
+    signature, reused = await _sign_or_reuse(
+        db, config, key, digest, idempotency_key=request.idempotency_key, source="digest"
+    )
     
     return SignResponse(
         signature=signature,
         algorithm=f"{key.algorithm}-{config.hash_algorithm}",
-        key_fingerprint=key.fingerprint
+        key_fingerprint=key.fingerprint,
+        reused=reused,
+        timestamp=await _timestamp(config, signature)
     )
 
 
+@router.post("/sign/batch", response_model=BatchSignResponse)
+async def sign_batch(
+    request: BatchSignRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Sign many payloads in one call.
+    Configs and keys are resolved once per distinct id and the items are
+    signed in parallel. Failures are reported per item instead of failing
+    the whole batch.
+    """
+    if len(request.items) > settings.SIGNING_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds {settings.SIGNING_BATCH_MAX_ITEMS} items"
+        )
+    
+    configs, keys = await _load_signing_targets(
+        db, (item.config_id for item in request.items)
+    )
+    loop = asyncio.get_running_loop()
+    results = [
+        BatchSignResult(index=index, config_id=item.config_id)
+        for index, item in enumerate(request.items)
+    ]
+    targets: Dict[int, Tuple[SigningConfig, Pkcs11Key, SignatureAddress]] = {}
+    
+    async def prepare_item(index: int, item: SignRequest):
+        try:
+            config, key = _select_signing_target(item.config_id, configs, keys)
+            digest = await loop.run_in_executor(
+                None, _hash_payload, item.data, config.hash_algorithm
+            )
+        except HTTPException as e:
+            results[index].error = e.detail
+            return
+        targets[index] = (
+            config, key,
+            SignatureAddress(digest.hex(), config.hash_algorithm, config.id, key.fingerprint)
+        )
+    
+    await asyncio.gather(
+        *(prepare_item(index, item) for index, item in enumerate(request.items))
+    )
+    
+    # Idempotency keys, checked with one query per config
+    claims: Dict[UUID, Dict[str, str]] = {}
+    for index, (config, _, address) in list(targets.items()):
+        idempotency_key = request.items[index].idempotency_key
+        if not idempotency_key:
+            continue
+        config_claims = claims.setdefault(config.id, {})
+        if config_claims.setdefault(idempotency_key, address.digest) != address.digest:
+            results[index].error = IDEMPOTENCY_CONFLICT
+            del targets[index]
+    for config_id, config_claims in claims.items():
+        conflicts = await signature_store.claim_idempotency_keys(db, config_id, config_claims)
+        for index, (config, _, _) in list(targets.items()):
+            if config.id == config_id and request.items[index].idempotency_key in conflicts:
+                results[index].error = IDEMPOTENCY_CONFLICT
+                del targets[index]
+    
+    # Each distinct digest is signed at most once, and not at all if stored
+    stored = await signature_store.lookup(db, (address for _, _, address in targets.values()))
+    to_sign = {
+        address: (config, key) for config, key, address in targets.values()
+        if address not in stored
+    }
+    
+    async def sign_address(address: SignatureAddress, config: SigningConfig, key: Pkcs11Key):
+        try:
+            signature = await _sign_digest(
+                key, bytes.fromhex(address.digest), config.hash_algorithm, interactive=False
+            )
+        except HTTPException as e:
+            return e
+        signature_store.add(db, address, key.id, signature)
+        return signature
+    
+    signed = dict(zip(to_sign, await asyncio.gather(
+        *(sign_address(address, config, key) for address, (config, key) in to_sign.items())
+    )))
+    await signature_store.commit(db)
+    
+    async def finish_item(index: int, config: SigningConfig, key: Pkcs11Key, address: SignatureAddress):
+        result = results[index]
+        outcome = stored[address] if address in stored else signed[address]
+        if isinstance(outcome, HTTPException):
+            result.error = outcome.detail
+            return
+        try:
+            result.timestamp = await _timestamp(config, outcome)
+        except HTTPException as e:
+            result.error = e.detail
+            return
+        result.signature = outcome
+        result.reused = address in stored
+        result.algorithm = f"{key.algorithm}-{config.hash_algorithm}"
+        result.key_fingerprint = key.fingerprint
+        await _audit_signature(config, key, address.digest, result.reused, "batch")
+    
+    await asyncio.gather(
+        *(finish_item(index, *target) for index, target in targets.items())
+    )
+    
+    failed = sum(1 for result in results if result.error)
+    
+    return BatchSignResponse(
+        results=results,
+        succeeded=len(results) - failed,
+        failed=failed
+    )
+
+
+@router.put("/sign/stream", response_model=SignResponse)
+async def sign_stream(
+    config_id: UUID,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Sign a raw binary body sent as application/octet-stream.
+    The body is hashed chunk by chunk as it arrives and only the final
+    digest is signed, so memory stays flat regardless of image size.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.split(";")[0].strip() != "application/octet-stream":
+        raise HTTPException(
+            status_code=415,
+            detail="Content-Type must be application/octet-stream"
+        )
+    
+    configs, keys = await _load_signing_targets(db, [config_id])
+    config, key = _select_signing_target(config_id, configs, keys)
+    
+    hasher = _new_hasher(config.hash_algorithm)
+    async for chunk in request.stream():
+        hasher.update(chunk)
+    
+    signature, reused = await _sign_or_reuse(db, config, key, hasher.digest(), source="stream")
+    
+    return SignResponse(
+        signature=signature,
+        algorithm=f"{key.algorithm}-{config.hash_algorithm}",
+        key_fingerprint=key.fingerprint,
+        reused=reused,
+        timestamp=await _timestamp(config, signature)
+    )
+
+
+@router.post("/sign/manifest", response_model=ManifestSignResponse)
+async def sign_manifest(
+    request: ManifestSignRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Sign a multi-file release with one signature.
+    The file digests become the leaves of a Merkle tree and only the root is
+    signed. Each file gets an inclusion proof, so a verifier can check one
+    file against the signed root with O(log N) hashes.
+    """
+    if not request.files:
+        raise HTTPException(status_code=400, detail="Manifest has no files")
+    if len(request.files) > settings.SIGNING_MANIFEST_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Manifest exceeds {settings.SIGNING_MANIFEST_MAX_FILES} files"
+        )
+    
+    configs, keys = await _load_signing_targets(db, [request.config_id])
+    config, key = _select_signing_target(request.config_id, configs, keys)
+    
+    if request.hash_algorithm.upper() != config.hash_algorithm.upper():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Signing config requires {config.hash_algorithm} digests"
+        )
+    digests = [_decode_digest(file.digest, config.hash_algorithm) for file in request.files]
+    
+    tree = await asyncio.get_running_loop().run_in_executor(
+        None, MerkleTree, digests, hash_name(config.hash_algorithm)
+    )
+    signature, reused = await _sign_or_reuse(
+        db, config, key, tree.root, idempotency_key=request.idempotency_key, source="manifest"
+    )
+    
+    return ManifestSignResponse(
+        root=tree.root.hex(),
+        signature=signature,
+        algorithm=f"{key.algorithm}-{config.hash_algorithm}",
+        key_fingerprint=key.fingerprint,
+        reused=reused,
+        timestamp=await _timestamp(config, signature),
+        files=[
+            ManifestFileProof(
+                name=file.name,
+                digest=digest.hex(),
+                index=index,
+                proof=[
+                    MerkleProofStep(position=position, hash=sibling.hex())
+                    for position, sibling in tree.proof(index)
+                ]
+            )
+            for index, (file, digest) in enumerate(zip(request.files, digests))
+        ]
+    )
+
+
+async def _process_signing_job(job_id: UUID):
+    """Claim a queued job, sign its digest and notify the submitter."""
+    async with AsyncSessionLocal() as db:
+        claimed = await db.execute(
+            update(SigningJob)
+            .where(SigningJob.id == job_id)
+            .where(SigningJob.status == SigningJobStatus.QUEUED.value)
+            .values(
+                status=SigningJobStatus.RUNNING.value,
+                started_at=datetime.utcnow(),
+                attempts=SigningJob.attempts + 1
+            )
+            .returning(SigningJob.attempts)
+        )
+        attempt = claimed.scalar_one_or_none()
+        if attempt is None:
+            # Already taken by another worker
+            await db.rollback()
+            return
+        await db.commit()
+        
+        job = await db.get(SigningJob, job_id)
+        organization_id = job.organization_id
+        address = None
+        reused = False
+        try:
+            configs, keys = await _load_signing_targets(db, [job.config_id])
+            config, key = _select_signing_target(job.config_id, configs, keys)
+            address = SignatureAddress(job.digest, job.hash_algorithm, config.id, key.fingerprint)
+            stored = await signature_store.lookup(db, [address])
+            reused = address in stored
+            if reused:
+                signature = stored[address]
+            else:
+                signature = await _sign_digest(
+                    key, bytes.fromhex(job.digest), job.hash_algorithm, interactive=False
+                )
+            result = {
+                "status": SigningJobStatus.COMPLETED.value,
+                "signature": signature,
+                "algorithm": f"{key.algorithm}-{config.hash_algorithm}",
+                "key_fingerprint": key.fingerprint
+            }
+        except HTTPException as e:
+            result = {"status": SigningJobStatus.FAILED.value, "error": e.detail}
+        except Exception as e:
+            logger.warning("Signing job %s failed", job_id, exc_info=True)
+            await db.rollback()
+            result = {"status": SigningJobStatus.FAILED.value, "error": str(e) or type(e).__name__}
+        
+        # Only the run that holds the current attempt may finish the job; a
+        # slow run that was requeued and claimed again since must not
+        finished = await db.execute(
+            update(SigningJob)
+            .where(
+                SigningJob.id == job_id,
+                SigningJob.status == SigningJobStatus.RUNNING.value,
+                SigningJob.attempts == attempt
+            )
+            .values(**result, completed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if finished.rowcount != 1:
+            await db.rollback()
+            return
+        await db.commit()
+        
+        # Stored after the job commits so a lost insert race cannot undo it
+        if result["status"] == SigningJobStatus.COMPLETED.value:
+            if not reused:
+                signature_store.add(db, address, key.id, result["signature"])
+                await signature_store.commit(db)
+            await _audit_signature(config, key, job.digest, reused, "job")
+    
+    await notify_signing_job(
+        job_id=str(job_id),
+        status=result["status"],
+        error=result.get("error"),
+        organization_id=str(organization_id) if organization_id else None
+    )
+
+
+async def _recover_signing_jobs() -> List[UUID]:
+    """
+    Requeue jobs stuck in running and list the oldest queued jobs.
+    Jobs that were already claimed SIGNING_JOB_MAX_ATTEMPTS times fail
+    instead of being requeued again.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.SIGNING_JOB_STALE_SECONDS)
+    stale = (
+        (SigningJob.status == SigningJobStatus.RUNNING.value)
+        & or_(SigningJob.started_at.is_(None), SigningJob.started_at < stale_before)
+    )
+    async with AsyncSessionLocal() as db:
+        error = f"Gave up after {settings.SIGNING_JOB_MAX_ATTEMPTS} attempts"
+        failed = await db.execute(
+            update(SigningJob)
+            .where(stale, SigningJob.attempts >= settings.SIGNING_JOB_MAX_ATTEMPTS)
+            .values(status=SigningJobStatus.FAILED.value, error=error, completed_at=datetime.utcnow())
+            .returning(SigningJob.id, SigningJob.organization_id)
+            .execution_options(synchronize_session=False)
+        )
+        failed = failed.all()
+        await db.execute(
+            update(SigningJob)
+            .where(stale)
+            .values(status=SigningJobStatus.QUEUED.value)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        result = await db.execute(
+            select(SigningJob.id)
+            .where(SigningJob.status == SigningJobStatus.QUEUED.value)
+            .order_by(SigningJob.created_at)
+            .limit(settings.SIGNING_JOB_WORKERS * 50)
+        )
+        queued = list(result.scalars().all())
+    
+    for job_id, organization_id in failed:
+        await notify_signing_job(
+            job_id=str(job_id),
+            status=SigningJobStatus.FAILED.value,
+            error=error,
+            organization_id=str(organization_id) if organization_id else None
+        )
+    return queued
+
+
+# Background workers for /jobs, started from the app lifespan
+signing_jobs = JobWorkerPool(
+    "signing",
+    process=_process_signing_job,
+    recover=_recover_signing_jobs,
+    workers=settings.SIGNING_JOB_WORKERS,
+    poll_interval=settings.SIGNING_JOB_POLL_SECONDS
+)
+
+
+@router.post("/jobs", response_model=SigningJobResponse, status_code=202)
+async def create_signing_job(
+    request: SigningJobCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Submit a signing job and return immediately.
+    Poll GET /jobs/{id} or listen for signing.completed / signing.failed on
+    /api/ws/events for the result.
+    """
+    configs, keys = await _load_signing_targets(db, [request.config_id])
+    config, _ = _select_signing_target(request.config_id, configs, keys)
+    
+    if request.digest is not None:
+        if not request.hash_algorithm or request.hash_algorithm.upper() != config.hash_algorithm.upper():
+            raise HTTPException(
+                status_code=400,
+                detail=f"Signing config requires {config.hash_algorithm} digests"
+            )
+        digest = _decode_digest(request.digest, config.hash_algorithm)
+    elif request.data is not None:
+        digest = _hash_payload(request.data, config.hash_algorithm)
+    else:
+        raise HTTPException(status_code=400, detail="Either data or digest is required")
+    
+    job = SigningJob(
+        config_id=config.id,
+        organization_id=config.organization_id,
+        digest=digest.hex(),
+        hash_algorithm=config.hash_algorithm
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    
+    signing_jobs.submit(job.id)
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=SigningJobResponse)
+async def get_signing_job(job_id: UUID, db: AsyncSession = Depends(get_db)):
+    """Get the status and result of a signing job"""
+    job = await db.get(SigningJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Signing job not found")
+    return job
+
+
+@router.get("/scheduler")
+async def scheduler_stats():
+    """Signing queue depth and wait times per org and HSM slot, plus reuse and timestamping metrics"""
+    return {
+        **scheduler.stats(),
+        "jobs": signing_jobs.stats(),
+        "signature_reuse": signature_store.stats(),
+        "timestamping": get_timestamper().stats()
+    }
+
+
 @router.post("/verify")
 async def verify_signature(
     request: VerifyRequest,
@@ -109,8 +916,146 @@ async def verify_signature(
     if not key:
         raise HTTPException(status_code=404, detail="Key not found")
     
-    # Mock verification
-    data_bytes = base64.b64decode(request.data)
-    expected = hashlib.sha256(data_bytes + key.fingerprint.encode()).hexdigest()
+    digest = _hash_payload(request.data, request.hash_algorithm)
+    try:
+        signature = bytes.fromhex(request.signature)
+    except ValueError:
+        return {"valid": False}
+    
+    if verified_signatures.is_verified(key.id, digest, signature, request.hash_algorithm):
+        return {"valid": True}
+    
+    try:
+        valid = await get_signer().verify_digest(key, digest, signature, request.hash_algorithm)
+    except SignerError as e:
+        raise HTTPException(status_code=500, detail=f"Verification failed: {e}")
+    
+    if valid:
+        verified_signatures.add(key.id, digest, signature, request.hash_algorithm)
+    return {"valid": valid}
+
+
+@router.post("/verify/manifest-proof")
+async def verify_manifest_proof(
+    request: ManifestProofVerifyRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Verify one file of a signed manifest: its inclusion proof and the root signature"""
+    key = await db.get(Pkcs11Key, request.key_id)
+    if not key:
+        raise HTTPException(status_code=404, detail="Key not found")
+    
+    digest = _decode_digest(request.digest, request.hash_algorithm)
+    root = _decode_digest(request.root, request.hash_algorithm)
+    try:
+        proof = [(step.position, bytes.fromhex(step.hash)) for step in request.proof]
+        signature = bytes.fromhex(request.signature)
+    except ValueError:
+        return {"valid": False}
+    
+    if not verify_proof(digest, proof, root, hash_name(request.hash_algorithm)):
+        return {"valid": False}
+    
+    if verified_signatures.is_verified(key.id, root, signature, request.hash_algorithm):
+        return {"valid": True}
+    
+    try:
+        valid = await get_signer().verify_digest(key, root, signature, request.hash_algorithm)
+    except SignerError as e:
+        raise HTTPException(status_code=500, detail=f"Verification failed: {e}")
+    
+    if valid:
+        verified_signatures.add(key.id, root, signature, request.hash_algorithm)
+    return {"valid": valid}
+
+
+@router.post("/verify/batch", response_model=VerifyBatchResponse)
+async def verify_batch(
+    request: VerifyBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Verify many signatures in one call.
+    Keys are loaded with one query and items are verified in groups per key
+    on the signer's worker pool. Signatures already known to be valid are
+    answered from the verification cache.
+    """
+    if len(request.items) > settings.VERIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds {settings.VERIFY_BATCH_MAX_ITEMS} items"
+        )
+    
+    key_result = await db.execute(
+        select(Pkcs11Key).where(Pkcs11Key.id.in_({item.key_id for item in request.items}))
+    )
+    keys = {key.id: key for key in key_result.scalars().all()}
+    loop = asyncio.get_running_loop()
+    results = [
+        VerifyBatchResult(index=index, key_id=item.key_id)
+        for index, item in enumerate(request.items)
+    ]
+    groups: Dict[Tuple[UUID, str], List[Tuple[int, bytes, bytes]]] = {}
+    
+    async def prepare_item(index: int, item: VerifyBatchItem):
+        result = results[index]
+        key = keys.get(item.key_id)
+        if not key:
+            result.error = "Key not found"
+            return
+        result.key_status = key.status
+        try:
+            if item.digest is not None:
+                digest = _decode_digest(item.digest, item.hash_algorithm)
+            elif item.data is not None:
+                digest = await loop.run_in_executor(
+                    None, _hash_payload, item.data, item.hash_algorithm
+                )
+            else:
+                result.error = "Either data or digest is required"
+                return
+        except HTTPException as e:
+            result.error = e.detail
+            return
+        try:
+            signature = bytes.fromhex(item.signature)
+        except ValueError:
+            return
+        
+        if verified_signatures.is_verified(key.id, digest, signature, item.hash_algorithm):
+            result.valid = True
+            return
+        groups.setdefault((key.id, item.hash_algorithm.upper()), []).append(
+            (index, digest, signature)
+        )
     
-    return {"valid": request.signature == expected}
+    await asyncio.gather(
+        *(prepare_item(index, item) for index, item in enumerate(request.items))
+    )
+    
+    async def verify_group(key_id: UUID, hash_algorithm: str, items: List[Tuple[int, bytes, bytes]]):
+        try:
+            verdicts = await get_signer().verify_digests(
+                keys[key_id], [(digest, signature) for _, digest, signature in items], hash_algorithm
+            )
+        except SignerError as e:
+            for index, _, _ in items:
+                results[index].error = f"Verification failed: {e}"
+            return
+        for (index, digest, signature), valid in zip(items, verdicts):
+            results[index].valid = valid
+            if valid:
+                verified_signatures.add(key_id, digest, signature, hash_algorithm)
+    
+    await asyncio.gather(
+        *(verify_group(key_id, hash_algorithm, items) for (key_id, hash_algorithm), items in groups.items())
+    )
+    
+    failed = sum(1 for result in results if result.error)
+    valid = sum(1 for result in results if result.valid)
+    return VerifyBatchResponse(
+        results=results,
+        valid=valid,
+        invalid=len(results) - valid - failed,
+        failed=failed
+    )
@@ -1,34 +1,35 @@
 """
 KT Secure - Users API
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
 from ..models import User
 from ..schemas import UserCreate, UserUpdate, UserResponse
+from ..utils.pagination import fetch_page
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[UserResponse])
 async def list_users(
+    response: Response,
     organization_id: UUID = None,
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
+    skip: int = 0,
     db: AsyncSession = Depends(get_db)
 ):
-    """List all users, optionally filtered by organization"""
+    """List all users, optionally filtered by organization (cursor paginated, see X-Next-Cursor)"""
     query = select(User)
     if organization_id:
         query = query.where(User.organization_id == organization_id)
-    query = query.offset(skip).limit(limit)
     
-    result = await db.execute(query)
-    return result.scalars().all()
+    return await fetch_page(db, query, User, response, cursor, limit, skip=skip)
 
 
 @router.post("/invite", response_model=UserResponse)
@@ -162,6 +162,27 @@ async def notify_approval_completed(
         await manager.broadcast(notification)
 
 
+async def notify_approval_expired(
+    request_id: str,
+    title: str,
+    organization_id: str = None
+):
+    """Send notification when a pending approval request expires."""
+    notification = create_notification(
+        event_type=NotificationEvent.APPROVAL_EXPIRED,
+        title="Request Expired",
+        message=f"'{title}' expired before reaching quorum",
+        entity_type="approval_request",
+        entity_id=request_id,
+        data={"status": "expired"}
+    )
+    
+    if organization_id:
+        await manager.send_to_organization(notification, organization_id)
+    else:
+        await manager.broadcast(notification)
+
+
 async def notify_organization_status(
     org_id: str,
     org_name: str,
@@ -210,3 +231,26 @@ async def notify_key_event(
         await manager.send_to_organization(notification, organization_id)
     else:
         await manager.broadcast(notification)
+
+
+async def notify_signing_job(
+    job_id: str,
+    status: str,
+    error: str = None,
+    organization_id: str = None
+):
+    """Send notification when an asynchronous signing job finishes."""
+    completed = status == "completed"
+    notification = create_notification(
+        event_type=NotificationEvent.SIGNING_COMPLETED if completed else NotificationEvent.SIGNING_FAILED,
+        title="Signing Completed" if completed else "Signing Failed",
+        message=f"Signing job {job_id} {status}" + (f": {error}" if error else ""),
+        entity_type="signing_job",
+        entity_id=job_id,
+        data={"status": status, "error": error}
+    )
+    
+    if organization_id:
+        await manager.send_to_organization(notification, organization_id)
+    else:
+        await manager.broadcast(notification)
@@ -0,0 +1,356 @@
+"""
+KT Secure - Approved Operation Executor
+Runs the operations behind approved quorum requests from a durable outbox
+"""
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+import json
+import logging
+
+from pydantic import ValidationError
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models import Organization, Pkcs11Key, SigningConfig, User
+from ..models.quorum import ApprovalOperation, ApprovalRequest, ApprovalType, OperationStatus
+from ..schemas import KeyCreate, SigningConfigCreate
+from .audit import audit
+from .jobs import JobWorkerPool
+from .key_pool import key_pool, key_spec
+from .policy_cache import QuorumPolicyResolver, quorum_policies
+from .signer import SignerError, get_signer
+from .signing_cache import signing_targets
+
+logger = logging.getLogger(__name__)
+
+# Roles from least to most privileged, as checked by the API's require_* dependencies
+ROLES = ("user", "crypto_admin", "admin", "super_admin")
+
+# Coroutines to run once the operation's transaction has committed
+AfterCommit = List[Callable[[], Awaitable[None]]]
+Handler = Callable[[AsyncSession, ApprovalRequest, dict, AfterCommit], Awaitable[dict]]
+
+
+class OperationError(Exception):
+    """Raised by a handler for a failure that retrying will not fix."""
+
+
+HANDLERS: Dict[str, Handler] = {}
+
+
+def handler(approval_type: ApprovalType):
+    """Register the handler that executes an approval type."""
+    def register(func: Handler) -> Handler:
+        HANDLERS[approval_type.value] = func
+        return func
+    return register
+
+
+class ApprovalExecutor:
+    """
+    Executes approved operations from the approval_operations outbox.
+
+    cast_vote writes the outbox row in the transaction that approves the
+    request, so an approval can neither be lost nor enqueued twice. Workers
+    claim a row (pending -> running, attempts + 1) and run its handler in a
+    new transaction that also marks the row completed, guarded by the
+    attempt number it claimed: if the row was requeued as stale and claimed
+    again meanwhile, this run's writes are rolled back. Database effects
+    therefore apply exactly once; work outside the database (HSM keygen)
+    may repeat after a crash, leaving an unused key behind.
+
+    Failures are retried with exponential backoff up to `max_attempts`;
+    an OperationError fails the operation at once. A request approved by
+    fewer than `min_approvals` votes only runs if a quorum policy applies
+    to it, so a requester cannot pick their own quorum of one. At most
+    `workers` operations run at a time per API worker.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Handler],
+        on_finished: Optional[Callable[[ApprovalRequest, ApprovalOperation], Awaitable[None]]] = None,
+        workers: int = 2,
+        poll_interval: float = 5.0,
+        max_attempts: int = 5,
+        retry_delay: float = 30.0,
+        stale_after: float = 600.0,
+        min_approvals: int = 2,
+        policies: QuorumPolicyResolver = quorum_policies,
+        session_factory=AsyncSessionLocal
+    ):
+        self.handlers = handlers
+        self.on_finished = on_finished
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after
+        self.min_approvals = min_approvals
+        self.policies = policies
+        self._session_factory = session_factory
+        self.pool = JobWorkerPool(
+            "approval",
+            process=self.process,
+            recover=self.recover,
+            workers=workers,
+            poll_interval=poll_interval
+        )
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def submit(self, request_id: UUID) -> bool:
+        """Run an operation now instead of at the next poll."""
+        return self.pool.submit(request_id)
+
+    async def process(self, request_id: UUID):
+        """Claim an operation and execute it."""
+        now = datetime.utcnow()
+        async with self._session_factory() as db:
+            claimed = await db.execute(
+                update(ApprovalOperation)
+                .where(
+                    ApprovalOperation.request_id == request_id,
+                    ApprovalOperation.status == OperationStatus.PENDING.value,
+                    ApprovalOperation.available_at <= now
+                )
+                .values(
+                    status=OperationStatus.RUNNING.value,
+                    started_at=now,
+                    attempts=ApprovalOperation.attempts + 1
+                )
+                .returning(ApprovalOperation.attempts)
+                .execution_options(synchronize_session=False)
+            )
+            attempt = claimed.scalar_one_or_none()
+            if attempt is None:
+                # Already taken by another worker, finished or backing off
+                await db.rollback()
+                return
+            await db.commit()
+
+        async with self._session_factory() as db:
+            request = await db.get(ApprovalRequest, request_id)
+            after_commit: AfterCommit = []
+            try:
+                func = self.handlers.get(request.approval_type)
+                if func is None:
+                    raise OperationError(f"No handler for approval type {request.approval_type}")
+                await self._check_quorum(db, request)
+                data = json.loads(request.entity_data) if request.entity_data else {}
+                result = await func(db, request, data, after_commit)
+                done = await self._finish(
+                    db, request_id, attempt,
+                    status=OperationStatus.COMPLETED.value,
+                    result=json.dumps(result, default=str),
+                    error=None,
+                    completed_at=datetime.utcnow()
+                )
+                if not done:
+                    await db.rollback()
+                    return
+                await db.commit()
+                self.completed += 1
+            except Exception as e:
+                await db.rollback()
+                after_commit = []
+                permanent = isinstance(e, OperationError)
+                if not permanent:
+                    logger.warning("Approved operation %s failed", request_id, exc_info=True)
+                retry = not permanent and attempt < self.max_attempts
+                done = await self._finish(
+                    db, request_id, attempt,
+                    status=OperationStatus.PENDING.value if retry else OperationStatus.FAILED.value,
+                    error=str(e) or type(e).__name__,
+                    available_at=datetime.utcnow() + timedelta(seconds=self.retry_delay * 2 ** (attempt - 1)),
+                    completed_at=None if retry else datetime.utcnow()
+                )
+                await db.commit()
+                if not done:
+                    return
+                if retry:
+                    self.retried += 1
+                    return
+                self.failed += 1
+
+            for callback in after_commit:
+                try:
+                    await callback()
+                except Exception:
+                    logger.exception("Post-commit step of operation %s failed", request_id)
+            if self.on_finished:
+                request = await db.get(ApprovalRequest, request_id, populate_existing=True)
+                operation = await db.get(ApprovalOperation, request_id, populate_existing=True)
+                await self.on_finished(request, operation)
+
+    async def _check_quorum(self, db: AsyncSession, request: ApprovalRequest):
+        """Refuse a request whose quorum came from the requester alone and is too small."""
+        if request.required_approvals >= self.min_approvals:
+            return
+        if await self.policies.resolve(db, request.organization_id, request.approval_type) is None:
+            raise OperationError(
+                f"No quorum policy applies and {request.required_approvals} approvals "
+                f"are below the minimum of {self.min_approvals}"
+            )
+
+    async def _finish(self, db: AsyncSession, request_id: UUID, attempt: int, **values) -> bool:
+        """Move a claimed operation on, unless another run has claimed it since."""
+        result = await db.execute(
+            update(ApprovalOperation)
+            .where(
+                ApprovalOperation.request_id == request_id,
+                ApprovalOperation.status == OperationStatus.RUNNING.value,
+                ApprovalOperation.attempts == attempt
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    async def recover(self) -> List[UUID]:
+        """Requeue operations stuck in running and list the due ones."""
+        now = datetime.utcnow()
+        async with self._session_factory() as db:
+            await db.execute(
+                update(ApprovalOperation)
+                .where(ApprovalOperation.status == OperationStatus.RUNNING.value)
+                .where(or_(
+                    ApprovalOperation.started_at.is_(None),
+                    ApprovalOperation.started_at < now - timedelta(seconds=self.stale_after)
+                ))
+                .values(status=OperationStatus.PENDING.value, available_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            result = await db.execute(
+                select(ApprovalOperation.request_id)
+                .where(
+                    ApprovalOperation.status == OperationStatus.PENDING.value,
+                    ApprovalOperation.available_at <= now
+                )
+                .order_by(ApprovalOperation.available_at)
+                .limit(self.pool.workers * 50)
+            )
+            return list(result.scalars().all())
+
+    async def start(self):
+        await self.pool.start()
+
+    async def stop(self):
+        await self.pool.stop()
+
+    def stats(self) -> dict:
+        return {
+            **self.pool.stats(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+# Handlers. Each one runs inside the operation's transaction and returns a
+# JSON-serializable result; entity_data holds the operation's parameters.
+
+def _validate(schema, data: dict):
+    try:
+        return schema(**data)
+    except ValidationError as e:
+        raise OperationError(f"Invalid entity_data: {e}")
+
+
+async def _get(db: AsyncSession, model, id: UUID, name: str):
+    entity = await db.get(model, id)
+    if entity is None:
+        raise OperationError(f"{name} {id} not found")
+    return entity
+
+
+@handler(ApprovalType.KEY_GENERATION)
+async def generate_key(db: AsyncSession, request: ApprovalRequest, data: dict, after_commit: AfterCommit) -> dict:
+    """Generate the key described by entity_data (a KeyCreate)."""
+    key = _validate(KeyCreate, {"organization_id": request.organization_id, **data})
+    try:
+        spec = key_spec(key.algorithm, key.key_size, key.curve, key.hsm_slot)
+    except SignerError:
+        # Not a pooled algorithm; whether it can be generated is up to the signer
+        spec = None
+    fingerprint = await key_pool.claim(db, spec) if spec is not None else None
+    if fingerprint is None:
+        try:
+            fingerprint = await get_signer().generate_key(
+                key.algorithm, key.key_size, key.curve, key.hsm_slot
+            )
+        except SignerError as e:
+            raise OperationError(str(e))
+
+    db_key = Pkcs11Key(**key.model_dump(), fingerprint=fingerprint)
+    db.add(db_key)
+    await db.flush()
+    key_id = db_key.id
+    after_commit.append(lambda: audit.record(
+        "key_generated",
+        entity_type="key",
+        entity_id=key_id,
+        organization_id=key.organization_id,
+        changes={"name": key.name, "algorithm": key.algorithm, "fingerprint": fingerprint,
+                 "approval_request_id": str(request.id)}
+    ))
+    return {"key_id": key_id, "fingerprint": fingerprint}
+
+
+@handler(ApprovalType.KEY_REVOCATION)
+async def revoke_key(db: AsyncSession, request: ApprovalRequest, data: dict, after_commit: AfterCommit) -> dict:
+    """Revoke the key identified by entity_id."""
+    key = await _get(db, Pkcs11Key, request.entity_id, "Key")
+    key.status = "revoked"
+    key_id, organization_id, request_id = key.id, key.organization_id, request.id
+    after_commit.append(lambda: signing_targets.invalidate_key(key_id))
+    after_commit.append(lambda: audit.record(
+        "key_revoked",
+        entity_type="key",
+        entity_id=key_id,
+        organization_id=organization_id,
+        changes={"approval_request_id": str(request_id)}
+    ))
+    return {"key_id": key.id}
+
+
+@handler(ApprovalType.SIGNING_CONFIG_CREATE)
+async def create_signing_config(db: AsyncSession, request: ApprovalRequest, data: dict, after_commit: AfterCommit) -> dict:
+    """Create the signing config described by entity_data (a SigningConfigCreate)."""
+    config = _validate(SigningConfigCreate, {"organization_id": request.organization_id, **data})
+    db_config = SigningConfig(**config.model_dump())
+    db.add(db_config)
+    await db.flush()
+    config_id = db_config.id
+    after_commit.append(lambda: signing_targets.invalidate_config(config_id))
+    return {"config_id": config_id}
+
+
+@handler(ApprovalType.ORGANIZATION_APPROVAL)
+async def approve_organization(db: AsyncSession, request: ApprovalRequest, data: dict, after_commit: AfterCommit) -> dict:
+    """Activate the organization identified by entity_id."""
+    org = await _get(db, Organization, request.entity_id, "Organization")
+    org.status = "active"
+    return {"organization_id": org.id}
+
+
+@handler(ApprovalType.USER_ROLE_CHANGE)
+async def change_user_role(db: AsyncSession, request: ApprovalRequest, data: dict, after_commit: AfterCommit) -> dict:
+    """
+    Give the user identified by entity_id the role in entity_data. Neither
+    the new role nor the user's current one may rank above the requester's.
+    """
+    role = data.get("role")
+    if role not in ROLES:
+        raise OperationError(f"entity_data.role must be one of {', '.join(ROLES)}")
+    requester = await _get(db, User, request.created_by_id, "Requester")
+    if requester.role not in ROLES:
+        raise OperationError(f"Requester has unknown role {requester.role}")
+    user = await _get(db, User, request.entity_id, "User")
+    rank = ROLES.index(requester.role)
+    if ROLES.index(role) > rank or (user.role in ROLES and ROLES.index(user.role) > rank):
+        raise OperationError(f"A {requester.role} cannot change a {user.role} to {role}")
+    user.role = role
+    return {"user_id": user.id, "role": user.role}
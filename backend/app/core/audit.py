@@ -0,0 +1,176 @@
+"""
+KT Secure - Audit Service
+Write-behind audit logging: entries are queued in memory and bulk-inserted
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import insert
+
+from ..config import get_settings
+from ..database import AsyncSessionLocal
+from ..models import AuditLog
+from .audit_chain import append_entries
+from .audit_rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class AuditService:
+    """
+    Bounded queue of audit entries drained by a background flusher.
+
+    `record` stamps the entry (id, created_at) and queues it, so auditing
+    adds no database round trip to the request. The flusher writes up to
+    `batch_size` entries per multi-row INSERT, waiting at most
+    `flush_interval` seconds to fill a batch. When the queue is full,
+    `record` waits for room: a slow database slows callers down instead of
+    growing memory or dropping entries. Each batch is linked onto the
+    audit hash chain (core/audit_chain.py) and counted into the activity
+    rollups (core/audit_rollups.py) in the transaction that inserts it.
+    A batch that fails is retried with backoff capped at `max_backoff`
+    seconds until it is written, never dropped: during a database outage
+    the queue fills and `record` pushes back on callers until it recovers.
+    `stop` flushes whatever is queued.
+    """
+
+    def __init__(
+        self,
+        max_queued: int = 100000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_backoff: float = 10.0,
+        session_factory=AsyncSessionLocal
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.written = 0
+        self.failures = 0
+        self.batches = 0
+
+    async def record(
+        self,
+        action: str,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+        organization_id: Optional[UUID] = None,
+        changes: Optional[Dict[str, Any]] = None,
+        ip_address: Optional[str] = None
+    ):
+        """Queue an audit entry; waits only if the queue is full."""
+        await self._queue.put({
+            "id": uuid.uuid4(),
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "user_id": user_id,
+            "organization_id": organization_id,
+            "changes": changes,
+            "ip_address": ip_address,
+            "created_at": datetime.utcnow(),
+        })
+        self.recorded += 1
+
+    async def _write(self, entries: List[dict]):
+        attempt = 0
+        while True:
+            try:
+                async with self._session_factory() as db:
+                    await append_entries(db, entries)
+                    await db.execute(insert(AuditLog), entries)
+                    await apply_rollups(db, entries)
+                    await db.commit()
+                self.written += len(entries)
+                self.batches += 1
+                return
+            except Exception:
+                attempt += 1
+                self.failures += 1
+                logger.warning("Audit flush of %d entries failed (attempt %d)", len(entries), attempt, exc_info=True)
+                await asyncio.sleep(min(0.1 * 2 ** attempt, self.max_backoff))
+
+    def _take(self, batch: List[dict]):
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            self._take(batch)
+            while len(batch) < self.batch_size and loop.time() < deadline:
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                self._take(batch)
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def flush(self) -> int:
+        """Write everything queued now; for use while the flusher is stopped."""
+        count = 0
+        while not self._queue.empty():
+            batch: List[dict] = []
+            self._take(batch)
+            await self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+            count += len(batch)
+        return count
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: Optional[float] = 10.0):
+        """Flush queued entries (up to timeout), then stop the flusher."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Audit flusher stopped with %d entries queued", self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "queued": self._queue.qsize(),
+            "recorded": self.recorded,
+            "written": self.written,
+            "failures": self.failures,
+            "batches": self.batches,
+        }
+
+
+settings = get_settings()
+
+# Singleton instance
+audit = AuditService(
+    max_queued=settings.AUDIT_QUEUE_MAX_ENTRIES,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_MS / 1000
+)
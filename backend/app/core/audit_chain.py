@@ -0,0 +1,354 @@
+"""
+KT Secure - Audit Hash Chain
+Tamper-evident audit log: chained entry hashes, signed checkpoints, incremental verification
+"""
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+from uuid import UUID
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..database import AsyncSessionLocal
+from ..models import AuditCheckpoint, AuditLog, Pkcs11Key
+from .signer import SignerError, get_signer
+
+logger = logging.getLogger(__name__)
+
+GENESIS_HASH = "0" * 64
+
+# pg_advisory_xact_lock key serializing appends to the chain across workers
+AUDIT_CHAIN_LOCK_ID = 0x4B5302
+
+HMAC_ALGORITHM = "hmac-sha256"
+
+# Columns covered by entry_hash, in the order they are fetched for verification
+CHAINED_COLUMNS = (
+    "sequence", "id", "action", "user_id", "organization_id", "entity_type",
+    "entity_id", "changes", "ip_address", "created_at"
+)
+
+
+def _canonical(name: str, value):
+    if value is None or name in ("sequence", "changes"):
+        return value
+    if name == "created_at":
+        return value.isoformat()
+    return str(value)  # UUIDs, and INET values as asyncpg returns them
+
+
+def entry_hash(prev_hash: str, entry) -> str:
+    """SHA-256 over the previous hash and a canonical JSON form of the entry."""
+    canonical = json.dumps(
+        {name: _canonical(name, entry[name]) for name in CHAINED_COLUMNS},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(bytes.fromhex(prev_hash) + canonical.encode()).hexdigest()
+
+
+def checkpoint_digest(sequence: int, entry_hash: str) -> bytes:
+    """The SHA-256 digest a checkpoint signs."""
+    return hashlib.sha256(sequence.to_bytes(8, "big") + bytes.fromhex(entry_hash)).digest()
+
+
+async def _head(db: AsyncSession):
+    """(sequence, entry_hash) of the newest chained entry, or None."""
+    result = await db.execute(
+        select(AuditLog.sequence, AuditLog.entry_hash)
+        .where(AuditLog.sequence.isnot(None))
+        .order_by(AuditLog.sequence.desc())
+        .limit(1)
+    )
+    return result.first()
+
+
+async def append_entries(db: AsyncSession, entries: List[dict]):
+    """
+    Link entries onto the chain: fills sequence, prev_hash and entry_hash.
+    Must run in the transaction that inserts them. On PostgreSQL it takes
+    a transaction-level advisory lock, so appends from every worker are
+    serialized and committed in sequence order.
+    """
+    if db.bind.dialect.name == "postgresql":
+        await db.execute(select(func.pg_advisory_xact_lock(AUDIT_CHAIN_LOCK_ID)))
+    head = await _head(db)
+    sequence, prev_hash = head if head else (0, GENESIS_HASH)
+    for entry in entries:
+        sequence += 1
+        entry["sequence"] = sequence
+        entry["prev_hash"] = prev_hash
+        entry["entry_hash"] = prev_hash = entry_hash(prev_hash, entry)
+
+
+class ChainVerification(NamedTuple):
+    ok: bool
+    from_sequence: int  # Last entry trusted without rehashing (0 = genesis)
+    to_sequence: int
+    entries: int
+    checkpoints: int
+    error: Optional[str] = None
+    broken_at: Optional[int] = None  # Sequence where verification failed
+    checkpointed: bool = True  # False if the head could not be signed (see `error`)
+
+
+class AuditChain:
+    """
+    Signs checkpoints of the audit chain and verifies it incrementally.
+
+    Every `interval` seconds the current head (sequence, entry_hash) is
+    signed and stored in audit_checkpoints, with the HSM key `key_id` when
+    configured and an HMAC under `secret` otherwise. Rewriting the chain
+    after an edit then no longer matches the signed hashes.
+
+    `verify` starts from the newest checkpoint that an earlier run
+    verified and streams only the entries after it, `chunk_size` at a time,
+    each chunk in its own short transaction. It detects edited entries
+    (hash mismatch), deleted ones (sequence gap or broken link), checkpoints
+    that no longer match the chain and checkpoints past the end of it
+    (truncation). On success, the checkpoints it covered are marked
+    verified and the head becomes a new verified checkpoint, so the next
+    run starts there. If the head cannot be signed, the result is still ok
+    but not checkpointed: the next run starts from the previous verified
+    checkpoint and `seal` cannot cover the new entries yet.
+    `full=True` rehashes from the first entry still stored.
+    """
+
+    def __init__(
+        self,
+        interval: float = 3600.0,
+        chunk_size: int = 10000,
+        key_id: Optional[UUID] = None,
+        secret: str = "",
+        session_factory=AsyncSessionLocal
+    ):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.key_id = key_id
+        self._secret = secret.encode()
+        self._session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self.checkpoints = 0
+        self.errors = 0
+
+    async def _sign(self, db: AsyncSession, sequence: int, entry_hash: str) -> dict:
+        digest = checkpoint_digest(sequence, entry_hash)
+        if self.key_id is None:
+            signature = hmac.new(self._secret, digest, hashlib.sha256).digest()
+            return {"algorithm": HMAC_ALGORITHM, "key_id": None, "signature": signature.hex()}
+        key = await db.get(Pkcs11Key, self.key_id)
+        if key is None or key.status != "active":
+            raise SignerError(f"Audit checkpoint key {self.key_id} is not an active key")
+        signature = await get_signer().sign_digest(key, digest, "SHA-256")
+        return {"algorithm": key.algorithm, "key_id": key.id, "signature": signature.hex()}
+
+    async def _signature_valid(self, db: AsyncSession, checkpoint: AuditCheckpoint) -> bool:
+        digest = checkpoint_digest(checkpoint.sequence, checkpoint.entry_hash)
+        signature = bytes.fromhex(checkpoint.signature)
+        if checkpoint.algorithm == HMAC_ALGORITHM:
+            expected = hmac.new(self._secret, digest, hashlib.sha256).digest()
+            return hmac.compare_digest(expected, signature)
+        key = await db.get(Pkcs11Key, checkpoint.key_id) if checkpoint.key_id else None
+        if key is None:
+            return False
+        return await get_signer().verify_digest(key, digest, signature, "SHA-256")
+
+    async def _add_checkpoint(
+        self,
+        db: AsyncSession,
+        sequence: int,
+        entry_hash: str,
+        verified_at: Optional[datetime] = None
+    ) -> Optional[AuditCheckpoint]:
+        checkpoint = AuditCheckpoint(
+            sequence=sequence,
+            entry_hash=entry_hash,
+            verified_at=verified_at,
+            **await self._sign(db, sequence, entry_hash)
+        )
+        db.add(checkpoint)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Another worker checkpointed the same head
+            await db.rollback()
+            return None
+        self.checkpoints += 1
+        return checkpoint
+
+    async def checkpoint(self) -> Optional[AuditCheckpoint]:
+        """Sign the current head, unless it is already checkpointed."""
+        async with self._session_factory() as db:
+            head = await _head(db)
+            latest = await db.scalar(select(func.max(AuditCheckpoint.sequence)))
+            if head is None or (latest is not None and latest >= head.sequence):
+                return None
+            return await self._add_checkpoint(db, head.sequence, head.entry_hash)
+
+    async def seal(self, sequence: int) -> bool:
+        """
+        Make sure a verified checkpoint exists at `sequence` before the
+        entries up to it are archived, so the chain can still be verified
+        from there. Refuses (False) if the entry is not yet covered by a
+        verification run.
+        """
+        async with self._session_factory() as db:
+            verified = await db.scalar(
+                select(func.max(AuditCheckpoint.sequence)).where(AuditCheckpoint.verified_at.isnot(None))
+            )
+            if verified is None or verified < sequence:
+                return False
+            if await db.scalar(select(AuditCheckpoint.id).where(AuditCheckpoint.sequence == sequence)):
+                return True
+            stored = await db.scalar(select(AuditLog.entry_hash).where(AuditLog.sequence == sequence))
+            if stored is None:
+                return False
+            try:
+                await self._add_checkpoint(db, sequence, stored, verified_at=datetime.utcnow())
+            except SignerError:
+                self.errors += 1
+                logger.warning("Could not sign the audit checkpoint at %d", sequence, exc_info=True)
+                return False
+            return True
+
+    async def verify(self, full: bool = False) -> ChainVerification:
+        """Verify the chain since the last verified checkpoint (or all of it)."""
+        async with self._session_factory() as db:
+            first = await db.scalar(select(func.min(AuditLog.sequence)))
+            if full:
+                # Entries before the first one left were archived (see
+                # core/audit_partitions.py), sealed by a checkpoint at the last one
+                start = None
+                if first and first > 1:
+                    start = await db.scalar(select(AuditCheckpoint).where(AuditCheckpoint.sequence == first - 1))
+                    if start is None:
+                        return ChainVerification(False, 0, 0, 0, 0, "entries are missing", 1)
+            else:
+                start = await db.scalar(
+                    select(AuditCheckpoint)
+                    .where(AuditCheckpoint.verified_at.isnot(None))
+                    .order_by(AuditCheckpoint.sequence.desc())
+                    .limit(1)
+                )
+            from_sequence = start.sequence if start else 0
+            result = await db.execute(
+                select(AuditCheckpoint)
+                .where(AuditCheckpoint.sequence >= from_sequence)
+                .order_by(AuditCheckpoint.sequence)
+            )
+            checkpoints = list(result.scalars().all())
+            head = await _head(db)
+            head_sequence = head.sequence if head else 0
+
+            def failed(error: str, at: Optional[int], entries: int = 0) -> ChainVerification:
+                return ChainVerification(False, from_sequence, head_sequence, entries, len(checkpoints), error, at)
+
+            for checkpoint in checkpoints:
+                if not await self._signature_valid(db, checkpoint):
+                    return failed("checkpoint signature is invalid", checkpoint.sequence)
+            if checkpoints and checkpoints[-1].sequence > head_sequence:
+                return failed("entries after a checkpoint are missing", head_sequence + 1)
+
+            if start and first is not None and start.sequence >= first:
+                stored = await db.scalar(select(AuditLog.entry_hash).where(AuditLog.sequence == start.sequence))
+                if stored != start.entry_hash:
+                    return failed("entry at the starting checkpoint was changed", start.sequence)
+
+        sequence, prev_hash = (start.sequence, start.entry_hash) if start else (0, GENESIS_HASH)
+        expected = {c.sequence: c.entry_hash for c in checkpoints}
+        columns = [AuditLog.__table__.c[name] for name in CHAINED_COLUMNS]
+        entries = 0
+        while sequence < head_sequence:
+            async with self._session_factory() as db:
+                result = await db.execute(
+                    select(*columns, AuditLog.prev_hash, AuditLog.entry_hash)
+                    .where(AuditLog.sequence > sequence, AuditLog.sequence <= head_sequence)
+                    .order_by(AuditLog.sequence)
+                    .limit(self.chunk_size)
+                )
+                rows = result.mappings().all()
+            if not rows:
+                return failed("entries at the end of the chain are missing", sequence + 1, entries)
+            for row in rows:
+                if row["sequence"] != sequence + 1:
+                    return failed("entries are missing", sequence + 1, entries)
+                if row["prev_hash"] != prev_hash:
+                    return failed("entry is not linked to its predecessor", row["sequence"], entries)
+                prev_hash = entry_hash(prev_hash, row)
+                if row["entry_hash"] != prev_hash:
+                    return failed("entry was changed", row["sequence"], entries)
+                sequence = row["sequence"]
+                if expected.get(sequence, prev_hash) != prev_hash:
+                    return failed("chain does not match a signed checkpoint", sequence, entries)
+                entries += 1
+
+        now = datetime.utcnow()
+        async with self._session_factory() as db:
+            if checkpoints:
+                await db.execute(
+                    update(AuditCheckpoint)
+                    .where(AuditCheckpoint.id.in_([c.id for c in checkpoints]))
+                    .values(verified_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            if head_sequence and head_sequence not in expected:
+                try:
+                    await self._add_checkpoint(db, head_sequence, prev_hash, verified_at=now)
+                except SignerError as e:
+                    self.errors += 1
+                    logger.warning("Audit chain verified but its head could not be signed", exc_info=True)
+                    return ChainVerification(
+                        True, from_sequence, head_sequence, entries, len(checkpoints),
+                        f"verified, checkpoint not written: {e}", checkpointed=False
+                    )
+        return ChainVerification(True, from_sequence, head_sequence, entries, len(checkpoints))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.checkpoint()
+            except Exception:
+                self.errors += 1
+                logger.exception("Audit checkpoint failed")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "checkpoints": self.checkpoints,
+            "errors": self.errors,
+        }
+
+
+settings = get_settings()
+
+# Singleton instance
+audit_chain = AuditChain(
+    interval=settings.AUDIT_CHECKPOINT_INTERVAL_SECONDS,
+    chunk_size=settings.AUDIT_VERIFY_CHUNK_SIZE,
+    key_id=UUID(settings.AUDIT_CHECKPOINT_KEY_ID) if settings.AUDIT_CHECKPOINT_KEY_ID else None,
+    secret=settings.SECRET_KEY
+)
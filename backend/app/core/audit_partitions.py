@@ -0,0 +1,299 @@
+"""
+KT Secure - Audit Partitions
+Monthly partitions of audit_logs: created ahead of time, archived and dropped after retention
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+
+from sqlalchemy import column, delete, func, literal, select, table, text, tuple_
+
+from ..config import get_settings
+from ..database import AsyncSessionLocal
+from ..models import AuditLog, DetachedAuditPartition
+from .audit_chain import AuditChain, audit_chain
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key: one maintenance pass at a time across workers
+AUDIT_PARTITION_LOCK_ID = 0x4B5303
+
+# Upper bound in pg_get_expr(relpartbound): FOR VALUES FROM (...) TO ('2026-11-01 00:00:00')
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+# Monthly partitions, plus the pre-partitioning table migration 013 attached
+_PARTITION_NAME = re.compile(r"^audit_logs_(y\d{4}m\d{2}|legacy)$")
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """First day of the month `months` after the one `month` falls in."""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"audit_logs_y{month:%Y}m{month:%m}"
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _open_archive(archive_dir: str, partial: str):
+    os.makedirs(archive_dir, exist_ok=True)
+    return open(partial, "wb")
+
+
+def _finish_archive(archive: gzip.GzipFile, raw, partial: str, path: str):
+    """Close the gzip stream, make the file durable, then give it its final name."""
+    archive.close()
+    raw.flush()
+    os.fsync(raw.fileno())
+    raw.close()
+    os.replace(partial, path)
+
+
+class AuditPartitionManager:
+    """
+    Maintains the monthly range partitions of audit_logs (migration 013).
+
+    Partitions for the current month and `months_ahead` after it always
+    exist, so writes never miss one and "recent" queries only touch the
+    newest partitions. With `retention_months` set, partitions that ended
+    more than that many months ago are detached (CONCURRENTLY, so writers
+    are not blocked), streamed in `chunk_size` keyset reads to a gzipped
+    NDJSON file in `archive_dir` and dropped. A partition is only detached
+    once the hash chain over it has been verified and sealed by a
+    checkpoint, so the chain still verifies without it. Detached partitions
+    are recorded in audit_detached_partitions before the DETACH, and only
+    tables recorded there are archived and dropped, so one left detached by
+    a failed archive is picked up again on the next run and no other table
+    is ever touched. A pass holds a session-level advisory lock, so with
+    several API workers only one maintains partitions at a time and the
+    others skip the round. Does nothing on databases other than PostgreSQL.
+    """
+
+    def __init__(
+        self,
+        months_ahead: int = 3,
+        retention_months: int = 0,
+        archive_dir: str = "./audit_archive",
+        interval: float = 86400.0,
+        chunk_size: int = 10000,
+        chain: AuditChain = audit_chain,
+        session_factory=AsyncSessionLocal
+    ):
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.chain = chain
+        self._session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self.created = 0
+        self.archived = 0
+        self.skipped = 0
+        self.errors = 0
+
+    async def ensure_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Create missing partitions up to `months_ahead`, skipping months an
+        existing partition already covers; returns the new ones.
+        """
+        now = now or datetime.utcnow()
+        current = datetime(now.year, now.month, 1)
+        created = []
+        async with self._session_factory() as db:
+            partitions = await self._partitions(db)
+            existing = {name for name, _ in partitions}
+            # Months below the highest upper bound are covered already, e.g. by
+            # the legacy partition, which ends after the month 013 ran in
+            covered = max((upper for _, upper in partitions if upper), default=None)
+            for i in range(self.months_ahead + 1):
+                start = add_months(current, i)
+                name = partition_name(start)
+                if name in existing or (covered and start < covered):
+                    continue
+                await db.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF audit_logs '
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{add_months(start, 1):%Y-%m-%d}')"
+                ))
+                created.append(name)
+            await db.commit()
+        self.created += len(created)
+        return created
+
+    async def _partitions(self, db) -> List[Tuple[str, Optional[datetime]]]:
+        """Attached partitions with their upper bound (None = unbounded)."""
+        result = await db.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'audit_logs'::regclass"
+        ))
+        partitions = []
+        for name, bound in result.all():
+            if not _PARTITION_NAME.match(name):
+                continue
+            match = _UPPER_BOUND.search(bound or "")
+            partitions.append((name, datetime.fromisoformat(match.group(1)) if match else None))
+        return partitions
+
+    async def _detached(self, db) -> List[str]:
+        """
+        Recorded partitions that are detached but not archived yet: plain
+        tables in audit_logs' schema (a recorded one may still be attached
+        if its DETACH never ran).
+        """
+        result = await db.execute(text(
+            "SELECT d.name FROM audit_detached_partitions d "
+            "JOIN pg_class c ON c.relname = d.name "
+            "AND c.relnamespace = (SELECT relnamespace FROM pg_class WHERE oid = 'audit_logs'::regclass) "
+            "WHERE c.relkind = 'r' AND NOT c.relispartition ORDER BY d.name"
+        ))
+        return [name for name in result.scalars().all() if _PARTITION_NAME.match(name)]
+
+    async def _detach(self, name: str) -> bool:
+        async with self._session_factory() as db:
+            last = await db.scalar(text(f'SELECT max(sequence) FROM "{name}"'))
+        if last is not None and not await self.chain.seal(last):
+            logger.warning("Audit partition %s is past retention but not verified yet", name)
+            return False
+        async with self._session_factory() as db:
+            if await db.get(DetachedAuditPartition, name) is None:
+                db.add(DetachedAuditPartition(name=name, last_sequence=last))
+                await db.commit()
+        async with self._session_factory() as db:
+            conn = await db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+            await conn.execute(text(f'ALTER TABLE audit_logs DETACH PARTITION "{name}" CONCURRENTLY'))
+        return True
+
+    async def archive(self, name: str) -> Tuple[str, int]:
+        """
+        Stream a detached partition to `archive_dir`/<name>.ndjson.gz and
+        drop it, together with its audit_detached_partitions row. The file
+        only gets its final name once fully written; all file I/O runs on
+        the default executor.
+        """
+        source = table(name, *(column(c.name, c.type) for c in AuditLog.__table__.columns))
+        path = os.path.join(self.archive_dir, f"{name}.ndjson.gz")
+        partial = path + ".partial"
+        loop = asyncio.get_running_loop()
+        raw = await loop.run_in_executor(None, _open_archive, self.archive_dir, partial)
+
+        rows = 0
+        position = None
+        try:
+            archive = gzip.GzipFile(fileobj=raw, mode="wb")
+            while True:
+                query = select(source).order_by(source.c.created_at, source.c.id).limit(self.chunk_size)
+                if position:
+                    query = query.where(tuple_(source.c.created_at, source.c.id) > tuple_(
+                        literal(position[0], source.c.created_at.type), literal(position[1], source.c.id.type)
+                    ))
+                async with self._session_factory() as db:
+                    chunk = (await db.execute(query)).mappings().all()
+                if not chunk:
+                    break
+                lines = "".join(json.dumps(dict(row), default=_json_default) + "\n" for row in chunk)
+                await loop.run_in_executor(None, archive.write, lines.encode())
+                rows += len(chunk)
+                position = (chunk[-1]["created_at"], chunk[-1]["id"])
+            await loop.run_in_executor(None, _finish_archive, archive, raw, partial, path)
+        finally:
+            if not raw.closed:
+                await loop.run_in_executor(None, raw.close)
+
+        async with self._session_factory() as db:
+            await db.execute(text(f'DROP TABLE "{name}"'))
+            await db.execute(delete(DetachedAuditPartition).where(DetachedAuditPartition.name == name))
+            await db.commit()
+        self.archived += 1
+        logger.info("Archived audit partition %s (%d entries) to %s", name, rows, path)
+        return path, rows
+
+    async def apply_retention(self, now: Optional[datetime] = None) -> List[str]:
+        """Detach, archive and drop partitions past retention; returns their names."""
+        if not self.retention_months:
+            return []
+        now = now or datetime.utcnow()
+        cutoff = add_months(datetime(now.year, now.month, 1), -self.retention_months)
+        async with self._session_factory() as db:
+            expired = [name for name, upper in await self._partitions(db) if upper and upper <= cutoff]
+        for name in expired:
+            await self._detach(name)
+        async with self._session_factory() as db:
+            detached = await self._detached(db)
+        archived = []
+        for name in detached:
+            await self.archive(name)
+            archived.append(name)
+        return archived
+
+    async def run(self):
+        """
+        One maintenance pass: create partitions ahead, then apply retention.
+        Skipped if another worker's pass holds the lock.
+        """
+        async with self._session_factory() as db:
+            if db.bind.dialect.name != "postgresql":
+                return
+            # Session-level lock on an autocommit connection, so the pass does
+            # not sit in an open transaction while DETACH CONCURRENTLY waits
+            conn = await db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+            if not await conn.scalar(select(func.pg_try_advisory_lock(AUDIT_PARTITION_LOCK_ID))):
+                self.skipped += 1
+                return
+            try:
+                await self.ensure_partitions()
+                await self.apply_retention()
+            finally:
+                await conn.scalar(select(func.pg_advisory_unlock(AUDIT_PARTITION_LOCK_ID)))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run()
+            except Exception:
+                self.errors += 1
+                logger.exception("Audit partition maintenance failed")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "created": self.created,
+            "archived": self.archived,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+
+
+settings = get_settings()
+
+# Singleton instance
+audit_partitions = AuditPartitionManager(
+    months_ahead=settings.AUDIT_PARTITION_MONTHS_AHEAD,
+    retention_months=settings.AUDIT_RETENTION_MONTHS,
+    archive_dir=settings.AUDIT_ARCHIVE_DIR,
+    interval=settings.AUDIT_PARTITION_MAINTENANCE_SECONDS,
+    chunk_size=settings.AUDIT_VERIFY_CHUNK_SIZE
+)
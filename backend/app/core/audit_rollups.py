@@ -0,0 +1,101 @@
+"""
+KT Secure - Audit Rollups
+Per-(organization, action, hour/day) audit counters for dashboards
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import AuditRollup
+
+GRANULARITIES = ("hour", "day")
+
+# How far back a stats query looks when no `since` is given
+DEFAULT_WINDOWS = {"hour": timedelta(days=7), "day": timedelta(days=30)}
+
+# Stands in for "no organization" in the rollup key
+NO_ORGANIZATION = UUID(int=0)
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the hour or day `timestamp` falls in."""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def apply_rollups(db: AsyncSession, entries: List[dict]):
+    """
+    Add a batch of audit entries to the rollup counters.
+
+    Runs in the transaction that inserts the entries, so counts and log
+    never disagree. The batch is first summed per key, then applied with
+    one INSERT ... ON CONFLICT DO UPDATE, in key order; appends are
+    already serialized by the audit chain lock, so the upserts never
+    deadlock between workers.
+    """
+    counts = Counter(
+        (entry["organization_id"] or NO_ORGANIZATION, granularity,
+         bucket_start(entry["created_at"], granularity), entry["action"])
+        for entry in entries
+        for granularity in GRANULARITIES
+    )
+    if not counts:
+        return
+    insert = postgresql_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    statement = insert(AuditRollup).values([
+        {"organization_id": org, "granularity": granularity, "bucket": bucket, "action": action, "count": count}
+        for (org, granularity, bucket, action), count in sorted(counts.items())
+    ])
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=["organization_id", "granularity", "bucket", "action"],
+        set_={"count": AuditRollup.count + statement.excluded.count}
+    ))
+
+
+async def activity_series(
+    db: AsyncSession,
+    granularity: str,
+    since: datetime,
+    until: datetime,
+    organization_id: Optional[UUID] = None,
+    action: Optional[str] = None
+) -> List[tuple]:
+    """(bucket, action, count) rows in [since, until), summed over organizations unless one is given."""
+    query = (
+        select(AuditRollup.bucket, AuditRollup.action, func.sum(AuditRollup.count))
+        .where(
+            AuditRollup.granularity == granularity,
+            AuditRollup.bucket >= bucket_start(since, granularity),
+            AuditRollup.bucket < until
+        )
+        .group_by(AuditRollup.bucket, AuditRollup.action)
+        .order_by(AuditRollup.bucket, AuditRollup.action)
+    )
+    if organization_id:
+        query = query.where(AuditRollup.organization_id == organization_id)
+    if action:
+        query = query.where(AuditRollup.action == action)
+    result = await db.execute(query)
+    return [tuple(row) for row in result.all()]
+
+
+def weekly_heatmap(series: List[tuple]) -> List[List[int]]:
+    """Fold hourly (bucket, action, count) rows into a weekday x hour grid."""
+    grid = [[0] * 24 for _ in range(7)]
+    for bucket, _, count in series:
+        grid[bucket.weekday()][bucket.hour] += count
+    return grid
+
+
+def totals_by_action(series: List[tuple]) -> Dict[str, int]:
+    totals: Counter = Counter()
+    for _, action, count in series:
+        totals[action] += count
+    return dict(totals)
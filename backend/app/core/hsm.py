@@ -0,0 +1,440 @@
+"""
+KT Secure - HSM Session Pool
+Logged-in PKCS#11 sessions per slot, cached key handles and bounded concurrency
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import hmac
+import secrets
+import threading
+
+from ..config import get_settings
+
+
+class HsmError(Exception):
+    """Raised when an HSM operation fails."""
+
+
+class HsmSessionError(HsmError):
+    """Raised when the session itself is no longer usable (closed, logged out, device error)."""
+
+
+class HsmBackend(ABC):
+    """
+    Blocking PKCS#11 operations.
+    Every method is called from the pool's dedicated thread pool, never from
+    the asyncio loop.
+    """
+
+    # CKM_ECDSA returns r||s; callers convert to DER when this is set
+    raw_ecdsa_signatures: bool = True
+
+    @abstractmethod
+    def open_session(self, slot: int) -> Any:
+        """Open a new session on a slot."""
+
+    @abstractmethod
+    def login(self, session: Any, pin: str) -> None:
+        """Log a session in as the normal user."""
+
+    @abstractmethod
+    def find_private_key(self, session: Any, fingerprint: str) -> Any:
+        """Return the private key object handle for a key fingerprint."""
+
+    @abstractmethod
+    def sign(self, session: Any, handle: Any, mechanism: str, data: bytes) -> bytes:
+        """Sign data with a private key handle."""
+
+    @abstractmethod
+    def verify(self, session: Any, fingerprint: str, mechanism: str, data: bytes, signature: bytes) -> bool:
+        """Verify a signature with the public key of a key fingerprint."""
+
+    @abstractmethod
+    def generate_key_pair(
+        self, session: Any, algorithm: str, key_size: Optional[int], curve: Optional[str], label: str
+    ) -> None:
+        """Generate a token key pair labelled with a fingerprint."""
+
+    @abstractmethod
+    def close_session(self, session: Any) -> None:
+        """Log out and close a session."""
+
+
+class FakeHsmBackend(HsmBackend):
+    """
+    In-process stand-in for an HSM, used for local development and tests.
+    Keys are random secrets per slot and "signatures" are HMACs, so results
+    are stable for a given key without any PKCS#11 library installed.
+    """
+
+    raw_ecdsa_signatures = False
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.keys: Dict[int, Dict[str, bytes]] = {}
+        self.sessions_opened = 0
+        self.logins = 0
+        self.key_lookups = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def add_key(self, slot: int, fingerprint: str, secret: Optional[bytes] = None):
+        """Provision a key on a slot."""
+        self.keys.setdefault(slot, {})[fingerprint] = secret or fingerprint.encode()
+
+    def open_session(self, slot: int) -> Any:
+        with self._lock:
+            self.sessions_opened += 1
+        return {"slot": slot, "logged_in": False, "closed": False}
+
+    def login(self, session: Any, pin: str) -> None:
+        with self._lock:
+            self.logins += 1
+        session["logged_in"] = True
+
+    def find_private_key(self, session: Any, fingerprint: str) -> Any:
+        with self._lock:
+            self.key_lookups += 1
+        if fingerprint not in self.keys.get(session["slot"], {}):
+            raise HsmError(f"Key {fingerprint} not found in slot {session['slot']}")
+        return (session["slot"], fingerprint)
+
+    def sign(self, session: Any, handle: Any, mechanism: str, data: bytes) -> bytes:
+        if not session["logged_in"] or session["closed"]:
+            raise HsmSessionError("Session is not usable")
+
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                threading.Event().wait(self.latency)
+            slot, fingerprint = handle
+            secret = self.keys[slot][fingerprint]
+            return hmac.new(secret, mechanism.encode() + data, hashlib.sha256).digest()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def verify(self, session: Any, fingerprint: str, mechanism: str, data: bytes, signature: bytes) -> bool:
+        handle = self.find_private_key(session, fingerprint)
+        return hmac.compare_digest(self.sign(session, handle, mechanism, data), signature)
+
+    def generate_key_pair(
+        self, session: Any, algorithm: str, key_size: Optional[int], curve: Optional[str], label: str
+    ) -> None:
+        self.add_key(session["slot"], label, secrets.token_bytes(32))
+
+    def close_session(self, session: Any) -> None:
+        session["closed"] = True
+
+
+class Pkcs11Backend(HsmBackend):
+    """
+    PKCS#11 backend built on PyKCS11 (optional dependency).
+    Private keys are located by CKA_LABEL, which holds the key fingerprint.
+    """
+
+    def __init__(self, library_path: str):
+        try:
+            import PyKCS11
+        except ImportError:
+            raise HsmError("PyKCS11 is not installed; set HSM_BACKEND=fake or install it")
+
+        self._pkcs11 = PyKCS11
+        self._lib = PyKCS11.PyKCS11Lib()
+        self._lib.load(library_path)
+        self._session_errors = {
+            PyKCS11.CKR_SESSION_HANDLE_INVALID,
+            PyKCS11.CKR_SESSION_CLOSED,
+            PyKCS11.CKR_USER_NOT_LOGGED_IN,
+            PyKCS11.CKR_DEVICE_ERROR,
+            PyKCS11.CKR_DEVICE_REMOVED,
+            PyKCS11.CKR_TOKEN_NOT_PRESENT,
+        }
+
+    def _error(self, message: str, e: Exception) -> HsmError:
+        """Wrap a PyKCS11Error, as HsmSessionError if the session is gone."""
+        if getattr(e, "value", None) in self._session_errors:
+            return HsmSessionError(f"{message}: {e}")
+        return HsmError(f"{message}: {e}")
+
+    def open_session(self, slot: int) -> Any:
+        flags = self._pkcs11.CKF_SERIAL_SESSION | self._pkcs11.CKF_RW_SESSION
+        try:
+            return self._lib.openSession(slot, flags)
+        except self._pkcs11.PyKCS11Error as e:
+            raise HsmSessionError(f"Cannot open session on slot {slot}: {e}")
+
+    def login(self, session: Any, pin: str) -> None:
+        try:
+            session.login(pin)
+        except self._pkcs11.PyKCS11Error as e:
+            # Login state is shared by all sessions of the application
+            if e.value != self._pkcs11.CKR_USER_ALREADY_LOGGED_IN:
+                raise HsmSessionError(f"HSM login failed: {e}")
+
+    def find_private_key(self, session: Any, fingerprint: str) -> Any:
+        try:
+            handles = session.findObjects([
+                (self._pkcs11.CKA_CLASS, self._pkcs11.CKO_PRIVATE_KEY),
+                (self._pkcs11.CKA_LABEL, fingerprint),
+            ])
+        except self._pkcs11.PyKCS11Error as e:
+            raise self._error("Key lookup failed", e)
+        if not handles:
+            raise HsmError(f"Key {fingerprint} not found in HSM")
+        return handles[0]
+
+    def sign(self, session: Any, handle: Any, mechanism: str, data: bytes) -> bytes:
+        try:
+            signature = session.sign(handle, data, self._mechanism(mechanism))
+        except self._pkcs11.PyKCS11Error as e:
+            raise self._error("HSM sign failed", e)
+        return bytes(signature)
+
+    def _mechanism(self, mechanism: str) -> Any:
+        mechanisms = {
+            "RSA-PKCS": self._pkcs11.CKM_RSA_PKCS,
+            "ECDSA": self._pkcs11.CKM_ECDSA,
+        }
+        if mechanism not in mechanisms:
+            raise HsmError(f"Unsupported mechanism: {mechanism}")
+        return self._pkcs11.Mechanism(mechanisms[mechanism], None)
+
+    def verify(self, session: Any, fingerprint: str, mechanism: str, data: bytes, signature: bytes) -> bool:
+        try:
+            handles = session.findObjects([
+                (self._pkcs11.CKA_CLASS, self._pkcs11.CKO_PUBLIC_KEY),
+                (self._pkcs11.CKA_LABEL, fingerprint),
+            ])
+            if not handles:
+                raise HsmError(f"Public key {fingerprint} not found in HSM")
+            return bool(session.verify(handles[0], data, signature, self._mechanism(mechanism)))
+        except self._pkcs11.PyKCS11Error as e:
+            raise self._error("HSM verify failed", e)
+
+    def generate_key_pair(
+        self, session: Any, algorithm: str, key_size: Optional[int], curve: Optional[str], label: str
+    ) -> None:
+        pk = self._pkcs11
+        public_template = [
+            (pk.CKA_CLASS, pk.CKO_PUBLIC_KEY),
+            (pk.CKA_TOKEN, pk.CK_TRUE),
+            (pk.CKA_VERIFY, pk.CK_TRUE),
+            (pk.CKA_LABEL, label),
+        ]
+        private_template = [
+            (pk.CKA_CLASS, pk.CKO_PRIVATE_KEY),
+            (pk.CKA_TOKEN, pk.CK_TRUE),
+            (pk.CKA_PRIVATE, pk.CK_TRUE),
+            (pk.CKA_SENSITIVE, pk.CK_TRUE),
+            (pk.CKA_EXTRACTABLE, pk.CK_FALSE),
+            (pk.CKA_SIGN, pk.CK_TRUE),
+            (pk.CKA_LABEL, label),
+        ]
+        if algorithm == "RSA":
+            public_template += [
+                (pk.CKA_MODULUS_BITS, key_size),
+                (pk.CKA_PUBLIC_EXPONENT, (0x01, 0x00, 0x01)),
+            ]
+            mechanism = pk.MechanismRSAGENERATEKEYPAIR
+        else:
+            # DER encoded curve OIDs
+            ec_params = {
+                "P-256": bytes.fromhex("06082a8648ce3d030107"),
+                "P-384": bytes.fromhex("06052b81040022"),
+            }
+            if curve not in ec_params:
+                raise HsmError(f"Unsupported curve: {curve}")
+            public_template.append((pk.CKA_EC_PARAMS, ec_params[curve]))
+            mechanism = pk.MechanismECGENERATEKEYPAIR
+        try:
+            session.generateKeyPair(public_template, private_template, mecha=mechanism)
+        except pk.PyKCS11Error as e:
+            raise self._error("HSM key generation failed", e)
+
+    def close_session(self, session: Any) -> None:
+        try:
+            session.closeSession()
+        except self._pkcs11.PyKCS11Error:
+            pass
+
+
+class _SlotState:
+    """Idle sessions, cached handles and the concurrency limit of one slot."""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self.semaphore = asyncio.Semaphore(max_sessions)
+        self.idle: List[Any] = []
+        self.handles: Dict[str, Any] = {}
+        self.in_use = 0
+
+
+class HsmSessionPool:
+    """
+    Pool of logged-in HSM sessions.
+
+    Sessions are opened and logged in once per slot and reused, key object
+    handles are cached per fingerprint, and at most `max_sessions_per_slot`
+    operations run against a slot at a time. Every blocking PKCS#11 call runs
+    on a dedicated thread pool so the event loop is never blocked.
+    """
+
+    def __init__(
+        self,
+        backend: HsmBackend,
+        pin: str,
+        max_sessions_per_slot: int = 4,
+        max_workers: int = 8
+    ):
+        self.backend = backend
+        self._pin = pin
+        self.max_sessions_per_slot = max_sessions_per_slot
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hsm")
+        self._slots: Dict[int, _SlotState] = {}
+
+    def _slot(self, slot: int) -> _SlotState:
+        if slot not in self._slots:
+            self._slots[slot] = _SlotState(self.max_sessions_per_slot)
+        return self._slots[slot]
+
+    async def _run(self, func, *args):
+        """Run a blocking backend call on the HSM thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _open_logged_in(self, slot: int) -> Any:
+        session = self.backend.open_session(slot)
+        try:
+            self.backend.login(session, self._pin)
+        except Exception:
+            self.backend.close_session(session)
+            raise
+        return session
+
+    @asynccontextmanager
+    async def session(self, slot: int):
+        """
+        Borrow a logged-in session for a slot.
+        Waits while the slot is at its concurrency limit. After an operation
+        error (e.g. key not found) the session goes back to the pool; after
+        HsmSessionError, cancellation or any other exception it is closed.
+        """
+        state = self._slot(slot)
+        async with state.semaphore:
+            session = state.idle.pop() if state.idle else await self._run(self._open_logged_in, slot)
+            state.in_use += 1
+            try:
+                yield session
+            except HsmError as e:
+                if isinstance(e, HsmSessionError):
+                    self._discard(session)
+                else:
+                    state.idle.append(session)
+                raise
+            except BaseException:
+                self._discard(session)
+                raise
+            else:
+                state.idle.append(session)
+            finally:
+                state.in_use -= 1
+
+    def _discard(self, session: Any):
+        # Closed on the HSM threads without waiting, so a cancelled caller
+        # is not held up (or cancelled again) while the session closes
+        self._executor.submit(self.backend.close_session, session)
+
+    async def _key_handle(self, slot: int, session: Any, fingerprint: str) -> Any:
+        state = self._slot(slot)
+        handle = state.handles.get(fingerprint)
+        if handle is None:
+            handle = await self._run(self.backend.find_private_key, session, fingerprint)
+            state.handles[fingerprint] = handle
+        return handle
+
+    async def sign(self, slot: int, fingerprint: str, data: bytes, mechanism: str) -> bytes:
+        """Sign data with the key identified by fingerprint on a slot."""
+        async with self.session(slot) as session:
+            handle = await self._key_handle(slot, session, fingerprint)
+            try:
+                return await self._run(self.backend.sign, session, handle, mechanism, data)
+            except HsmError:
+                # The handle may be stale (key deleted or re-imported)
+                self._slot(slot).handles.pop(fingerprint, None)
+                raise
+
+    async def verify(self, slot: int, fingerprint: str, data: bytes, signature: bytes, mechanism: str) -> bool:
+        """Verify a signature with the public key of a key on a slot."""
+        async with self.session(slot) as session:
+            return await self._run(self.backend.verify, session, fingerprint, mechanism, data, signature)
+
+    async def generate_key(
+        self, slot: int, algorithm: str, key_size: Optional[int] = None, curve: Optional[str] = None
+    ) -> str:
+        """Generate a key pair on a slot and return its fingerprint (the key label)."""
+        fingerprint = hashlib.sha256(secrets.token_bytes(32)).hexdigest()[:40]
+        async with self.session(slot) as session:
+            await self._run(self.backend.generate_key_pair, session, algorithm, key_size, curve, fingerprint)
+        return fingerprint
+
+    def invalidate_key(self, fingerprint: str):
+        """Drop cached handles for a key, e.g. after revocation."""
+        for state in self._slots.values():
+            state.handles.pop(fingerprint, None)
+
+    def stats(self) -> dict:
+        """Per-slot session usage."""
+        return {
+            slot: {
+                "max_sessions": state.max_sessions,
+                "in_use": state.in_use,
+                "idle": len(state.idle),
+                "cached_handles": len(state.handles),
+            }
+            for slot, state in self._slots.items()
+        }
+
+    async def close(self):
+        """Close idle sessions and stop the thread pool."""
+        for state in self._slots.values():
+            while state.idle:
+                await self._run(self.backend.close_session, state.idle.pop())
+            state.handles.clear()
+        self._executor.shutdown(wait=True)
+
+
+_pool: Optional[HsmSessionPool] = None
+
+
+def get_hsm_pool() -> HsmSessionPool:
+    """Return the process-wide HSM session pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        settings = get_settings()
+        if settings.HSM_BACKEND == "pkcs11":
+            backend = Pkcs11Backend(settings.HSM_LIBRARY_PATH)
+        else:
+            backend = FakeHsmBackend()
+        _pool = HsmSessionPool(
+            backend,
+            settings.HSM_PIN,
+            max_sessions_per_slot=settings.HSM_MAX_SESSIONS_PER_SLOT,
+            max_workers=settings.HSM_THREAD_POOL_SIZE
+        )
+    return _pool
+
+
+async def shutdown_hsm_pool():
+    """Close the HSM session pool if it was created."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
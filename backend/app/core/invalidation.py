@@ -0,0 +1,102 @@
+"""
+KT Secure - Cache Invalidation Bus
+Fans out cache invalidations to this process and, through Redis pub/sub,
+to every other API worker
+"""
+from typing import Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "ktsecure:invalidate:"
+
+
+class InvalidationBus:
+    """
+    Publish/subscribe for cache invalidations.
+
+    Handlers run synchronously in the publishing process. When Redis is
+    enabled the message is also published to other workers, which dispatch
+    it to their own handlers. If Redis is unavailable, caches still expire
+    through their TTL, which bounds how long other workers can be stale.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[dict], None]]] = {}
+        self._origin = uuid.uuid4().hex
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def subscribe(self, channel: str, handler: Callable[[dict], None]):
+        """Register a handler for messages on a channel."""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def _dispatch(self, channel: str, message: dict):
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(message)
+            except Exception:
+                logger.exception("Invalidation handler failed for %s", channel)
+
+    async def publish(self, channel: str, message: dict):
+        """Invalidate locally, then tell the other workers."""
+        self._dispatch(channel, message)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(
+                CHANNEL_PREFIX + channel,
+                json.dumps({"origin": self._origin, "message": message})
+            )
+        except Exception:
+            logger.warning("Could not publish invalidation for %s", channel, exc_info=True)
+
+    async def start(self, redis_url: str):
+        """Connect to Redis and start listening for other workers' messages."""
+        try:
+            import redis.asyncio as redis
+
+            self._redis = redis.from_url(redis_url)
+            pubsub = self._redis.pubsub()
+            await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+        except Exception:
+            logger.warning("Redis unavailable; cache invalidation is local only", exc_info=True)
+            self._redis = None
+            return
+
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        async for raw in pubsub.listen():
+            if raw.get("type") != "pmessage":
+                continue
+            try:
+                payload = json.loads(raw["data"])
+            except (TypeError, ValueError):
+                continue
+            if payload.get("origin") == self._origin:
+                continue
+            channel = raw["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            self._dispatch(channel[len(CHANNEL_PREFIX):], payload.get("message", {}))
+
+    async def stop(self):
+        """Stop listening and close the Redis connection."""
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+# Singleton instance
+bus = InvalidationBus()
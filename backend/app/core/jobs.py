@@ -0,0 +1,106 @@
+"""
+KT Secure - Background Job Workers
+Async worker pool that drains jobs persisted in a database table
+"""
+from typing import Awaitable, Callable, Hashable, Iterable, List, Optional, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorkerPool:
+    """
+    Pool of asyncio workers processing persisted jobs by id.
+
+    The database row is the source of truth: `submit` is only a hint that
+    lets a job start immediately. A poller calls `recover` periodically to
+    pick up jobs submitted on other API workers, jobs that did not fit in
+    the in-memory queue and jobs left behind by a crashed process. `process`
+    must claim the row atomically so a job is never run twice.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process: Callable[[Hashable], Awaitable[None]],
+        recover: Callable[[], Awaitable[Iterable[Hashable]]],
+        workers: int = 4,
+        poll_interval: float = 5.0,
+        max_queued: int = 10000
+    ):
+        self.name = name
+        self._process = process
+        self._recover = recover
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._pending: Set[Hashable] = set()
+        self._tasks: List[asyncio.Task] = []
+        self.processed = 0
+        self.errors = 0
+
+    def submit(self, job_id: Hashable) -> bool:
+        """Queue a job for immediate processing; False if the queue is full."""
+        if job_id in self._pending:
+            return True
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            return False
+        self._pending.add(job_id)
+        return True
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+                self.processed += 1
+            except Exception:
+                self.errors += 1
+                logger.exception("%s job %s failed", self.name, job_id)
+            finally:
+                self._pending.discard(job_id)
+                self._queue.task_done()
+
+    async def _poll(self):
+        while True:
+            try:
+                for job_id in await self._recover():
+                    if not self.submit(job_id):
+                        break
+            except Exception:
+                logger.exception("%s job recovery failed", self.name)
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self):
+        """Start the workers and the recovery poller."""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self, timeout: Optional[float] = 10.0):
+        """Let queued jobs finish (up to timeout), then cancel the workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s workers stopped with %d jobs queued", self.name, self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        """Queue depth and counters."""
+        return {
+            "workers": self.workers,
+            "running": bool(self._tasks),
+            "queued": self._queue.qsize(),
+            "in_progress": len(self._pending) - self._queue.qsize(),
+            "processed": self.processed,
+            "errors": self.errors,
+        }
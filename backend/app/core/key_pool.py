@@ -0,0 +1,209 @@
+"""
+KT Secure - Key Pool
+Keeps pre-generated key pairs ready so key creation does not wait for keygen
+"""
+from typing import Dict, Iterable, NamedTuple, Optional
+import asyncio
+import logging
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..database import AsyncSessionLocal
+from ..models.key_pool import PooledKey
+from .signer import SignerError, get_signer, key_params
+
+logger = logging.getLogger(__name__)
+
+
+class KeySpec(NamedTuple):
+    """Interchangeable keys: same family, size/curve and HSM slot."""
+    family: str
+    key_size: Optional[int]
+    curve: Optional[str]
+    hsm_slot: int
+
+
+def key_spec(algorithm: str, key_size: Optional[int], curve: Optional[str], hsm_slot: int) -> KeySpec:
+    family, key_size, curve = key_params(algorithm, key_size, curve)
+    return KeySpec(family, key_size, curve, hsm_slot)
+
+
+def _matches(spec: KeySpec):
+    return (
+        PooledKey.family == spec.family,
+        PooledKey.key_size.is_(None) if spec.key_size is None else PooledKey.key_size == spec.key_size,
+        PooledKey.curve.is_(None) if spec.curve is None else PooledKey.curve == spec.curve,
+        PooledKey.hsm_slot == spec.hsm_slot,
+    )
+
+
+class KeyPoolManager:
+    """
+    Background refill of a pool of pre-generated keys per KeySpec.
+
+    The pool lives in the pooled_keys table, so it is shared by all API
+    workers and survives restarts. Keygen runs on the signer's own worker
+    pool (process pool or HSM threads), at most `concurrency` at a time per
+    API worker. A claim wakes the refiller; otherwise it checks the pool
+    every `refill_interval` seconds. Workers refilling at the same moment
+    can overshoot a target slightly, which only costs spare keys.
+
+    Only a pooled key's fingerprint is stored, so the pool is disabled for
+    signers whose key material stays on the node that generated it (the
+    software signer's keystore directory): a key claimed on another node
+    would have no private key.
+    """
+
+    def __init__(
+        self,
+        targets: Dict[KeySpec, int],
+        refill_interval: float = 30.0,
+        concurrency: int = 2,
+        session_factory=AsyncSessionLocal
+    ):
+        self.targets = targets
+        self.refill_interval = refill_interval
+        self._session_factory = session_factory
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.available: Dict[KeySpec, int] = {}
+        self.claimed = 0
+        self.misses = 0
+        self.generated = 0
+        self.errors = 0
+
+    async def claim(self, db: AsyncSession, spec: KeySpec) -> Optional[str]:
+        """
+        Take a pooled key's fingerprint, or None if the pool is empty.
+        The pooled row is deleted in `db`'s transaction; the caller commits
+        it together with the Pkcs11Key that uses the fingerprint.
+        """
+        if spec not in self.targets or not get_signer().shared_key_storage:
+            return None
+
+        fingerprint = None
+        for _ in range(3):
+            result = await db.execute(
+                select(PooledKey)
+                .where(*_matches(spec))
+                .order_by(PooledKey.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            pooled = result.scalar_one_or_none()
+            if pooled is None:
+                break
+            deleted = await db.execute(delete(PooledKey).where(PooledKey.id == pooled.id))
+            if deleted.rowcount == 1:
+                fingerprint = pooled.fingerprint
+                break
+
+        if fingerprint is None:
+            self.misses += 1
+        else:
+            self.claimed += 1
+            self.available[spec] = max(0, self.available.get(spec, 1) - 1)
+        self._wake.set()
+        return fingerprint
+
+    async def _generate(self, spec: KeySpec):
+        async with self._semaphore:
+            try:
+                fingerprint = await get_signer().generate_key(
+                    spec.family, spec.key_size, spec.curve, spec.hsm_slot
+                )
+            except SignerError:
+                self.errors += 1
+                logger.warning("Key pool could not generate %s", spec, exc_info=True)
+                return
+            async with self._session_factory() as db:
+                db.add(PooledKey(fingerprint=fingerprint, **spec._asdict()))
+                await db.commit()
+        self.generated += 1
+        self.available[spec] = self.available.get(spec, 0) + 1
+
+    async def refill(self):
+        """Generate keys until every spec reaches its target."""
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(
+                    PooledKey.family, PooledKey.key_size, PooledKey.curve, PooledKey.hsm_slot,
+                    func.count()
+                ).group_by(PooledKey.family, PooledKey.key_size, PooledKey.curve, PooledKey.hsm_slot)
+            )
+            counts = {KeySpec(*row[:4]): row[4] for row in result.all()}
+
+        self.available = {spec: counts.get(spec, 0) for spec in self.targets}
+        await asyncio.gather(*(
+            self._generate(spec)
+            for spec, target in self.targets.items()
+            for _ in range(target - self.available[spec])
+        ))
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.refill()
+            except Exception:
+                logger.exception("Key pool refill failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        """Start refilling in the background (no-op without targets or shared key storage)."""
+        if not self.targets or self._task is not None:
+            return
+        signer = get_signer()
+        if not signer.shared_key_storage:
+            logger.warning("Key pool disabled: the %s signer keeps key material per node", signer.name)
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        """Pool level per spec and claim/refill counters."""
+        return {
+            "running": self._task is not None,
+            "pools": [
+                {**spec._asdict(), "target": target, "available": self.available.get(spec, 0)}
+                for spec, target in self.targets.items()
+            ],
+            "claimed": self.claimed,
+            "misses": self.misses,
+            "generated": self.generated,
+            "errors": self.errors,
+        }
+
+
+def parse_targets(targets: Iterable[dict]) -> Dict[KeySpec, int]:
+    """Build pool targets from KEY_POOL_TARGETS entries."""
+    return {
+        key_spec(target["algorithm"], target.get("key_size"), target.get("curve"), target.get("hsm_slot", 0)):
+            int(target.get("size", 1))
+        for target in targets
+    }
+
+
+settings = get_settings()
+
+# Singleton instance
+key_pool = KeyPoolManager(
+    targets=parse_targets(settings.KEY_POOL_TARGETS),
+    refill_interval=settings.KEY_POOL_REFILL_SECONDS,
+    concurrency=settings.KEY_POOL_REFILL_CONCURRENCY
+)
@@ -0,0 +1,120 @@
+"""
+KT Secure - Quorum Policy Resolver
+Effective quorum policy per (organization, approval type), cached
+"""
+from typing import List, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models import Organization
+from ..models.quorum import QuorumPolicy
+from ..utils.cache import TTLCache
+from .invalidation import bus
+
+CHANNEL = "quorum_policies"
+
+_MISSING = object()
+
+
+class EffectivePolicy(NamedTuple):
+    """The policy settings that apply to a new approval request."""
+    policy_id: UUID
+    organization_id: Optional[UUID]  # Where it was defined; None = global
+    required_approvals: int
+    total_approvers: int
+    expiry_hours: int
+
+
+class QuorumPolicyResolver:
+    """
+    Resolves the quorum policy for an approval type in an organization.
+
+    The nearest enabled policy wins, walking org -> parent -> ... -> global
+    (organization_id NULL); if one level defines several, the newest one
+    applies. Results, including "no policy", are cached per (org, type).
+    Any policy change drops every cached entry for its approval type, here
+    and on other workers through the invalidation bus. Organization parents
+    are fixed at creation, so the hierarchy itself never invalidates.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        bus.subscribe(CHANNEL, self._on_message)
+
+    def _on_message(self, message: dict):
+        if message.get("approval_type"):
+            approval_type = message["approval_type"]
+            self._cache.pop_where(lambda key, _: key[1] == approval_type)
+
+    async def _ancestry(self, db: AsyncSession, organization_id: UUID) -> List[UUID]:
+        """The organization and its ancestors, nearest first."""
+        chain: List[UUID] = []
+        current = organization_id
+        while current is not None and current not in chain:
+            chain.append(current)
+            current = await db.scalar(
+                select(Organization.parent_id).where(Organization.id == current)
+            )
+        return chain
+
+    async def resolve(
+        self,
+        db: AsyncSession,
+        organization_id: Optional[UUID],
+        approval_type: str
+    ) -> Optional[EffectivePolicy]:
+        """Effective policy for a new request, or None if no policy applies."""
+        key = (organization_id, approval_type)
+        cached = self._cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        chain = await self._ancestry(db, organization_id) if organization_id else []
+        result = await db.execute(
+            select(QuorumPolicy)
+            .where(
+                QuorumPolicy.approval_type == approval_type,
+                QuorumPolicy.is_enabled.is_(True),
+                or_(QuorumPolicy.organization_id.is_(None), QuorumPolicy.organization_id.in_(chain))
+            )
+            .order_by(QuorumPolicy.created_at.desc())
+        )
+        policies = result.scalars().all()
+
+        rank = {org_id: level for level, org_id in enumerate(chain)}
+        policy = min(
+            policies,
+            key=lambda p: rank.get(p.organization_id, len(chain)),
+            default=None
+        )
+        effective = policy and EffectivePolicy(
+            policy.id,
+            policy.organization_id,
+            policy.required_approvals,
+            policy.total_approvers,
+            policy.expiry_hours
+        )
+        self._cache.set(key, effective)
+        return effective
+
+    async def invalidate(self, approval_type: str):
+        """Drop every cached resolution for an approval type, everywhere."""
+        await bus.publish(CHANNEL, {"approval_type": approval_type})
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+settings = get_settings()
+
+# Singleton instance
+quorum_policies = QuorumPolicyResolver(
+    max_entries=settings.QUORUM_POLICY_CACHE_MAX_ENTRIES,
+    ttl=settings.QUORUM_POLICY_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,249 @@
+"""
+KT Secure - Quorum Voting
+Atomic M-of-N vote counting for approval requests
+"""
+from datetime import datetime
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+from uuid import UUID
+import asyncio
+import logging
+
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models.quorum import ApprovalOperation, ApprovalRequest, ApprovalStatus, ApprovalVote
+
+logger = logging.getLogger(__name__)
+
+VOTES = ("approve", "reject")
+
+# pg_try_advisory_xact_lock key held by the worker currently sweeping
+EXPIRY_SWEEP_LOCK_ID = 0x4B5301
+
+
+class VoteError(Exception):
+    """Raised when a vote cannot be cast; carries the HTTP status to report."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+class VoteResult(NamedTuple):
+    status: str
+    current_approvals: int
+    current_rejections: int
+
+
+async def cast_vote(
+    db: AsyncSession,
+    request_id: UUID,
+    user_id: UUID,
+    vote: str,
+    comment: Optional[str] = None
+) -> VoteResult:
+    """
+    Record a vote and apply it to the request's counts in one transaction.
+
+    The counts and the resulting status are computed by a single
+    UPDATE ... RETURNING on the request row, guarded by the request still
+    being pending, unexpired and not the voter's own. The row lock it takes
+    serializes votes on the same request without retries. The vote row
+    goes in after it, so a second vote from the same user hits
+    uq_approval_votes_request_user and the whole transaction rolls back.
+    The vote that approves the request also enqueues its operation in the
+    approval_operations outbox (see core/approval_executor.py).
+    Commits on success.
+    """
+    if vote not in VOTES:
+        raise VoteError("Vote must be 'approve' or 'reject'")
+
+    now = datetime.utcnow()
+    approve = 1 if vote == "approve" else 0
+    approvals = ApprovalRequest.current_approvals + approve
+    rejections = ApprovalRequest.current_rejections + (1 - approve)
+    # Evaluated on the new counts: quorum reached, or so many rejections
+    # that M approvals are out of reach (which takes precedence)
+    rejected = ApprovalRequest.total_approvers - rejections < ApprovalRequest.required_approvals
+    approved = approvals >= ApprovalRequest.required_approvals
+
+    result = await db.execute(
+        update(ApprovalRequest)
+        .where(
+            ApprovalRequest.id == request_id,
+            ApprovalRequest.status == ApprovalStatus.PENDING.value,
+            or_(ApprovalRequest.expires_at.is_(None), ApprovalRequest.expires_at > now),
+            ApprovalRequest.created_by_id != user_id
+        )
+        .values(
+            current_approvals=approvals,
+            current_rejections=rejections,
+            status=case(
+                (rejected, ApprovalStatus.REJECTED.value),
+                (approved, ApprovalStatus.APPROVED.value),
+                else_=ApprovalRequest.status
+            ),
+            completed_at=case((or_(rejected, approved), now), else_=ApprovalRequest.completed_at)
+        )
+        .returning(
+            ApprovalRequest.status,
+            ApprovalRequest.current_approvals,
+            ApprovalRequest.current_rejections
+        )
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    if row is None:
+        await _reject_vote(db, request_id, now)
+
+    db.add(ApprovalVote(request_id=request_id, user_id=user_id, vote=vote, comment=comment))
+    if row.status == ApprovalStatus.APPROVED.value:
+        db.add(ApprovalOperation(request_id=request_id))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise VoteError("You have already voted on this request")
+
+    return VoteResult(*row)
+
+
+async def _reject_vote(db: AsyncSession, request_id: UUID, now: datetime):
+    """Explain why the guarded update matched no row, and raise."""
+    result = await db.execute(
+        select(ApprovalRequest)
+        .where(ApprovalRequest.id == request_id)
+        .execution_options(populate_existing=True)
+    )
+    request = result.scalar_one_or_none()
+
+    if request is None:
+        raise VoteError("Approval request not found", status_code=404)
+
+    if request.status != ApprovalStatus.PENDING.value:
+        raise VoteError(f"Request is already {request.status}")
+
+    if request.expires_at and now >= request.expires_at:
+        # Left pending: the ApprovalExpirySweeper flips it and notifies
+        raise VoteError("Request has expired")
+
+    raise VoteError("Cannot vote on your own request")
+
+
+class ExpiredRequest(NamedTuple):
+    id: UUID
+    title: str
+    organization_id: Optional[UUID]
+
+
+class ApprovalExpirySweeper:
+    """
+    Periodically flips overdue pending approval requests to EXPIRED.
+
+    Requests are expired in batches of `batch_size`, each one bulk UPDATE
+    served by the (status, expires_at) index, and `on_expired` is awaited
+    with every batch once it is committed. On PostgreSQL each batch runs
+    under a transaction-level advisory lock, so with several API workers
+    only one sweeps at a time and the others skip the round; rows locked by
+    an in-flight vote are skipped and picked up next time.
+    """
+
+    def __init__(
+        self,
+        on_expired: Optional[Callable[[List[ExpiredRequest]], Awaitable[None]]] = None,
+        interval: float = 60.0,
+        batch_size: int = 500,
+        session_factory=AsyncSessionLocal
+    ):
+        self.on_expired = on_expired
+        self.interval = interval
+        self.batch_size = batch_size
+        self._session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.sweeps = 0
+        self.skipped = 0
+        self.errors = 0
+
+    async def _expire_batch(self, db: AsyncSession, now: datetime) -> Optional[List[ExpiredRequest]]:
+        """Expire one batch; None if another worker holds the sweep lock."""
+        if db.bind.dialect.name == "postgresql":
+            if not await db.scalar(select(func.pg_try_advisory_xact_lock(EXPIRY_SWEEP_LOCK_ID))):
+                return None
+
+        overdue = (
+            select(ApprovalRequest.id)
+            .where(
+                ApprovalRequest.status == ApprovalStatus.PENDING.value,
+                ApprovalRequest.expires_at <= now
+            )
+            .order_by(ApprovalRequest.expires_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(ApprovalRequest)
+            .where(ApprovalRequest.id.in_(overdue.scalar_subquery()))
+            .values(status=ApprovalStatus.EXPIRED.value)
+            .returning(ApprovalRequest.id, ApprovalRequest.title, ApprovalRequest.organization_id)
+            .execution_options(synchronize_session=False)
+        )
+        expired = [ExpiredRequest(*row) for row in result.all()]
+        await db.commit()
+        return expired
+
+    async def sweep(self) -> int:
+        """Expire every overdue request; returns how many were expired."""
+        now = datetime.utcnow()
+        total = 0
+        while True:
+            async with self._session_factory() as db:
+                expired = await self._expire_batch(db, now)
+            if expired is None:
+                self.skipped += 1
+                break
+            total += len(expired)
+            if expired and self.on_expired:
+                try:
+                    await self.on_expired(expired)
+                except Exception:
+                    logger.exception("Approval expiry notification failed")
+            if len(expired) < self.batch_size:
+                break
+        self.sweeps += 1
+        self.expired += total
+        return total
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                self.errors += 1
+                logger.exception("Approval expiry sweep failed")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "sweeps": self.sweeps,
+            "expired": self.expired,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
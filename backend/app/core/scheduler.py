@@ -0,0 +1,223 @@
+"""
+KT Secure - Fair-Share Signing Scheduler
+Weighted per-organization queues with concurrency and rate quotas per
+organization and per HSM slot
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Hashable, Optional
+import asyncio
+import time
+
+from ..config import get_settings
+
+GLOBAL_ORG = "global"
+
+
+class _Waiter:
+    __slots__ = ("future", "slot", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, slot: Hashable):
+        self.future = future
+        self.slot = slot
+        self.enqueued_at = time.monotonic()
+
+
+class _OrgState:
+    """Queues, quota and counters of one organization."""
+
+    def __init__(self, weight: float, max_concurrency: int, rate: float, burst: int):
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        # Interactive requests are served before bulk ones of the same org
+        self.interactive: Deque[_Waiter] = deque()
+        self.bulk: Deque[_Waiter] = deque()
+        self.in_flight = 0
+        self.virtual_time = 0.0
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def head(self) -> Optional[_Waiter]:
+        if self.interactive:
+            return self.interactive[0]
+        return self.bulk[0] if self.bulk else None
+
+    def pop_head(self) -> _Waiter:
+        return self.interactive.popleft() if self.interactive else self.bulk.popleft()
+
+    def queued(self) -> int:
+        return len(self.interactive) + len(self.bulk)
+
+    def refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def seconds_until_token(self) -> float:
+        return 0.0 if self.rate <= 0 or self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class FairShareScheduler:
+    """
+    Admission control in front of the signer.
+
+    Every signing operation waits in its organization's queue until the
+    organization is under its concurrency and rate quota and the target HSM
+    slot is under its concurrency limit. Among eligible organizations, the
+    one with the lowest weighted virtual time goes next (stride scheduling),
+    so a flooding tenant gets its weighted share and no more.
+    """
+
+    def __init__(
+        self,
+        org_max_concurrency: int = 8,
+        org_rate_per_second: float = 0.0,
+        org_burst: int = 50,
+        slot_max_concurrency: int = 16,
+        org_overrides: Optional[Dict[str, dict]] = None,
+        slot_overrides: Optional[Dict[str, int]] = None
+    ):
+        self.org_max_concurrency = org_max_concurrency
+        self.org_rate_per_second = org_rate_per_second
+        self.org_burst = org_burst
+        self.slot_max_concurrency = slot_max_concurrency
+        self.org_overrides = {str(k): v for k, v in (org_overrides or {}).items()}
+        self.slot_overrides = {str(k): v for k, v in (slot_overrides or {}).items()}
+        self._orgs: Dict[str, _OrgState] = {}
+        self._slot_in_flight: Dict[Hashable, int] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _org(self, organization_id: str) -> _OrgState:
+        state = self._orgs.get(organization_id)
+        if state is None:
+            override = self.org_overrides.get(organization_id, {})
+            state = _OrgState(
+                weight=float(override.get("weight", 1.0)),
+                max_concurrency=int(override.get("max_concurrency", self.org_max_concurrency)),
+                rate=float(override.get("rate_per_second", self.org_rate_per_second)),
+                burst=int(override.get("burst", self.org_burst))
+            )
+            self._orgs[organization_id] = state
+        return state
+
+    def _slot_limit(self, slot: Hashable) -> int:
+        return int(self.slot_overrides.get(str(slot), self.slot_max_concurrency))
+
+    def _dispatch(self):
+        """Grant as many waiters as the quotas allow, fairest first."""
+        self._timer = None
+        now = time.monotonic()
+        next_token_in = None
+
+        while True:
+            best = None
+            for state in self._orgs.values():
+                waiter = state.head()
+                if waiter is None or state.in_flight >= state.max_concurrency:
+                    continue
+                if self._slot_in_flight.get(waiter.slot, 0) >= self._slot_limit(waiter.slot):
+                    continue
+                state.refill(now)
+                wait = state.seconds_until_token()
+                if wait > 0:
+                    next_token_in = wait if next_token_in is None else min(next_token_in, wait)
+                    continue
+                if best is None or state.virtual_time < best.virtual_time:
+                    best = state
+            if best is None:
+                break
+
+            waiter = best.pop_head()
+            if waiter.future.done():
+                # Cancelled while queued
+                continue
+            if best.rate > 0:
+                best.tokens -= 1
+            best.in_flight += 1
+            best.virtual_time += 1.0 / best.weight
+            best.granted += 1
+            waited = now - waiter.enqueued_at
+            best.total_wait += waited
+            best.max_wait = max(best.max_wait, waited)
+            self._slot_in_flight[waiter.slot] = self._slot_in_flight.get(waiter.slot, 0) + 1
+            waiter.future.set_result(None)
+
+        if next_token_in is not None and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(next_token_in, self._dispatch)
+
+    def _release(self, state: _OrgState, slot: Hashable):
+        state.in_flight -= 1
+        self._slot_in_flight[slot] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, organization_id=None, hsm_slot: Hashable = None, interactive: bool = True):
+        """Wait for a turn to sign for an organization on an HSM slot."""
+        state = self._org(str(organization_id) if organization_id else GLOBAL_ORG)
+        if not state.queued() and not state.in_flight:
+            # An org returning from idle must not bank credit from its idle time
+            active = [s.virtual_time for s in self._orgs.values() if s.queued() or s.in_flight]
+            state.virtual_time = max(state.virtual_time, min(active, default=0.0))
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), hsm_slot)
+        (state.interactive if interactive else state.bulk).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(state, hsm_slot)
+            else:
+                waiter.future.cancel()
+                for queue in (state.interactive, state.bulk):
+                    if waiter in queue:
+                        queue.remove(waiter)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(state, hsm_slot)
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight count and wait times per org and slot."""
+        now = time.monotonic()
+        orgs = {}
+        for org_id, state in self._orgs.items():
+            oldest = [q[0].enqueued_at for q in (state.interactive, state.bulk) if q]
+            orgs[org_id] = {
+                "weight": state.weight,
+                "queued": state.queued(),
+                "queued_interactive": len(state.interactive),
+                "queued_bulk": len(state.bulk),
+                "in_flight": state.in_flight,
+                "max_concurrency": state.max_concurrency,
+                "rate_per_second": state.rate,
+                "granted": state.granted,
+                "avg_wait_ms": round(state.total_wait / state.granted * 1000, 2) if state.granted else 0.0,
+                "max_wait_ms": round(state.max_wait * 1000, 2),
+                "oldest_wait_ms": round((now - min(oldest)) * 1000, 2) if oldest else 0.0,
+            }
+        slots = {
+            str(slot): {"in_flight": count, "max_concurrency": self._slot_limit(slot)}
+            for slot, count in self._slot_in_flight.items()
+        }
+        return {"organizations": orgs, "hsm_slots": slots}
+
+
+settings = get_settings()
+
+# Singleton instance
+scheduler = FairShareScheduler(
+    org_max_concurrency=settings.SCHEDULER_ORG_MAX_CONCURRENCY,
+    org_rate_per_second=settings.SCHEDULER_ORG_RATE_PER_SECOND,
+    org_burst=settings.SCHEDULER_ORG_BURST,
+    slot_max_concurrency=settings.SCHEDULER_SLOT_MAX_CONCURRENCY,
+    org_overrides=settings.SCHEDULER_ORG_OVERRIDES,
+    slot_overrides=settings.SCHEDULER_SLOT_OVERRIDES
+)
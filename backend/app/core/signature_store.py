@@ -0,0 +1,192 @@
+"""
+KT Secure - Signature Store
+Content-addressed signature reuse and idempotency keys for signing requests
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, NamedTuple, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models.signing import SignatureRecord, SigningIdempotencyKey
+from ..utils.cache import TTLCache
+from .invalidation import bus
+from .signing_cache import CHANNEL
+
+# Key in AsyncSession.info for signatures staged by `add`
+PENDING = "signature_store.pending"
+
+
+def _insert(db: AsyncSession):
+    return postgresql_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+
+
+class SignatureAddress(NamedTuple):
+    """What a signature depends on: the digest and how it was signed."""
+    digest: str  # Hex encoded
+    hash_algorithm: str
+    config_id: UUID
+    key_fingerprint: str
+
+
+class SignatureStore:
+    """
+    Stored signatures keyed by SignatureAddress, with an LRU in front of
+    the signature_records table.
+
+    Callers must only look up signatures for a key they have just checked
+    is active; a stored signature is never a reason to skip that check.
+    Records older than `max_age` are ignored and signed again. If two
+    workers store the same address concurrently, the loser's row is skipped
+    (ON CONFLICT DO NOTHING) without touching the rest of its transaction,
+    and its (equally valid) signature is still returned to its client.
+    """
+
+    def __init__(self, max_entries: int, max_age: float, enabled: bool = True):
+        self.enabled = enabled
+        self.max_age = max_age
+        self._cache = TTLCache(max_entries=max_entries, ttl=max_age)
+        self.reused = 0
+        self.stored = 0
+        bus.subscribe(CHANNEL, self._on_message)
+
+    def _on_message(self, message: dict):
+        if message.get("key_id"):
+            key_id = UUID(message["key_id"])
+            self._cache.pop_where(lambda _, entry: entry[0] == key_id)
+
+    async def lookup(
+        self,
+        db: AsyncSession,
+        addresses: Iterable[SignatureAddress]
+    ) -> Dict[SignatureAddress, str]:
+        """Return the stored signature (hex) of every known address."""
+        if not self.enabled:
+            return {}
+
+        found: Dict[SignatureAddress, str] = {}
+        missing = set()
+        for address in set(addresses):
+            cached = self._cache.get(address)
+            if cached:
+                found[address] = cached[1]
+            else:
+                missing.add(address)
+
+        if missing:
+            now = datetime.utcnow()
+            result = await db.execute(
+                select(SignatureRecord)
+                .where(SignatureRecord.digest.in_({address.digest for address in missing}))
+                .where(SignatureRecord.config_id.in_({address.config_id for address in missing}))
+                .where(SignatureRecord.created_at >= now - timedelta(seconds=self.max_age))
+            )
+            for record in result.scalars().all():
+                address = SignatureAddress(
+                    record.digest, record.hash_algorithm, record.config_id, record.key_fingerprint
+                )
+                if address not in missing:
+                    continue
+                found[address] = record.signature
+                ttl = self.max_age - (now - record.created_at).total_seconds()
+                self._cache.set(address, (record.key_id, record.signature), ttl=ttl)
+
+        self.reused += len(found)
+        return found
+
+    def add(self, db: AsyncSession, address: SignatureAddress, key_id: UUID, signature: str):
+        """Stage a new signature; persisted (and cached) by `commit`."""
+        if not self.enabled or address in self._cache:
+            return
+        pending: Dict[SignatureAddress, Tuple[UUID, str]] = db.info.setdefault(PENDING, {})
+        pending.setdefault(address, (key_id, signature))
+
+    async def claim_idempotency_keys(
+        self,
+        db: AsyncSession,
+        config_id: UUID,
+        claims: Dict[str, str]
+    ) -> Set[str]:
+        """
+        Bind idempotency keys to digests for a config.
+        Returns the keys already bound to a different digest. New keys are
+        inserted right away (kept by `commit`), so a concurrent request
+        claiming the same key waits for this one and then sees its digest.
+        """
+        if not claims:
+            return set()
+
+        result = await db.execute(
+            _insert(db)(SigningIdempotencyKey)
+            .values([
+                {"config_id": config_id, "idempotency_key": idempotency_key, "digest": digest}
+                for idempotency_key, digest in sorted(claims.items())
+            ])
+            .on_conflict_do_nothing(index_elements=["config_id", "idempotency_key"])
+            .returning(SigningIdempotencyKey.idempotency_key)
+        )
+        taken = claims.keys() - set(result.scalars().all())
+        if not taken:
+            return set()
+
+        result = await db.execute(
+            select(SigningIdempotencyKey.idempotency_key, SigningIdempotencyKey.digest)
+            .where(SigningIdempotencyKey.config_id == config_id)
+            .where(SigningIdempotencyKey.idempotency_key.in_(taken))
+        )
+        return {
+            idempotency_key for idempotency_key, digest in result.all()
+            if digest != claims[idempotency_key]
+        }
+
+    async def commit(self, db: AsyncSession):
+        """Persist staged signatures and claimed idempotency keys, then cache the signatures."""
+        pending: Dict[SignatureAddress, Tuple[UUID, str]] = db.info.pop(PENDING, {})
+        if pending:
+            await db.execute(
+                _insert(db)(SignatureRecord)
+                .values([
+                    {
+                        "digest": address.digest,
+                        "hash_algorithm": address.hash_algorithm,
+                        "config_id": address.config_id,
+                        "key_id": key_id,
+                        "key_fingerprint": address.key_fingerprint,
+                        "signature": signature
+                    }
+                    for address, (key_id, signature) in pending.items()
+                ])
+                # Stored concurrently by another request
+                .on_conflict_do_nothing(
+                    index_elements=["digest", "hash_algorithm", "config_id", "key_fingerprint"]
+                )
+            )
+        await db.commit()
+        for address, entry in pending.items():
+            self._cache.set(address, entry)
+        self.stored += len(pending)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "reused": self.reused,
+            "stored": self.stored,
+            "cache": self._cache.stats(),
+        }
+
+
+settings = get_settings()
+
+# Singleton instance
+signature_store = SignatureStore(
+    max_entries=settings.SIGNATURE_REUSE_CACHE_MAX_ENTRIES,
+    max_age=settings.SIGNATURE_REUSE_MAX_AGE_SECONDS,
+    enabled=settings.SIGNATURE_REUSE_ENABLED
+)
@@ -0,0 +1,387 @@
+"""
+KT Secure - Signer Backends
+Pluggable signing backends used by the signing and key APIs
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+import asyncio
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+
+from ..config import get_settings
+from .hsm import HsmError, HsmSessionPool, get_hsm_pool
+
+
+# Config hash_algorithm values -> hashlib names
+HASH_ALGORITHMS = {
+    "SHA-256": "sha256",
+    "SHA-384": "sha384",
+    "SHA-512": "sha512",
+}
+
+# ASN.1 DigestInfo prefixes for RSA PKCS#1 v1.5 over a precomputed digest
+DIGEST_INFO_PREFIXES = {
+    "sha256": bytes.fromhex("3031300d060960864801650304020105000420"),
+    "sha384": bytes.fromhex("3041300d060960864801650304020205000430"),
+    "sha512": bytes.fromhex("3051300d060960864801650304020305000440"),
+}
+
+CURVE_ALIASES = {
+    "P-256": "P-256", "P256": "P-256", "SECP256R1": "P-256", "PRIME256V1": "P-256",
+    "P-384": "P-384", "P384": "P-384", "SECP384R1": "P-384",
+}
+
+
+class SignerError(Exception):
+    """Raised when a signer backend cannot complete an operation."""
+
+
+def hash_name(hash_algorithm: str) -> str:
+    """Map a config hash_algorithm (e.g. SHA-256) to a hashlib name."""
+    name = HASH_ALGORITHMS.get(hash_algorithm.upper())
+    if not name:
+        raise SignerError(f"Unsupported hash algorithm: {hash_algorithm}")
+    return name
+
+
+def key_params(
+    algorithm: str, key_size: Optional[int] = None, curve: Optional[str] = None
+) -> Tuple[str, Optional[int], Optional[str]]:
+    """
+    Normalise key parameters.
+    Accepts both split ("RSA", 4096) and combined ("RSA-4096", "ECDSA-P256")
+    algorithm names and returns (family, key_size, curve).
+    """
+    family, _, suffix = algorithm.upper().partition("-")
+    if family == "RSA":
+        return "RSA", key_size or (int(suffix) if suffix.isdigit() else 2048), None
+    if family in ("EC", "ECDSA"):
+        name = CURVE_ALIASES.get((curve or suffix or "P-256").upper())
+        if not name:
+            raise SignerError(f"Unsupported curve: {curve or suffix}")
+        return "EC", None, name
+    raise SignerError(f"Unsupported key algorithm: {algorithm}")
+
+
+class Signer(ABC):
+    """
+    Signing backend.
+    `key` is anything with the Pkcs11Key attributes (algorithm, key_size,
+    curve, fingerprint, hsm_slot). Digests are raw bytes produced with the
+    config's hash algorithm.
+    """
+
+    name: str = "base"
+    # Whether key material generated on one node can be used from every
+    # node; the key pool only hands out keys when it is
+    shared_key_storage: bool = False
+
+    @abstractmethod
+    async def sign_digest(self, key: Any, digest: bytes, hash_algorithm: str) -> bytes:
+        """Sign a digest with a key."""
+
+    @abstractmethod
+    async def verify_digest(self, key: Any, digest: bytes, signature: bytes, hash_algorithm: str) -> bool:
+        """Verify a signature over a digest."""
+
+    async def verify_digests(
+        self, key: Any, items: Sequence[Tuple[bytes, bytes]], hash_algorithm: str
+    ) -> List[bool]:
+        """Verify many (digest, signature) pairs made with one key."""
+        return list(await asyncio.gather(
+            *(self.verify_digest(key, digest, signature, hash_algorithm) for digest, signature in items)
+        ))
+
+    @abstractmethod
+    async def generate_key(
+        self, algorithm: str, key_size: Optional[int], curve: Optional[str], hsm_slot: int
+    ) -> str:
+        """Create key material and return its fingerprint."""
+
+    async def close(self):
+        """Release backend resources."""
+
+
+class MockSigner(Signer):
+    """Development signer: a keyed SHA-256 over the digest, no key material."""
+
+    name = "mock"
+    shared_key_storage = True
+
+    async def sign_digest(self, key: Any, digest: bytes, hash_algorithm: str) -> bytes:
+        return hashlib.sha256(digest + key.fingerprint.encode()).digest()
+
+    async def verify_digest(self, key: Any, digest: bytes, signature: bytes, hash_algorithm: str) -> bool:
+        expected = await self.sign_digest(key, digest, hash_algorithm)
+        return hmac.compare_digest(expected, signature)
+
+    async def generate_key(
+        self, algorithm: str, key_size: Optional[int], curve: Optional[str], hsm_slot: int
+    ) -> str:
+        return hashlib.sha256(secrets.token_bytes(32)).hexdigest()[:40]
+
+
+# Software signer worker functions. They run in worker processes, so they
+# take plain arguments and load keys from the keystore themselves.
+
+@lru_cache(maxsize=256)
+def _load_private_key(path: str):
+    from cryptography.hazmat.primitives import serialization
+
+    with open(path, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+def _private_key(keystore_dir: str, fingerprint: str):
+    path = os.path.join(keystore_dir, f"{fingerprint}.pem")
+    if not os.path.exists(path):
+        raise SignerError(f"No key material for fingerprint {fingerprint}")
+    return _load_private_key(path)
+
+
+def _signature_params(private_key, hash_algorithm: str):
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec, padding, utils
+
+    prehashed = utils.Prehashed(getattr(hashes, hash_name(hash_algorithm).upper())())
+    if isinstance(private_key, ec.EllipticCurvePrivateKey):
+        return (ec.ECDSA(prehashed),)
+    return (padding.PKCS1v15(), prehashed)
+
+
+def _software_sign(keystore_dir: str, fingerprint: str, digest: bytes, hash_algorithm: str) -> bytes:
+    private_key = _private_key(keystore_dir, fingerprint)
+    return private_key.sign(digest, *_signature_params(private_key, hash_algorithm))
+
+
+@lru_cache(maxsize=256)
+def _load_public_key(path: str):
+    return _load_private_key(path).public_key()
+
+
+def _software_verify(
+    keystore_dir: str, fingerprint: str, digest: bytes, signature: bytes, hash_algorithm: str
+) -> bool:
+    return _software_verify_many(keystore_dir, fingerprint, [(digest, signature)], hash_algorithm)[0]
+
+
+def _software_verify_many(
+    keystore_dir: str, fingerprint: str, items: Sequence[Tuple[bytes, bytes]], hash_algorithm: str
+) -> List[bool]:
+    from cryptography.exceptions import InvalidSignature
+
+    private_key = _private_key(keystore_dir, fingerprint)
+    public_key = _load_public_key(os.path.join(keystore_dir, f"{fingerprint}.pem"))
+    params = _signature_params(private_key, hash_algorithm)
+    results = []
+    for digest, signature in items:
+        try:
+            public_key.verify(signature, digest, *params)
+        except InvalidSignature:
+            results.append(False)
+        else:
+            results.append(True)
+    return results
+
+
+def _software_generate(
+    keystore_dir: str, family: str, key_size: Optional[int], curve: Optional[str]
+) -> str:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if family == "RSA":
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    else:
+        curves = {"P-256": ec.SECP256R1, "P-384": ec.SECP384R1}
+        private_key = ec.generate_private_key(curves[curve]())
+
+    public_der = private_key.public_key().public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    fingerprint = hashlib.sha256(public_der).hexdigest()[:40]
+
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    path = Path(keystore_dir) / f"{fingerprint}.pem"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(pem)
+    return fingerprint
+
+
+class SoftwareSigner(Signer):
+    """
+    RSA/ECDSA signer built on `cryptography`.
+    Private operations are CPU-bound, so they run in a process pool sized by
+    CPU count instead of on the event loop. Keys are PEM files in the keystore
+    directory named by fingerprint. Worker failures are raised as SignerError;
+    if a worker dies, the pool is replaced for the next call.
+    """
+
+    name = "software"
+    VERIFY_CHUNK_SIZE = 256
+
+    def __init__(self, keystore_dir: str, max_workers: Optional[int] = None):
+        self.keystore_dir = keystore_dir
+        self.max_workers = max_workers or os.cpu_count()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool as e:
+            # Concurrent callers share the broken pool; only the first replaces it
+            if self._executor is executor:
+                self._executor = self._new_executor()
+                executor.shutdown(wait=False)
+            raise SignerError(f"Signer worker process died: {e}")
+        except ValueError as e:
+            # cryptography rejects the key or digest (e.g. wrong digest length)
+            raise SignerError(str(e))
+
+    async def sign_digest(self, key: Any, digest: bytes, hash_algorithm: str) -> bytes:
+        return await self._run(_software_sign, self.keystore_dir, key.fingerprint, digest, hash_algorithm)
+
+    async def verify_digest(self, key: Any, digest: bytes, signature: bytes, hash_algorithm: str) -> bool:
+        return await self._run(
+            _software_verify, self.keystore_dir, key.fingerprint, digest, signature, hash_algorithm
+        )
+
+    async def verify_digests(
+        self, key: Any, items: Sequence[Tuple[bytes, bytes]], hash_algorithm: str
+    ) -> List[bool]:
+        # One task per chunk instead of per signature: the key is loaded once
+        # per chunk and IPC overhead is amortised across the chunk.
+        chunks = [items[i:i + self.VERIFY_CHUNK_SIZE] for i in range(0, len(items), self.VERIFY_CHUNK_SIZE)]
+        results = await asyncio.gather(*(
+            self._run(_software_verify_many, self.keystore_dir, key.fingerprint, list(chunk), hash_algorithm)
+            for chunk in chunks
+        ))
+        return [valid for chunk in results for valid in chunk]
+
+    async def generate_key(
+        self, algorithm: str, key_size: Optional[int], curve: Optional[str], hsm_slot: int
+    ) -> str:
+        family, key_size, curve = key_params(algorithm, key_size, curve)
+        return await self._run(_software_generate, self.keystore_dir, family, key_size, curve)
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class HsmSigner(Signer):
+    """
+    Signer backed by the HSM session pool.
+    RSA uses CKM_RSA_PKCS over a DigestInfo; ECDSA signatures are returned
+    DER encoded like the software signer's.
+    """
+
+    name = "hsm"
+    shared_key_storage = True
+
+    def __init__(self, pool: HsmSessionPool):
+        self.pool = pool
+
+    @staticmethod
+    def _mechanism_input(key: Any, digest: bytes, hash_algorithm: str) -> Tuple[str, bytes]:
+        family, _, _ = key_params(key.algorithm, key.key_size, key.curve)
+        if family == "RSA":
+            return "RSA-PKCS", DIGEST_INFO_PREFIXES[hash_name(hash_algorithm)] + digest
+        return "ECDSA", digest
+
+    async def sign_digest(self, key: Any, digest: bytes, hash_algorithm: str) -> bytes:
+        mechanism, data = self._mechanism_input(key, digest, hash_algorithm)
+        try:
+            signature = await self.pool.sign(key.hsm_slot, key.fingerprint, data, mechanism)
+        except HsmError as e:
+            raise SignerError(str(e))
+        if mechanism == "ECDSA" and self.pool.backend.raw_ecdsa_signatures:
+            signature = _ecdsa_raw_to_der(signature)
+        return signature
+
+    async def verify_digest(self, key: Any, digest: bytes, signature: bytes, hash_algorithm: str) -> bool:
+        mechanism, data = self._mechanism_input(key, digest, hash_algorithm)
+        if mechanism == "ECDSA" and self.pool.backend.raw_ecdsa_signatures:
+            try:
+                signature = _ecdsa_der_to_raw(signature, key)
+            except ValueError:
+                return False
+        try:
+            return await self.pool.verify(key.hsm_slot, key.fingerprint, data, signature, mechanism)
+        except HsmError as e:
+            raise SignerError(str(e))
+
+    async def generate_key(
+        self, algorithm: str, key_size: Optional[int], curve: Optional[str], hsm_slot: int
+    ) -> str:
+        family, key_size, curve = key_params(algorithm, key_size, curve)
+        try:
+            return await self.pool.generate_key(hsm_slot, family, key_size, curve)
+        except HsmError as e:
+            raise SignerError(str(e))
+
+
+def _ecdsa_raw_to_der(signature: bytes) -> bytes:
+    from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
+    half = len(signature) // 2
+    return encode_dss_signature(
+        int.from_bytes(signature[:half], "big"), int.from_bytes(signature[half:], "big")
+    )
+
+
+def _ecdsa_der_to_raw(signature: bytes, key: Any) -> bytes:
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
+    _, _, curve = key_params(key.algorithm, key.key_size, key.curve)
+    size = 32 if curve == "P-256" else 48
+    r, s = decode_dss_signature(signature)
+    return r.to_bytes(size, "big") + s.to_bytes(size, "big")
+
+
+_signer: Optional[Signer] = None
+
+
+def get_signer() -> Signer:
+    """Return the configured signer backend, creating it on first use."""
+    global _signer
+    if _signer is None:
+        settings = get_settings()
+        if settings.SIGNER_BACKEND == "software":
+            _signer = SoftwareSigner(
+                settings.SIGNER_KEYSTORE_DIR,
+                max_workers=settings.SIGNER_PROCESS_POOL_SIZE or None
+            )
+        elif settings.SIGNER_BACKEND == "hsm":
+            _signer = HsmSigner(get_hsm_pool())
+        else:
+            _signer = MockSigner()
+    return _signer
+
+
+async def shutdown_signer():
+    """Release the signer backend if it was created."""
+    global _signer
+    if _signer is not None:
+        await _signer.close()
+        _signer = None
@@ -0,0 +1,76 @@
+"""
+KT Secure - Signing Target Cache
+Resolved (SigningConfig, Pkcs11Key) pairs keyed by config id
+"""
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import inspect
+
+from ..config import get_settings
+from ..models import Pkcs11Key, SigningConfig
+from ..utils.cache import TTLCache
+from .invalidation import bus
+
+CHANNEL = "signing_targets"
+
+
+def _snapshot(obj):
+    """
+    Copy the column values of an ORM object into a new transient instance.
+    Cached objects must not belong to any session, or a rollback in the
+    session that loaded them would expire them under other requests.
+    """
+    mapper = inspect(obj).mapper
+    return mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+
+class SigningTargetCache:
+    """
+    TTL/LRU cache of resolved signing targets.
+
+    Entries are dropped when a config or key changes, in this worker
+    directly and in other workers through the invalidation bus. The TTL
+    bounds how long a disabled config or revoked key can keep signing if an
+    invalidation message is lost.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        bus.subscribe(CHANNEL, self._on_message)
+
+    def get(self, config_id: UUID) -> Optional[Tuple[SigningConfig, Pkcs11Key]]:
+        return self._cache.get(config_id)
+
+    def put(self, config: SigningConfig, key: Pkcs11Key):
+        self._cache.set(config.id, (_snapshot(config), _snapshot(key)))
+
+    def _on_message(self, message: dict):
+        if message.get("config_id"):
+            self._cache.pop(UUID(message["config_id"]))
+        if message.get("key_id"):
+            key_id = UUID(message["key_id"])
+            self._cache.pop_where(lambda _, target: target[1].id == key_id)
+
+    async def invalidate_config(self, config_id: UUID):
+        """Drop a config everywhere (create, update, enable/disable)."""
+        await bus.publish(CHANNEL, {"config_id": str(config_id)})
+
+    async def invalidate_key(self, key_id: UUID):
+        """Drop every config that signs with a key (revocation)."""
+        await bus.publish(CHANNEL, {"key_id": str(key_id)})
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+settings = get_settings()
+
+# Singleton instance
+signing_targets = SigningTargetCache(
+    max_entries=settings.SIGNING_CACHE_MAX_ENTRIES,
+    ttl=settings.SIGNING_CACHE_TTL_SECONDS
+)
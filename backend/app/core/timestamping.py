@@ -0,0 +1,451 @@
+"""
+KT Secure - RFC 3161 Timestamping
+Batches signatures per timestamp authority and timestamps them together
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import secrets
+import time
+
+from ..config import get_settings
+from ..utils.merkle import MerkleTree, ProofStep, leaf_hash
+from .signer import DIGEST_INFO_PREFIXES
+
+# Signatures are timestamped by their SHA-256 hash
+TIMESTAMP_HASH = "sha256"
+STUB_TSA = "stub"
+
+TIMESTAMP_QUERY_TYPE = "application/timestamp-query"
+TIMESTAMP_REPLY_TYPE = "application/timestamp-reply"
+
+# DER encoded id-signedData and id-ct-TSTInfo
+SIGNED_DATA_OID = bytes.fromhex("06092a864886f70d010702")
+TST_INFO_OID = bytes.fromhex("060b2a864886f70d0109100104")
+
+
+class TimestampError(Exception):
+    """Raised when a timestamp authority cannot timestamp a digest."""
+
+
+# Minimal DER encoding for TimeStampReq / TimeStampResp
+
+def _der(tag: int, content: bytes) -> bytes:
+    length = len(content)
+    if length < 0x80:
+        return bytes([tag, length]) + content
+    size = (length.bit_length() + 7) // 8
+    return bytes([tag, 0x80 | size]) + length.to_bytes(size, "big") + content
+
+
+def _der_int(value: int) -> bytes:
+    return _der(0x02, value.to_bytes(value.bit_length() // 8 + 1, "big", signed=True))
+
+
+def _der_read(data: bytes, offset: int = 0) -> Tuple[int, bytes, int]:
+    """Read one TLV; returns (tag, content, offset after it)."""
+    if offset + 2 > len(data):
+        raise TimestampError("Truncated DER")
+    tag, length = data[offset], data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], "big")
+        offset += size
+    if offset + length > len(data):
+        raise TimestampError("Truncated DER")
+    return tag, data[offset:offset + length], offset + length
+
+
+def _algorithm_identifier(hash_name: str) -> bytes:
+    # The DigestInfo prefix starts with SEQUENCE { AlgorithmIdentifier, ...}
+    prefix = DIGEST_INFO_PREFIXES[hash_name]
+    _, digest_info, _ = _der_read(prefix + bytes(hashlib.new(hash_name).digest_size))
+    _, _, end = _der_read(digest_info)
+    return digest_info[:end]
+
+
+def _message_imprint(digest: bytes, hash_name: str) -> bytes:
+    return _der(0x30, _algorithm_identifier(hash_name) + _der(0x04, digest))
+
+
+def encode_timestamp_request(digest: bytes, nonce: int, hash_name: str = TIMESTAMP_HASH) -> bytes:
+    """DER TimeStampReq asking for the TSA certificate in the token."""
+    return _der(0x30, (
+        _der_int(1)
+        + _message_imprint(digest, hash_name)
+        + _der_int(nonce)
+        + _der(0x01, b"\xff")
+    ))
+
+
+def decode_timestamp_response(data: bytes) -> bytes:
+    """Return the DER timeStampToken of a granted TimeStampResp."""
+    _, response, _ = _der_read(data)
+    _, status_info, offset = _der_read(response)
+    _, status, _ = _der_read(status_info)
+    # 0 = granted, 1 = grantedWithMods
+    if int.from_bytes(status, "big") not in (0, 1):
+        raise TimestampError(f"TSA rejected the request (status {int.from_bytes(status, 'big')})")
+    if offset >= len(response):
+        raise TimestampError("TSA response has no token")
+    _, _, end = _der_read(response, offset)
+    return response[offset:end]
+
+
+def _tst_info(token: bytes) -> bytes:
+    """
+    The TSTInfo inside a timeStampToken: a CMS SignedData, or the stub's
+    bare encapContentInfo.
+    """
+    _, content, _ = _der_read(token)
+    _, _, offset = _der_read(content)
+    if content[:offset] == SIGNED_DATA_OID:
+        _, explicit, _ = _der_read(content, offset)
+        _, signed_data, _ = _der_read(explicit)
+        _, _, offset = _der_read(signed_data)  # version
+        _, _, offset = _der_read(signed_data, offset)  # digestAlgorithms
+        _, content, _ = _der_read(signed_data, offset)  # encapContentInfo
+        _, _, offset = _der_read(content)
+    if content[:offset] != TST_INFO_OID:
+        raise TimestampError("Token does not contain a TSTInfo")
+    _, explicit, _ = _der_read(content, offset)
+    _, octets, _ = _der_read(explicit)
+    _, tst_info, _ = _der_read(octets)
+    return tst_info
+
+
+def _imprint_parts(imprint: bytes) -> Tuple[bytes, bytes]:
+    """(hash algorithm OID, hashed message) of a MessageImprint's content."""
+    _, algorithm, offset = _der_read(imprint)
+    _, oid, _ = _der_read(algorithm)
+    _, hashed, _ = _der_read(imprint, offset)
+    return oid, hashed
+
+
+def check_timestamp_token(token: bytes, digest: bytes, nonce: int, hash_name: str = TIMESTAMP_HASH):
+    """
+    Check that a token answers our request (RFC 3161 section 2.4.2): its
+    messageImprint is the digest that was sent and it echoes the nonce.
+    """
+    tst_info = _tst_info(token)
+    _, _, offset = _der_read(tst_info)  # version
+    _, _, offset = _der_read(tst_info, offset)  # policy
+    _, imprint, offset = _der_read(tst_info, offset)
+    _, expected, _ = _der_read(_message_imprint(digest, hash_name))
+    if _imprint_parts(imprint) != _imprint_parts(expected):
+        raise TimestampError("TSA token is for a different digest")
+
+    _, _, offset = _der_read(tst_info, offset)  # serialNumber
+    _, _, offset = _der_read(tst_info, offset)  # genTime
+    token_nonce = None
+    while offset < len(tst_info):
+        # accuracy and ordering are optional and come before the nonce
+        tag, value, offset = _der_read(tst_info, offset)
+        if tag == 0x02:
+            token_nonce = int.from_bytes(value, "big", signed=True)
+            break
+    if token_nonce != nonce:
+        raise TimestampError("TSA token does not carry the request's nonce")
+
+
+@dataclass
+class TimestampProof:
+    """
+    A token over `root` and the Merkle path to it from the signature's
+    SHA-256 hash, i.e. merkle.root_from_proof(sha256(signature), proof).
+    """
+    tsa: str
+    token: bytes
+    root: bytes
+    proof: List[ProofStep]
+    batch_size: int
+
+
+class TimestampAuthority(ABC):
+    """A source of RFC 3161 tokens."""
+
+    @abstractmethod
+    async def timestamp(self, digest: bytes) -> bytes:
+        """Return a DER timeStampToken over a SHA-256 digest."""
+
+    async def close(self):
+        """Release resources."""
+
+
+class HttpTimestampAuthority(TimestampAuthority):
+    """RFC 3161 over HTTP through a shared, pooled client."""
+
+    def __init__(self, url: str, client):
+        self.url = url
+        self._client = client
+
+    async def timestamp(self, digest: bytes) -> bytes:
+        import httpx
+
+        nonce = secrets.randbits(63)
+        try:
+            response = await self._client.post(
+                self.url,
+                content=encode_timestamp_request(digest, nonce),
+                headers={"Content-Type": TIMESTAMP_QUERY_TYPE}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise TimestampError(f"TSA request to {self.url} failed: {e}")
+        # The DER reader raises TimestampError on malformed responses
+        token = decode_timestamp_response(response.content)
+        check_timestamp_token(token, digest, nonce)
+        return token
+
+
+class StubTimestampAuthority(TimestampAuthority):
+    """
+    Local TSA for tests and development.
+    Speaks the RFC 3161 request/response encoding, but the token is an
+    unsigned TSTInfo, not a CMS SignedData: it proves nothing.
+    """
+
+    # A private test policy OID
+    POLICY_OID = bytes.fromhex("06032a0304")
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._serial = 0
+
+    def handle(self, request: bytes) -> bytes:
+        """Answer a DER TimeStampReq with a DER TimeStampResp."""
+        _, body, _ = _der_read(request)
+        _, _, offset = _der_read(body)  # version
+        _, imprint, offset = _der_read(body, offset)
+        nonce = b""
+        if offset < len(body):
+            tag, value, _ = _der_read(body, offset)
+            if tag == 0x02:
+                nonce = _der(0x02, value)
+
+        self.requests += 1
+        self._serial += 1
+        gen_time = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%SZ").encode()
+        tst_info = _der(0x30, (
+            _der_int(1)
+            + self.POLICY_OID
+            + _der(0x30, imprint)
+            + _der_int(self._serial)
+            + _der(0x18, gen_time)
+            + nonce
+        ))
+        token = _der(0x30, TST_INFO_OID + _der(0xA0, _der(0x04, tst_info)))
+        return _der(0x30, _der(0x30, _der_int(0)) + token)
+
+    async def timestamp(self, digest: bytes) -> bytes:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        nonce = secrets.randbits(63)
+        token = decode_timestamp_response(self.handle(encode_timestamp_request(digest, nonce)))
+        check_timestamp_token(token, digest, nonce)
+        return token
+
+
+@dataclass
+class _Window:
+    items: List[Tuple[bytes, asyncio.Future]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class TimestampService:
+    """
+    Timestamps signatures with as few TSA round trips as possible.
+
+    In "merkle" mode signatures arriving within `window` seconds for the
+    same TSA are collected, the Merkle root of their hashes is timestamped
+    once and every signature gets the token plus its inclusion proof. In
+    "individual" mode each signature is timestamped on its own, with the
+    requests pipelined over the pooled HTTP client.
+    """
+
+    def __init__(
+        self,
+        mode: str = "merkle",
+        window: float = 0.05,
+        max_batch: int = 1024,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        allow_stub: bool = False
+    ):
+        self.mode = mode
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.allow_stub = allow_stub
+        self._client = None
+        self._authorities: Dict[str, TimestampAuthority] = {}
+        self._windows: Dict[str, _Window] = {}
+        self._flushes: set = set()
+        # Metrics
+        self.timestamped = 0
+        self.tsa_requests = 0
+        self.errors = 0
+        self.max_batch_seen = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.started_at = time.monotonic()
+
+    def authority(self, tsa: str) -> TimestampAuthority:
+        """Return the client for a config's timestamp_authority."""
+        authority = self._authorities.get(tsa)
+        if authority is None:
+            if tsa == STUB_TSA:
+                if not self.allow_stub:
+                    raise TimestampError("The stub TSA is disabled (TIMESTAMP_ALLOW_STUB)")
+                authority = StubTimestampAuthority()
+            else:
+                if self._client is None:
+                    import httpx
+
+                    self._client = httpx.AsyncClient(
+                        timeout=self.timeout,
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections
+                        )
+                    )
+                authority = HttpTimestampAuthority(tsa, self._client)
+            self._authorities[tsa] = authority
+        return authority
+
+    async def _call_tsa(self, tsa: str, digest: bytes) -> bytes:
+        started = time.monotonic()
+        try:
+            return await self.authority(tsa).timestamp(digest)
+        except TimestampError:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.tsa_requests += 1
+            self.total_latency += elapsed
+            self.max_latency = max(self.max_latency, elapsed)
+
+    async def timestamp(self, tsa: str, signature: bytes) -> TimestampProof:
+        """Timestamp a signature with a TSA; batched with concurrent callers."""
+        digest = hashlib.new(TIMESTAMP_HASH, signature).digest()
+        if self.mode != "merkle":
+            # A one-leaf tree, so tokens verify the same way in both modes
+            root = leaf_hash(digest, TIMESTAMP_HASH)
+            token = await self._call_tsa(tsa, root)
+            self.timestamped += 1
+            self.max_batch_seen = max(self.max_batch_seen, 1)
+            return TimestampProof(tsa=tsa, token=token, root=root, proof=[], batch_size=1)
+
+        future = asyncio.get_running_loop().create_future()
+        window = self._windows.setdefault(tsa, _Window())
+        window.items.append((digest, future))
+        if len(window.items) >= self.max_batch:
+            self._flush(tsa)
+        elif window.timer is None:
+            window.timer = asyncio.get_running_loop().call_later(self.window, self._flush, tsa)
+        return await future
+
+    def _flush(self, tsa: str):
+        window = self._windows.pop(tsa, None)
+        if window is None:
+            return
+        if window.timer is not None:
+            window.timer.cancel()
+        task = asyncio.create_task(self._timestamp_batch(tsa, window.items))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+        task.add_done_callback(partial(self._settle, window.items))
+
+    @staticmethod
+    def _settle(items: List[Tuple[bytes, asyncio.Future]], task: asyncio.Task):
+        """Pass a batch's unexpected error (or cancellation) on to callers still waiting."""
+        error = None if task.cancelled() else task.exception()
+        for _, future in items:
+            if not future.done():
+                if error is None:
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+
+    async def _timestamp_batch(self, tsa: str, items: List[Tuple[bytes, asyncio.Future]]):
+        try:
+            tree = MerkleTree([digest for digest, _ in items], TIMESTAMP_HASH)
+            token = await self._call_tsa(tsa, tree.root)
+        except TimestampError as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.timestamped += len(items)
+        self.max_batch_seen = max(self.max_batch_seen, len(items))
+        for index, (_, future) in enumerate(items):
+            if not future.done():
+                future.set_result(TimestampProof(
+                    tsa=tsa, token=token, root=tree.root, proof=tree.proof(index), batch_size=len(items)
+                ))
+
+    async def close(self):
+        """Flush pending windows and close the HTTP client."""
+        for tsa in list(self._windows):
+            self._flush(tsa)
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        for authority in self._authorities.values():
+            await authority.close()
+        self._authorities = {}
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        """Throughput, batching and TSA latency."""
+        uptime = time.monotonic() - self.started_at
+        return {
+            "mode": self.mode,
+            "window_ms": self.window * 1000,
+            "timestamped": self.timestamped,
+            "tsa_requests": self.tsa_requests,
+            "errors": self.errors,
+            "avg_batch_size": round(self.timestamped / self.tsa_requests, 2) if self.tsa_requests else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "avg_tsa_latency_ms": round(self.total_latency / self.tsa_requests * 1000, 2) if self.tsa_requests else 0.0,
+            "max_tsa_latency_ms": round(self.max_latency * 1000, 2),
+            "signatures_per_second": round(self.timestamped / uptime, 2) if uptime else 0.0,
+            "pending": sum(len(window.items) for window in self._windows.values()),
+        }
+
+
+_timestamper: Optional[TimestampService] = None
+
+
+def get_timestamper() -> TimestampService:
+    """Return the timestamp service, creating it on first use."""
+    global _timestamper
+    if _timestamper is None:
+        settings = get_settings()
+        _timestamper = TimestampService(
+            mode=settings.TIMESTAMP_MODE,
+            window=settings.TIMESTAMP_BATCH_WINDOW_MS / 1000,
+            max_batch=settings.TIMESTAMP_BATCH_MAX_SIZE,
+            timeout=settings.TIMESTAMP_TIMEOUT_SECONDS,
+            max_connections=settings.TIMESTAMP_MAX_CONNECTIONS,
+            allow_stub=settings.TIMESTAMP_ALLOW_STUB
+        )
+    return _timestamper
+
+
+async def shutdown_timestamper():
+    """Close the timestamp service if it was created."""
+    global _timestamper
+    if _timestamper is not None:
+        await _timestamper.close()
+        _timestamper = None
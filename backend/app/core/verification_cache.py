@@ -0,0 +1,51 @@
+"""
+KT Secure - Verification Cache
+Positive signature verification results keyed by (digest, signature, key)
+"""
+from uuid import UUID
+
+from ..config import get_settings
+from ..utils.cache import TTLCache
+from .invalidation import bus
+from .signing_cache import CHANNEL
+
+
+class VerificationCache:
+    """
+    TTL/LRU cache of signatures known to be valid.
+
+    Only positive results are cached: a failed verification is cheap to
+    repeat and caching it would let garbage input fill the cache. Entries
+    of a key are dropped when the key is revoked, here and on other workers
+    through the invalidation bus.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        bus.subscribe(CHANNEL, self._on_message)
+
+    def _on_message(self, message: dict):
+        if message.get("key_id"):
+            key_id = UUID(message["key_id"])
+            self._cache.pop_where(lambda entry, _: entry[0] == key_id)
+
+    def is_verified(self, key_id: UUID, digest: bytes, signature: bytes, hash_algorithm: str) -> bool:
+        return self._cache.get((key_id, digest, signature, hash_algorithm.upper()), False)
+
+    def add(self, key_id: UUID, digest: bytes, signature: bytes, hash_algorithm: str):
+        self._cache.set((key_id, digest, signature, hash_algorithm.upper()), True)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+settings = get_settings()
+
+# Singleton instance
+verified_signatures = VerificationCache(
+    max_entries=settings.VERIFY_CACHE_MAX_ENTRIES,
+    ttl=settings.VERIFY_CACHE_TTL_SECONDS
+)
@@ -6,6 +6,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from .config import get_settings
+from .core.audit import audit as audit_service
+from .core.audit_chain import audit_chain
+from .core.audit_partitions import audit_partitions
+from .core.hsm import shutdown_hsm_pool
+from .core.invalidation import bus
+from .core.key_pool import key_pool
+from .core.signer import shutdown_signer
+from .core.timestamping import shutdown_timestamper
 from .api import organizations, users, keys, signing, projects, audit, auth, quorum, websocket, ceremony, ca
 
 settings = get_settings()
@@ -15,9 +23,29 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     # Startup
     print(f"🚀 Starting {settings.APP_NAME} v{settings.APP_VERSION}")
+    if settings.CACHE_INVALIDATION_BACKEND == "redis":
+        await bus.start(settings.REDIS_URL)
+    await audit_service.start()
+    await audit_chain.start()
+    await audit_partitions.start()
+    await signing.signing_jobs.start()
+    await key_pool.start()
+    await quorum.approval_expiry.start()
+    await quorum.approval_executor.start()
     yield
     # Shutdown
     print("👋 Shutting down...")
+    await quorum.approval_executor.stop()
+    await quorum.approval_expiry.stop()
+    await key_pool.stop()
+    await signing.signing_jobs.stop()
+    await shutdown_timestamper()
+    await shutdown_signer()
+    await shutdown_hsm_pool()
+    await audit_partitions.stop()
+    await audit_chain.stop()
+    await audit_service.stop()
+    await bus.stop()
 
 
 app = FastAPI(
@@ -34,6 +62,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -1,7 +1,7 @@
 """
 KT Secure - SQLAlchemy Models
 """
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Text, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID, INET
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -12,6 +12,10 @@ from ..database import Base
 
 class Organization(Base):
     __tablename__ = "organizations"
+    # Keyset pagination on (created_at, id), see utils/pagination.py
+    __table_args__ = (
+        Index("ix_organizations_created_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
@@ -20,7 +24,7 @@ class Organization(Base):
     status = Column(String(20), default="active")
     hsm_slot = Column(Integer, nullable=True)
     admin_email = Column(String(255))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, onupdate=datetime.utcnow)
     
     # Relationships
@@ -29,8 +33,28 @@ class Organization(Base):
     keys = relationship("Pkcs11Key", back_populates="organization")
 
 
+class OrganizationCounter(Base):
+    """
+    Materialized user and key counts per organization.
+    Maintained by database triggers on users and pkcs11_keys (migration
+    007, PostgreSQL); read when ORG_COUNTS_SOURCE=counters.
+    """
+    __tablename__ = "organization_counters"
+    
+    organization_id = Column(
+        UUID(as_uuid=True), ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True
+    )
+    users_count = Column(Integer, nullable=False, default=0)
+    keys_count = Column(Integer, nullable=False, default=0)
+
+
 class User(Base):
     __tablename__ = "users"
+    # Keyset pagination on (created_at, id), see utils/pagination.py
+    __table_args__ = (
+        Index("ix_users_created_id", "created_at", "id"),
+        Index("ix_users_org_created_id", "organization_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     email = Column(String(255), unique=True, nullable=False)
@@ -40,7 +64,7 @@ class User(Base):
     azure_ad_oid = Column(String(100), nullable=True)
     status = Column(String(20), default="active")
     hashed_password = Column(String(255), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     
     # Relationships
     organization = relationship("Organization", back_populates="users")
@@ -48,6 +72,11 @@ class User(Base):
 
 class Pkcs11Key(Base):
     __tablename__ = "pkcs11_keys"
+    # Keyset pagination on (created_at, id), see utils/pagination.py
+    __table_args__ = (
+        Index("ix_pkcs11_keys_created_id", "created_at", "id"),
+        Index("ix_pkcs11_keys_org_created_id", "organization_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
@@ -58,7 +87,7 @@ class Pkcs11Key(Base):
     hsm_slot = Column(Integer, nullable=False)
     organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"))
     status = Column(String(20), default="active")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     
     # Relationships
     organization = relationship("Organization", back_populates="keys")
@@ -94,12 +123,69 @@ class Project(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # Keyset pagination on (created_at, id), see utils/pagination.py.
+    # Range-partitioned by month on created_at (see core/audit_partitions.py),
+    # so unique indexes must include it: sequence is unique by construction
+    __table_args__ = (
+        Index("ix_audit_logs_created_id", "created_at", "id"),
+        Index("ix_audit_logs_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_audit_logs_entity_created_id", "entity_type", "created_at", "id"),
+        Index("ix_audit_logs_sequence", "sequence"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     action = Column(String(100), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    organization_id = Column(UUID(as_uuid=True), nullable=True)  # No FK: entries outlive orgs
     entity_type = Column(String(50))
     entity_id = Column(UUID(as_uuid=True))
     changes = Column(JSON)
     ip_address = Column(INET, nullable=True)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    # Hash chain, see core/audit_chain.py (NULL on entries written before it)
+    sequence = Column(BigInteger, nullable=True)
+    prev_hash = Column(String(64), nullable=True)
+    entry_hash = Column(String(64), nullable=True)
+
+
+class AuditRollup(Base):
+    """Audit entry counts per organization, action and hour/day bucket (see core/audit_rollups.py)."""
+    __tablename__ = "audit_rollups"
+    __table_args__ = (
+        Index("ix_audit_rollups_granularity_bucket", "granularity", "bucket"),
+    )
+    
+    # NO_ORGANIZATION (the nil UUID) for entries without one, so it can be part of the key
+    organization_id = Column(UUID(as_uuid=True), primary_key=True)
+    granularity = Column(String(10), primary_key=True)  # hour, day
+    bucket = Column(DateTime, primary_key=True)  # Start of the hour/day, UTC
+    action = Column(String(100), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class AuditCheckpoint(Base):
+    """Signed snapshot of the audit hash chain head."""
+    __tablename__ = "audit_checkpoints"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sequence = Column(BigInteger, nullable=False, unique=True)
+    entry_hash = Column(String(64), nullable=False)
+    algorithm = Column(String(50), nullable=False)  # hmac-sha256 or the signing key's algorithm
+    key_id = Column(UUID(as_uuid=True), ForeignKey("pkcs11_keys.id"), nullable=True)
+    signature = Column(Text, nullable=False)  # Hex
     created_at = Column(DateTime, default=datetime.utcnow)
+    verified_at = Column(DateTime, nullable=True)  # Set by the verifier once the chain up to here checks out
+
+
+class DetachedAuditPartition(Base):
+    """
+    An audit_logs partition detached past retention and not archived yet
+    (see core/audit_partitions.py). Only tables listed here are archived
+    and dropped.
+    """
+    __tablename__ = "audit_detached_partitions"
+    
+    name = Column(String(63), primary_key=True)
+    last_sequence = Column(BigInteger, nullable=True)  # Sealed by a checkpoint before detaching
+    detached_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,30 @@
+"""
+KT Secure - Key Pool Models
+Key material generated ahead of time and not yet assigned to a key
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+
+from ..database import Base
+
+
+class PooledKey(Base):
+    """
+    A pre-generated key pair waiting to be claimed by a key generation
+    request. Claiming deletes the row in the same transaction that creates
+    the Pkcs11Key, so a pooled key is handed out at most once.
+    """
+    __tablename__ = "pooled_keys"
+    __table_args__ = (
+        Index("ix_pooled_keys_spec", "family", "key_size", "curve", "hsm_slot"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    family = Column(String(10), nullable=False)  # RSA, EC
+    key_size = Column(Integer, nullable=True)  # For RSA
+    curve = Column(String(50), nullable=True)  # For EC
+    hsm_slot = Column(Integer, nullable=False)
+    fingerprint = Column(String(128), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
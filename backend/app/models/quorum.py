@@ -2,7 +2,7 @@
 KT Secure - Quorum Approval Models
 Multi-signature (M-of-N) approval workflow for sensitive operations
 """
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -29,12 +29,28 @@ class ApprovalStatus(str, enum.Enum):
     EXPIRED = "expired"
 
 
+class OperationStatus(str, enum.Enum):
+    """Status of an approved operation in the outbox."""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class ApprovalRequest(Base):
     """
     Represents a request for M-of-N approval.
     An operation requiring quorum approval creates this record.
     """
     __tablename__ = "approval_requests"
+    # Keyset pagination on (created_at, id), see utils/pagination.py
+    __table_args__ = (
+        Index("ix_approval_requests_created_id", "created_at", "id"),
+        Index("ix_approval_requests_status_created_id", "status", "created_at", "id"),
+        Index("ix_approval_requests_org_created_id", "organization_id", "created_at", "id"),
+        # Expiry sweep: pending requests past expires_at, see core/quorum.py
+        Index("ix_approval_requests_status_expires", "status", "expires_at"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -60,7 +76,7 @@ class ApprovalRequest(Base):
     # Metadata
     organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=True)
     created_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     
@@ -74,6 +90,10 @@ class ApprovalVote(Base):
     Represents a vote (approve/reject) on an approval request.
     """
     __tablename__ = "approval_votes"
+    # One vote per user per request, enforced by the database (see core/quorum.py)
+    __table_args__ = (
+        UniqueConstraint("request_id", "user_id", name="uq_approval_votes_request_user"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -90,6 +110,29 @@ class ApprovalVote(Base):
     user = relationship("User")
 
 
+class ApprovalOperation(Base):
+    """
+    Outbox entry for an approved request's operation.
+    Written in the same transaction as the vote that approves the request
+    and keyed by request, so each approval is executed at most once.
+    """
+    __tablename__ = "approval_operations"
+    __table_args__ = (
+        Index("ix_approval_operations_status_available", "status", "available_at"),
+    )
+    
+    request_id = Column(UUID(as_uuid=True), ForeignKey("approval_requests.id"), primary_key=True)
+    status = Column(String(20), nullable=False, default=OperationStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Next attempt
+    error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)  # JSON returned by the handler
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+
 class QuorumPolicy(Base):
     """
     Defines quorum policies for different operation types per organization.
@@ -0,0 +1,89 @@
+"""
+KT Secure - Signing Job Models
+Persistent queue of asynchronous signing operations and stored signatures
+"""
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+import enum
+
+from ..database import Base
+
+
+class SigningJobStatus(str, enum.Enum):
+    """Lifecycle of a signing job."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class SigningJob(Base):
+    """
+    A signing request processed by the background workers.
+    Only the digest is stored; payloads are hashed when the job is submitted.
+    """
+    __tablename__ = "signing_jobs"
+    __table_args__ = (
+        Index("ix_signing_jobs_status_created", "status", "created_at"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    config_id = Column(UUID(as_uuid=True), ForeignKey("signing_configs.id"), nullable=False)
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=True)
+    
+    # Input
+    digest = Column(String(128), nullable=False)  # Hex encoded
+    hash_algorithm = Column(String(50), nullable=False)
+    
+    # Status tracking
+    status = Column(String(20), default=SigningJobStatus.QUEUED.value, nullable=False)
+    attempts = Column(Integer, default=0)
+    
+    # Result
+    signature = Column(Text, nullable=True)
+    algorithm = Column(String(100), nullable=True)
+    key_fingerprint = Column(String(128), nullable=True)
+    error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+
+class SignatureRecord(Base):
+    """
+    A signature stored by content address so that re-signing a
+    byte-identical artifact with the same config and key reuses it.
+    """
+    __tablename__ = "signature_records"
+    __table_args__ = (
+        UniqueConstraint(
+            "digest", "hash_algorithm", "config_id", "key_fingerprint",
+            name="uq_signature_records_address"
+        ),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    digest = Column(String(128), nullable=False)  # Hex encoded
+    hash_algorithm = Column(String(50), nullable=False)
+    config_id = Column(UUID(as_uuid=True), ForeignKey("signing_configs.id"), nullable=False)
+    key_id = Column(UUID(as_uuid=True), ForeignKey("pkcs11_keys.id"), nullable=False)
+    key_fingerprint = Column(String(128), nullable=False)
+    signature = Column(Text, nullable=False)  # Hex encoded
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SigningIdempotencyKey(Base):
+    """Client-supplied idempotency key, bound to the digest it was first used with."""
+    __tablename__ = "signing_idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("config_id", "idempotency_key", name="uq_signing_idempotency_keys_config_key"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    config_id = Column(UUID(as_uuid=True), ForeignKey("signing_configs.id"), nullable=False)
+    idempotency_key = Column(String(255), nullable=False)
+    digest = Column(String(128), nullable=False)  # Hex encoded
+    created_at = Column(DateTime, default=datetime.utcnow)
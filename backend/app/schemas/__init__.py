@@ -4,7 +4,7 @@ KT Secure - Pydantic Schemas
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 # Organization Schemas
@@ -102,6 +102,13 @@ class SigningConfigCreate(SigningConfigBase):
     organization_id: UUID
 
 
+class SigningConfigUpdate(BaseModel):
+    name: Optional[str] = None
+    hash_algorithm: Optional[str] = None
+    timestamp_authority: Optional[str] = None
+    is_enabled: Optional[bool] = None
+
+
 class SigningConfigResponse(SigningConfigBase):
     id: UUID
     organization_id: UUID
@@ -136,15 +143,35 @@ class AuditLogResponse(BaseModel):
     id: UUID
     action: str
     user_id: Optional[UUID] = None
+    organization_id: Optional[UUID] = None
     entity_type: Optional[str] = None
     entity_id: Optional[UUID] = None
     changes: Optional[dict] = None
     created_at: datetime
+    sequence: Optional[int] = None
+    prev_hash: Optional[str] = None
+    entry_hash: Optional[str] = None
     
     class Config:
         from_attributes = True
 
 
+class AuditStatsPoint(BaseModel):
+    bucket: datetime
+    action: str
+    count: int
+
+
+class AuditStatsResponse(BaseModel):
+    granularity: str
+    since: datetime
+    until: datetime
+    total: int
+    by_action: Dict[str, int]
+    series: List[AuditStatsPoint]
+    heatmap: Optional[List[List[int]]] = None  # [weekday (Mon = 0)][hour], hour granularity only
+
+
 # Auth Schemas
 class Token(BaseModel):
     access_token: str
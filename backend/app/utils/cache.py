@@ -0,0 +1,78 @@
+"""
+KT Secure - In-Process Caches
+Small LRU cache with per-entry TTL used by the hot API paths
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import time
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after `ttl` seconds.
+    Not thread-safe; meant to be used from the asyncio event loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry and mark it recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store an entry, evicting the least recently used one when full."""
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry and return its value."""
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def pop_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove every entry matching predicate(key, value); return the count."""
+        stale = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Size and hit/miss counters."""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,88 @@
+"""
+KT Secure - Merkle Trees
+Binary hash trees over file digests with inclusion proofs
+"""
+from typing import List, Sequence, Tuple
+import hashlib
+import hmac
+
+# Domain separation between leaves and inner nodes (as in RFC 6962), so an
+# inner node can never be passed off as a leaf
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+# A proof step is (position of the sibling, sibling hash)
+ProofStep = Tuple[str, bytes]
+
+
+def leaf_hash(digest: bytes, hash_name: str) -> bytes:
+    return hashlib.new(hash_name, LEAF_PREFIX + digest).digest()
+
+
+def node_hash(left: bytes, right: bytes, hash_name: str) -> bytes:
+    return hashlib.new(hash_name, NODE_PREFIX + left + right).digest()
+
+
+class MerkleTree:
+    """
+    Merkle tree over a list of digests.
+
+    Leaves are paired left to right; an unpaired last node is carried up
+    to the next level unchanged rather than duplicated, so two different
+    leaf lists never produce the same root.
+    """
+
+    def __init__(self, digests: Sequence[bytes], hash_name: str):
+        if not digests:
+            raise ValueError("A Merkle tree needs at least one leaf")
+        self.hash_name = hash_name
+        self.levels: List[List[bytes]] = [[leaf_hash(digest, hash_name) for digest in digests]]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = [
+                node_hash(level[i], level[i + 1], hash_name)
+                for i in range(0, len(level) - 1, 2)
+            ]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self.levels.append(parents)
+
+    @property
+    def root(self) -> bytes:
+        return self.levels[-1][0]
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def proof(self, index: int) -> List[ProofStep]:
+        """Sibling hashes from leaf `index` up to the root."""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        steps: List[ProofStep] = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                steps.append(("left" if sibling < index else "right", level[sibling]))
+            index //= 2
+        return steps
+
+
+def root_from_proof(digest: bytes, proof: Sequence[ProofStep], hash_name: str) -> bytes:
+    """Recompute the root a leaf digest and its proof lead to."""
+    node = leaf_hash(digest, hash_name)
+    for position, sibling in proof:
+        if position == "left":
+            node = node_hash(sibling, node, hash_name)
+        elif position == "right":
+            node = node_hash(node, sibling, hash_name)
+        else:
+            raise ValueError(f"Invalid proof position: {position}")
+    return node
+
+
+def verify_proof(digest: bytes, proof: Sequence[ProofStep], root: bytes, hash_name: str) -> bool:
+    """Check that a leaf digest is included under a root."""
+    try:
+        return hmac.compare_digest(root_from_proof(digest, proof, hash_name), root)
+    except ValueError:
+        return False
@@ -0,0 +1,73 @@
+"""
+KT Secure - Keyset Pagination
+Opaque (created_at, id) cursors for list endpoints
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """Opaque cursor pointing just past a row."""
+    raw = json.dumps([created_at.isoformat(), str(id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query: Select,
+    model,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    descending: bool = False,
+    skip: int = 0
+) -> List:
+    """
+    Run `query` one page at a time, ordered by (created_at, id).
+
+    The page starts right after the cursor row with a row-value comparison
+    that a (created_at, id) index can seek to, so every page costs the same
+    however deep it is. When more rows follow, the next cursor is returned
+    in the X-Next-Cursor header. The lists used to take an offset as `skip`;
+    a nonzero one is refused rather than ignored, so an old client paging
+    with it gets an error instead of the first page over and over.
+    """
+    if skip:
+        raise HTTPException(status_code=400, detail="skip is no longer supported, page with cursor")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    key = tuple_(model.created_at, model.id)
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        position = tuple_(literal(created_at, model.created_at.type), literal(id, model.id.type))
+        query = query.where(key < position if descending else key > position)
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at, model.id)
+
+    result = await db.execute(query.limit(limit + 1))
+    rows = list(result.scalars().all())
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows
@@ -0,0 +1,40 @@
+"""
+KT Secure - Audit Chain Verification Script
+
+Verifies the audit log hash chain since the last verified checkpoint and
+checkpoints the verified head. Meant to run nightly; exits non-zero if
+the chain is broken.
+
+Usage:
+    cd backend
+    python -m scripts.verify_audit_chain [--full]
+"""
+import asyncio
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.audit_chain import audit_chain
+from app.core.signer import shutdown_signer
+
+
+async def verify_audit_chain(full: bool) -> bool:
+    """Verify the chain and report the result."""
+    try:
+        result = await audit_chain.verify(full=full)
+    finally:
+        await shutdown_signer()
+
+    if result.ok:
+        print(f"✓ Audit chain intact: entries {result.from_sequence + 1}-{result.to_sequence} "
+              f"({result.entries} rehashed, {result.checkpoints} checkpoints)")
+    else:
+        print(f"✗ Audit chain broken at entry {result.broken_at}: {result.error}")
+    return result.ok
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(verify_audit_chain(full="--full" in sys.argv[1:]))
+    sys.exit(0 if ok else 1)
@@ -4,8 +4,10 @@ KT Secure - Test Configuration and Fixtures
 import asyncio
 import pytest
 import pytest_asyncio
-from typing import AsyncGenerator, Generator
+from typing import AsyncGenerator, Generator, List
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy import MetaData, String, Uuid, event
+from sqlalchemy.dialects.postgresql import INET, UUID
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
 from app.main import app
@@ -25,6 +27,85 @@ def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
     loop.close()
 
 
+def sqlite_metadata(models) -> MetaData:
+    """
+    Copy of the models' tables that SQLite can hold: INET columns as text,
+    since INET does not compile there, and UUID columns as CHAR, since the
+    PostgreSQL type gets NUMERIC affinity and the nil UUID would be stored
+    as the number 0.
+    """
+    metadata = MetaData()
+    for model in models:
+        model.__table__.to_metadata(metadata)
+    for table in metadata.tables.values():
+        for column in table.columns:
+            if isinstance(column.type, INET):
+                column.type = String(45)
+            elif isinstance(column.type, UUID):
+                column.type = Uuid()
+    return metadata
+
+
+@pytest_asyncio.fixture
+async def sqlite_engine():
+    """
+    Factory for engines with only the tables of the given models (see
+    sqlite_metadata). In memory by default; pass a file URL where several
+    connections must see the same data. Engines are disposed after the test.
+    """
+    engines = []
+    
+    async def create(models, url: str = TEST_DATABASE_URL, **kwargs):
+        engine = create_async_engine(url, **kwargs)
+        engines.append(engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(sqlite_metadata(models).create_all)
+        return engine
+    
+    yield create
+    
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def engine(request, sqlite_engine):
+    """In-memory engine with the tables of the models in the test module's TABLES."""
+    return await sqlite_engine(request.module.TABLES)
+
+
+@pytest.fixture
+def sessions(engine):
+    """Session factory on `engine`."""
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+def count_queries():
+    """
+    count_queries(engine, prefix="") returns a list that collects every
+    statement the engine runs from then on (only those starting with
+    `prefix`, if given) until the end of the test.
+    """
+    listeners = []
+    
+    def start(engine, prefix: str = "") -> List[str]:
+        statements = []
+        
+        def listener(conn, cursor, statement, *args):
+            if statement.startswith(prefix):
+                statements.append(statement)
+        
+        event.listen(engine.sync_engine, "before_cursor_execute", listener)
+        listeners.append((engine, listener))
+        return statements
+    
+    yield start
+    
+    for engine, listener in listeners:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+
+
 @pytest_asyncio.fixture(scope="function")
 async def async_engine():
     """Create async engine for each test."""
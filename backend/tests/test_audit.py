@@ -0,0 +1,565 @@
+"""
+KT Secure - Audit Pipeline Tests
+"""
+from datetime import datetime, timedelta
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, func, inspect, select, text, update
+
+from app.api import audit as audit_api
+from app.core.audit import AuditService
+from app.core.audit_chain import GENESIS_HASH, AuditChain, entry_hash
+from app.core.audit_partitions import AuditPartitionManager, add_months, partition_name
+from app.core.audit_rollups import NO_ORGANIZATION, apply_rollups
+from app.models import (
+    AuditCheckpoint, AuditLog, AuditRollup, DetachedAuditPartition, Organization, Pkcs11Key, User
+)
+
+
+TABLES = (Organization, User, Pkcs11Key, AuditLog, AuditCheckpoint, AuditRollup, DetachedAuditPartition)
+
+
+async def count_rows(sessions) -> int:
+    async with sessions() as db:
+        return await db.scalar(select(func.count()).select_from(AuditLog))
+
+
+class TestAuditService:
+    """Tests for the write-behind audit pipeline."""
+
+    @pytest.mark.asyncio
+    async def test_record_does_not_touch_database(self, engine, sessions, count_queries):
+        """Test that recording only queues the entry."""
+        service = AuditService(session_factory=sessions)
+        inserts = count_queries(engine, "INSERT INTO audit_logs")
+        await service.record("key_generated", entity_type="key", entity_id=uuid.uuid4())
+        assert inserts == []
+        assert service.stats()["queued"] == 1
+
+    @pytest.mark.asyncio
+    async def test_entries_are_written_in_batches(self, engine, sessions, count_queries):
+        """Test that the flusher bulk-inserts queued entries."""
+        service = AuditService(batch_size=100, flush_interval=0.05, session_factory=sessions)
+        inserts = count_queries(engine, "INSERT INTO audit_logs")
+        for i in range(250):
+            await service.record("sign", entity_type="signing_config", changes={"n": i})
+        await service.start()
+        await service.stop()
+
+        assert await count_rows(sessions) == 250
+        assert len(inserts) == 3
+        assert service.stats()["written"] == 250
+
+    @pytest.mark.asyncio
+    async def test_entries_keep_their_fields(self, sessions):
+        """Test that a written entry has what was recorded."""
+        service = AuditService(session_factory=sessions)
+        user_id, org_id, key_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        await service.record(
+            "key_revoked", entity_type="key", entity_id=key_id, user_id=user_id,
+            organization_id=org_id, changes={"reason": "compromised"}, ip_address="10.0.0.1"
+        )
+        await service.flush()
+
+        async with sessions() as db:
+            entry = await db.scalar(select(AuditLog))
+        assert entry.action == "key_revoked"
+        assert entry.entity_id == key_id
+        assert entry.user_id == user_id
+        assert entry.organization_id == org_id
+        assert entry.changes == {"reason": "compromised"}
+        assert entry.ip_address == "10.0.0.1"
+        assert entry.created_at is not None
+
+    @pytest.mark.asyncio
+    async def test_full_queue_applies_backpressure(self, sessions):
+        """Test that record waits for room instead of dropping entries."""
+        service = AuditService(max_queued=5, batch_size=5, session_factory=sessions)
+        for i in range(5):
+            await service.record("sign")
+
+        blocked = asyncio.create_task(service.record("sign"))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+
+        await service.start()
+        await asyncio.wait_for(blocked, 1)
+        await service.stop()
+        assert await count_rows(sessions) == 6
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried(self, sessions):
+        """Test that a transient write failure is retried."""
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("database unavailable")
+            return sessions()
+
+        service = AuditService(session_factory=flaky)
+        await service.record("sign")
+        await service.flush()
+
+        assert len(attempts) == 2
+        assert service.stats()["written"] == 1
+        assert await count_rows(sessions) == 1
+
+    @pytest.mark.asyncio
+    async def test_failing_batch_is_never_dropped(self, sessions):
+        """Test that a batch is retried through an outage and written once it ends."""
+        attempts = []
+
+        def down_for_a_while():
+            attempts.append(1)
+            if len(attempts) <= 4:
+                raise ConnectionError("database unavailable")
+            return sessions()
+
+        service = AuditService(max_backoff=0.01, session_factory=down_for_a_while)
+        await service.record("sign")
+        await service.record("sign")
+        await service.flush()
+
+        assert service.stats()["failures"] == 4
+        assert service.stats()["written"] == 2
+        assert service.stats()["queued"] == 0
+        assert await count_rows(sessions) == 2
+
+
+async def write_entries(sessions, count: int, start: int = 0):
+    service = AuditService(session_factory=sessions)
+    for i in range(start, start + count):
+        await service.record("sign", entity_type="signing_config", entity_id=uuid.uuid4(), changes={"n": i})
+    await service.flush()
+
+
+class TestAuditChain:
+    """Tests for the audit hash chain and its verification."""
+
+    @pytest.mark.asyncio
+    async def test_entries_are_chained(self, sessions):
+        """Test that each written entry links to the one before it."""
+        await write_entries(sessions, 3)
+        await write_entries(sessions, 2, start=3)
+
+        async with sessions() as db:
+            result = await db.execute(select(AuditLog).order_by(AuditLog.sequence))
+            entries = result.scalars().all()
+        assert [e.sequence for e in entries] == [1, 2, 3, 4, 5]
+        assert entries[0].prev_hash == GENESIS_HASH
+        for previous, entry in zip(entries, entries[1:]):
+            assert entry.prev_hash == previous.entry_hash
+        for entry in entries:
+            assert entry.entry_hash == entry_hash(entry.prev_hash, entry.__dict__)
+
+    @pytest.mark.asyncio
+    async def test_intact_chain_verifies(self, sessions):
+        """Test that verification passes and checkpoints the verified head."""
+        await write_entries(sessions, 25)
+        chain = AuditChain(chunk_size=10, secret="test", session_factory=sessions)
+
+        result = await chain.verify()
+        assert result.ok
+        assert (result.from_sequence, result.to_sequence, result.entries) == (0, 25, 25)
+
+        async with sessions() as db:
+            checkpoint = await db.scalar(select(AuditCheckpoint))
+        assert checkpoint.sequence == 25
+        assert checkpoint.verified_at is not None
+
+    @pytest.mark.asyncio
+    async def test_unsigned_head_is_reported(self, sessions):
+        """Test that a verified chain whose head cannot be signed is not sealed."""
+        await write_entries(sessions, 10)
+        chain = AuditChain(key_id=uuid.uuid4(), session_factory=sessions)
+
+        result = await chain.verify()
+        assert result.ok and not result.checkpointed
+        assert result.error.startswith("verified, checkpoint not written")
+        assert not await chain.seal(6)
+        async with sessions() as db:
+            assert await db.scalar(select(func.count()).select_from(AuditCheckpoint)) == 0
+
+    @pytest.mark.asyncio
+    async def test_verification_is_incremental(self, sessions):
+        """Test that a later run only rehashes entries after the last verified checkpoint."""
+        await write_entries(sessions, 20)
+        chain = AuditChain(chunk_size=10, secret="test", session_factory=sessions)
+        await chain.verify()
+
+        await write_entries(sessions, 5, start=20)
+        await chain.checkpoint()
+        await write_entries(sessions, 5, start=25)
+
+        result = await chain.verify()
+        assert result.ok
+        assert (result.from_sequence, result.to_sequence, result.entries) == (20, 30, 10)
+        assert result.checkpoints == 2
+
+        result = await chain.verify(full=True)
+        assert result.ok
+        assert result.entries == 30
+
+    @pytest.mark.asyncio
+    async def test_edited_entry_is_detected(self, sessions):
+        """Test that changing an entry breaks verification at that entry."""
+        await write_entries(sessions, 10)
+        async with sessions() as db:
+            await db.execute(update(AuditLog).where(AuditLog.sequence == 4).values(action="nothing_happened"))
+            await db.commit()
+
+        result = await AuditChain(chunk_size=3, secret="test", session_factory=sessions).verify()
+        assert not result.ok
+        assert result.broken_at == 4
+        assert result.error == "entry was changed"
+
+    @pytest.mark.asyncio
+    async def test_deleted_entry_is_detected(self, sessions):
+        """Test that deleting an entry leaves a detectable gap."""
+        await write_entries(sessions, 10)
+        async with sessions() as db:
+            await db.execute(delete(AuditLog).where(AuditLog.sequence == 6))
+            await db.commit()
+
+        result = await AuditChain(secret="test", session_factory=sessions).verify()
+        assert not result.ok
+        assert result.broken_at == 6
+
+    @pytest.mark.asyncio
+    async def test_rewritten_chain_fails_signed_checkpoint(self, sessions):
+        """Test that rehashing the chain after an edit is caught by a checkpoint."""
+        await write_entries(sessions, 10)
+        chain = AuditChain(secret="test", session_factory=sessions)
+        await chain.checkpoint()
+
+        async with sessions() as db:
+            result = await db.execute(select(AuditLog).order_by(AuditLog.sequence))
+            prev_hash = GENESIS_HASH
+            for entry in result.scalars().all():
+                if entry.sequence == 2:
+                    entry.action = "nothing_happened"
+                entry.prev_hash = prev_hash
+                entry.entry_hash = prev_hash = entry_hash(prev_hash, entry.__dict__)
+            await db.commit()
+
+        result = await chain.verify()
+        assert not result.ok
+        assert result.broken_at == 10
+        assert result.error == "chain does not match a signed checkpoint"
+
+    @pytest.mark.asyncio
+    async def test_truncated_chain_is_detected(self, sessions):
+        """Test that deleting the newest entries behind a checkpoint is caught."""
+        await write_entries(sessions, 10)
+        chain = AuditChain(secret="test", session_factory=sessions)
+        await chain.checkpoint()
+        async with sessions() as db:
+            await db.execute(delete(AuditLog).where(AuditLog.sequence > 7))
+            await db.commit()
+
+        result = await chain.verify()
+        assert not result.ok
+        assert result.broken_at == 8
+
+    @pytest.mark.asyncio
+    async def test_forged_checkpoint_is_detected(self, sessions):
+        """Test that a checkpoint signed with another secret is rejected."""
+        await write_entries(sessions, 5)
+        await AuditChain(secret="attacker", session_factory=sessions).checkpoint()
+
+        result = await AuditChain(secret="test", session_factory=sessions).verify()
+        assert not result.ok
+        assert result.error == "checkpoint signature is invalid"
+
+
+class TestAuditPartitions:
+    """Tests for audit partition naming, sealing and archival."""
+
+    def test_month_arithmetic(self):
+        """Test that months roll over year boundaries."""
+        assert add_months(datetime(2026, 11, 17), 2) == datetime(2027, 1, 1)
+        assert add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+        assert partition_name(datetime(2026, 3, 1)) == "audit_logs_y2026m03"
+
+    @pytest.mark.asyncio
+    async def test_maintenance_is_noop_outside_postgresql(self, sessions):
+        """Test that a maintenance pass touches nothing on SQLite."""
+        manager = AuditPartitionManager(retention_months=1, session_factory=sessions)
+        await manager.run()
+        assert manager.stats()["created"] == 0
+
+    @pytest.mark.asyncio
+    async def test_partitions_skip_ranges_already_covered(self):
+        """Test that no partition is created inside the legacy partition's range."""
+        catalog = [("audit_logs_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')")]
+        statements = []
+
+        class CatalogSession:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, statement):
+                sql = str(statement)
+                statements.append(sql)
+                result = type("Result", (), {})()
+                result.all = lambda: catalog if "pg_inherits" in sql else []
+                return result
+
+            async def commit(self):
+                pass
+
+        manager = AuditPartitionManager(months_ahead=3, session_factory=CatalogSession)
+        created = await manager.ensure_partitions(now=datetime(2026, 10, 16))
+
+        assert created == ["audit_logs_y2026m11", "audit_logs_y2026m12", "audit_logs_y2027m01"]
+        creates = [sql for sql in statements if sql.startswith("CREATE TABLE")]
+        assert "FROM ('2026-11-01') TO ('2026-12-01')" in creates[0]
+        assert all("2026-10-01" not in sql for sql in creates)
+
+    @pytest.mark.asyncio
+    async def test_seal_requires_verification(self, sessions):
+        """Test that entries can only be sealed once verified."""
+        await write_entries(sessions, 10)
+        chain = AuditChain(secret="test", session_factory=sessions)
+        assert not await chain.seal(6)
+
+        await chain.verify()
+        assert await chain.seal(6)
+        async with sessions() as db:
+            checkpoint = await db.scalar(select(AuditCheckpoint).where(AuditCheckpoint.sequence == 6))
+        assert checkpoint.verified_at is not None
+
+    @pytest.mark.asyncio
+    async def test_archive_streams_partition_to_file(self, engine, sessions, tmp_path):
+        """Test that a detached partition is archived in chunks and dropped with its record."""
+        await write_entries(sessions, 25)
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE audit_logs_y2024m01 AS SELECT * FROM audit_logs"))
+        async with sessions() as db:
+            db.add(DetachedAuditPartition(name="audit_logs_y2024m01", last_sequence=25))
+            await db.commit()
+
+        manager = AuditPartitionManager(archive_dir=str(tmp_path / "archive"), chunk_size=10, session_factory=sessions)
+        path, rows = await manager.archive("audit_logs_y2024m01")
+
+        assert rows == 25
+        with gzip.open(path, "rt") as archive:
+            entries = [json.loads(line) for line in archive]
+        assert sorted(e["sequence"] for e in entries) == list(range(1, 26))
+        assert all(e["entry_hash"] for e in entries)
+        assert not os.path.exists(path + ".partial")
+        async with engine.connect() as conn:
+            tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        assert "audit_logs_y2024m01" not in tables
+        async with sessions() as db:
+            assert await db.get(DetachedAuditPartition, "audit_logs_y2024m01") is None
+
+    @pytest.mark.asyncio
+    async def test_full_verification_after_archival(self, sessions):
+        """Test that the chain still verifies from the seal once old entries are gone."""
+        await write_entries(sessions, 10)
+        chain = AuditChain(secret="test", session_factory=sessions)
+        await chain.verify()
+        await write_entries(sessions, 5, start=10)
+
+        assert await chain.seal(6)
+        async with sessions() as db:
+            await db.execute(delete(AuditLog).where(AuditLog.sequence <= 6))
+            await db.commit()
+
+        result = await chain.verify(full=True)
+        assert result.ok
+        assert (result.from_sequence, result.to_sequence, result.entries) == (6, 15, 9)
+
+    @pytest.mark.asyncio
+    async def test_full_verification_without_seal_fails(self, sessions):
+        """Test that dropping the oldest entries without a seal is reported."""
+        await write_entries(sessions, 10)
+        async with sessions() as db:
+            await db.execute(delete(AuditLog).where(AuditLog.sequence <= 3))
+            await db.commit()
+
+        result = await AuditChain(secret="test", session_factory=sessions).verify(full=True)
+        assert not result.ok
+
+
+async def export_body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+class TestAuditExport:
+    """Tests for the streaming audit export."""
+
+    @pytest.fixture(autouse=True)
+    def export_sessions(self, sessions, monkeypatch):
+        opened = []
+
+        def factory():
+            opened.append(1)
+            return sessions()
+
+        monkeypatch.setattr(audit_api, "AsyncSessionLocal", factory)
+        monkeypatch.setattr(audit_api.settings, "AUDIT_EXPORT_CHUNK_SIZE", 10)
+        return opened
+
+    @pytest.mark.asyncio
+    async def test_ndjson_export_streams_every_row_in_chunks(self, sessions, export_sessions):
+        """Test that NDJSON export returns every row, oldest first, one short session per chunk."""
+        await write_entries(sessions, 25)
+        response = await audit_api.export_audit_logs(format="ndjson")
+        assert response.media_type == "application/x-ndjson"
+
+        entries = [json.loads(line) for line in (await export_body(response)).decode().splitlines()]
+        assert sorted(e["changes"]["n"] for e in entries) == list(range(25))
+        keys = [(e["created_at"], e["id"]) for e in entries]
+        assert keys == sorted(keys)
+        assert entries[0]["action"] == "sign"
+        assert len(export_sessions) == 3
+
+    @pytest.mark.asyncio
+    async def test_filters_apply(self, sessions):
+        """Test that action, entity and date filters narrow the export."""
+        await write_entries(sessions, 5)
+        service = AuditService(session_factory=sessions)
+        user_id, key_id = uuid.uuid4(), uuid.uuid4()
+        await service.record("key_revoked", entity_type="key", entity_id=key_id, user_id=user_id)
+        await service.flush()
+
+        response = await audit_api.export_audit_logs(action="key_revoked", user_id=user_id, entity_id=key_id)
+        entries = (await export_body(response)).decode().splitlines()
+        assert len(entries) == 1
+        assert json.loads(entries[0])["entity_id"] == str(key_id)
+
+        response = await audit_api.export_audit_logs(until=datetime(2000, 1, 1))
+        assert await export_body(response) == b""
+
+    @pytest.mark.asyncio
+    async def test_gzipped_csv_export(self, sessions):
+        """Test that CSV export has a header row and decompresses when gzipped."""
+        await write_entries(sessions, 12)
+        response = await audit_api.export_audit_logs(format="csv", compress=True)
+        assert response.media_type == "application/gzip"
+        assert ".csv.gz" in response.headers["content-disposition"]
+
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(await export_body(response)).decode())))
+        assert len(rows) == 12
+        assert json.loads(rows[0]["changes"]) == {"n": 0}
+        assert rows[0]["user_id"] == ""
+
+    @pytest.mark.asyncio
+    async def test_unknown_format_is_rejected(self):
+        """Test that only NDJSON and CSV are offered."""
+        with pytest.raises(HTTPException) as exc:
+            await audit_api.export_audit_logs(format="xml")
+        assert exc.value.status_code == 400
+
+
+class TestAuditRollups:
+    """Tests for the activity rollups and the stats endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_pipeline_counts_entries_per_bucket(self, sessions):
+        """Test that written entries are counted per organization, action, hour and day."""
+        org_id = uuid.uuid4()
+        service = AuditService(session_factory=sessions)
+        for _ in range(3):
+            await service.record("sign", organization_id=org_id)
+        await service.record("key_generated", organization_id=org_id)
+        await service.record("login")
+        await service.flush()
+        await service.record("sign", organization_id=org_id)
+        await service.flush()
+
+        async with sessions() as db:
+            result = await db.execute(select(AuditRollup).where(AuditRollup.granularity == "day"))
+            counts = {(r.organization_id, r.action): r.count for r in result.scalars().all()}
+        assert counts == {
+            (org_id, "sign"): 4,
+            (org_id, "key_generated"): 1,
+            (NO_ORGANIZATION, "login"): 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_hour_and_day_buckets(self, sessions):
+        """Test that entries land in the hour and day they were recorded in."""
+        org_id = uuid.uuid4()
+        entries = [
+            {"organization_id": org_id, "action": "sign", "created_at": datetime(2026, 10, 12, 9, 15)},
+            {"organization_id": org_id, "action": "sign", "created_at": datetime(2026, 10, 12, 9, 45)},
+            {"organization_id": org_id, "action": "sign", "created_at": datetime(2026, 10, 12, 17, 5)},
+        ]
+        async with sessions() as db:
+            await apply_rollups(db, entries)
+            await db.commit()
+            result = await db.execute(select(AuditRollup).order_by(AuditRollup.granularity, AuditRollup.bucket))
+            rows = [(r.granularity, r.bucket, r.count) for r in result.scalars().all()]
+        assert rows == [
+            ("day", datetime(2026, 10, 12), 3),
+            ("hour", datetime(2026, 10, 12, 9), 2),
+            ("hour", datetime(2026, 10, 12, 17), 1),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_stats_series_and_heatmap(self, sessions):
+        """Test that stats sum organizations and fold hours into a weekday heatmap."""
+        monday = datetime(2026, 10, 12, 9, 30)
+        entries = [
+            {"organization_id": uuid.uuid4(), "action": "sign", "created_at": monday},
+            {"organization_id": uuid.uuid4(), "action": "sign", "created_at": monday},
+            {"organization_id": None, "action": "login", "created_at": monday + timedelta(days=1, hours=2)},
+        ]
+        async with sessions() as db:
+            await apply_rollups(db, entries)
+            await db.commit()
+
+            stats = await audit_api.audit_stats(
+                granularity="hour", since=datetime(2026, 10, 10), until=datetime(2026, 10, 17), db=db
+            )
+            assert stats.total == 3
+            assert stats.by_action == {"sign": 2, "login": 1}
+            assert [(p.bucket, p.action, p.count) for p in stats.series] == [
+                (datetime(2026, 10, 12, 9), "sign", 2),
+                (datetime(2026, 10, 13, 11), "login", 1),
+            ]
+            assert stats.heatmap[0][9] == 2
+            assert stats.heatmap[1][11] == 1
+
+            daily = await audit_api.audit_stats(
+                action="sign", since=datetime(2026, 10, 1), until=datetime(2026, 11, 1), db=db
+            )
+            assert [(p.bucket, p.count) for p in daily.series] == [(datetime(2026, 10, 12), 2)]
+            assert daily.heatmap is None
+
+    @pytest.mark.asyncio
+    async def test_stats_filter_by_organization(self, sessions):
+        """Test that stats can be limited to one organization."""
+        org_id = uuid.uuid4()
+        now = datetime.utcnow()
+        async with sessions() as db:
+            await apply_rollups(db, [
+                {"organization_id": org_id, "action": "sign", "created_at": now},
+                {"organization_id": uuid.uuid4(), "action": "sign", "created_at": now},
+            ])
+            await db.commit()
+            stats = await audit_api.audit_stats(organization_id=org_id, until=now + timedelta(days=1), db=db)
+        assert stats.total == 1
+
+    @pytest.mark.asyncio
+    async def test_stats_rejects_bad_granularity(self, sessions):
+        """Test that only hour and day buckets exist."""
+        async with sessions() as db:
+            with pytest.raises(HTTPException) as exc:
+                await audit_api.audit_stats(granularity="minute", db=db)
+        assert exc.value.status_code == 400
@@ -0,0 +1,105 @@
+"""
+KT Secure - Cache Tests
+"""
+import time
+import uuid
+import pytest
+
+from app.core.signing_cache import SigningTargetCache
+from app.core.verification_cache import VerificationCache
+from app.models import Pkcs11Key, SigningConfig
+from app.utils.cache import TTLCache
+
+
+class TestTTLCache:
+    """Tests for the LRU/TTL cache."""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = TTLCache(max_entries=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_entries_expire(self):
+        """Test that entries are not served after their TTL."""
+        cache = TTLCache(max_entries=10, ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_pop_where(self):
+        """Test removing entries by predicate."""
+        cache = TTLCache()
+        for i in range(5):
+            cache.set(i, i % 2)
+
+        assert cache.pop_where(lambda _, value: value == 1) == 2
+        assert len(cache) == 3
+
+
+class TestSigningTargetCache:
+    """Tests for resolved signing config/key caching."""
+
+    def make_target(self):
+        key = Pkcs11Key(id=uuid.uuid4(), name="k", algorithm="RSA", hsm_slot=0, status="active")
+        config = SigningConfig(id=uuid.uuid4(), name="c", key_id=key.id, hash_algorithm="SHA-256")
+        return config, key
+
+    @pytest.mark.asyncio
+    async def test_invalidate_config(self):
+        """Test that updating a config drops its cached target."""
+        cache = SigningTargetCache(max_entries=10, ttl=60)
+        config, key = self.make_target()
+        cache.put(config, key)
+        assert cache.get(config.id)[1].id == key.id
+
+        await cache.invalidate_config(config.id)
+        assert cache.get(config.id) is None
+
+    @pytest.mark.asyncio
+    async def test_invalidate_key_drops_all_configs_using_it(self):
+        """Test that revoking a key drops every config signing with it."""
+        cache = SigningTargetCache(max_entries=10, ttl=60)
+        config, key = self.make_target()
+        other = SigningConfig(id=uuid.uuid4(), name="c2", key_id=key.id, hash_algorithm="SHA-256")
+        cache.put(config, key)
+        cache.put(other, key)
+
+        await cache.invalidate_key(key.id)
+        assert cache.get(config.id) is None
+        assert cache.get(other.id) is None
+
+    def test_cached_objects_are_detached_copies(self):
+        """Test that the cache stores copies, not the caller's instances."""
+        cache = SigningTargetCache(max_entries=10, ttl=60)
+        config, key = self.make_target()
+        cache.put(config, key)
+        config.is_enabled = False
+
+        assert cache.get(config.id)[0] is not config
+
+
+class TestVerificationCache:
+    """Tests for cached positive verification results."""
+
+    @pytest.mark.asyncio
+    async def test_revocation_drops_key_results(self):
+        """Test that revoking a key forgets its verified signatures only."""
+        cache = VerificationCache(max_entries=10, ttl=60)
+        revoked, other = uuid.uuid4(), uuid.uuid4()
+        cache.add(revoked, b"d", b"s", "SHA-256")
+        cache.add(other, b"d", b"s", "sha-256")
+
+        await SigningTargetCache(max_entries=1, ttl=60).invalidate_key(revoked)
+
+        assert not cache.is_verified(revoked, b"d", b"s", "SHA-256")
+        assert cache.is_verified(other, b"d", b"s", "SHA-256")
+        assert not cache.is_verified(other, b"d", b"x", "SHA-256")
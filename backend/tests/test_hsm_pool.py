@@ -0,0 +1,137 @@
+"""
+KT Secure - HSM Session Pool Tests
+"""
+import asyncio
+import threading
+import pytest
+
+from app.core.hsm import FakeHsmBackend, HsmError, HsmSessionError, HsmSessionPool
+
+
+@pytest.fixture
+def backend() -> FakeHsmBackend:
+    backend = FakeHsmBackend()
+    backend.add_key(0, "aa" * 20)
+    backend.add_key(1, "bb" * 20)
+    return backend
+
+
+class TestSessionReuse:
+    """Sessions and key handles are created once and reused."""
+
+    @pytest.mark.asyncio
+    async def test_sequential_signs_reuse_one_session(self, backend):
+        """Test that repeated signs on a slot open and log in only once."""
+        pool = HsmSessionPool(backend, "1234")
+        for _ in range(20):
+            await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+
+        assert backend.sessions_opened == 1
+        assert backend.logins == 1
+        assert backend.key_lookups == 1
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_signatures_are_stable(self, backend):
+        """Test that the fake backend signs deterministically per key."""
+        pool = HsmSessionPool(backend, "1234")
+        first = await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+        second = await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+        other = await pool.sign(1, "bb" * 20, b"digest", "RSA-PKCS")
+
+        assert first == second
+        assert first != other
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_session_is_discarded(self, backend):
+        """Test that a session that stopped working is closed, not returned to the pool."""
+        pool = HsmSessionPool(backend, "1234")
+        async with pool.session(0) as session:
+            backend.close_session(session)
+        with pytest.raises(HsmSessionError):
+            await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+
+        assert pool.stats()[0]["in_use"] == 0
+        assert pool.stats()[0]["idle"] == 0
+        await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+        assert backend.sessions_opened == 2
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_key_error_keeps_session(self, backend):
+        """Test that an unknown key fails the call but leaves the session in the pool."""
+        pool = HsmSessionPool(backend, "1234")
+        with pytest.raises(HsmError):
+            await pool.sign(0, "cc" * 20, b"digest", "RSA-PKCS")
+
+        assert pool.stats()[0]["idle"] == 1
+        await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+        assert backend.sessions_opened == 1
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_call_releases_session(self):
+        """Test that cancelling a caller mid-sign frees its slot and closes the session."""
+        backend = FakeHsmBackend(latency=0.2)
+        backend.add_key(0, "aa" * 20)
+        pool = HsmSessionPool(backend, "1234", max_sessions_per_slot=1)
+        task = asyncio.create_task(pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert pool.stats()[0]["in_use"] == 0
+        assert pool.stats()[0]["idle"] == 0
+        await asyncio.wait_for(pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS"), timeout=2)
+        assert backend.sessions_opened == 2
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_key_drops_handle(self, backend):
+        """Test that invalidating a key forces a new handle lookup."""
+        pool = HsmSessionPool(backend, "1234")
+        await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+        pool.invalidate_key("aa" * 20)
+        await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+
+        assert backend.key_lookups == 2
+        await pool.close()
+
+
+class TestConcurrencyLimits:
+    """Per-slot concurrency caps and off-loop execution."""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_capped_per_slot(self):
+        """Test that no more than max_sessions_per_slot operations overlap."""
+        backend = FakeHsmBackend(latency=0.01)
+        backend.add_key(0, "aa" * 20)
+        pool = HsmSessionPool(backend, "1234", max_sessions_per_slot=3, max_workers=16)
+
+        await asyncio.gather(*(
+            pool.sign(0, "aa" * 20, b"%d" % i, "RSA-PKCS") for i in range(30)
+        ))
+
+        assert backend.max_in_flight <= 3
+        assert backend.sessions_opened <= 3
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_backend_runs_off_the_event_loop(self):
+        """Test that blocking backend calls run on HSM worker threads."""
+        threads = []
+
+        class RecordingBackend(FakeHsmBackend):
+            def sign(self, session, handle, mechanism, data):
+                threads.append(threading.current_thread().name)
+                return super().sign(session, handle, mechanism, data)
+
+        backend = RecordingBackend()
+        backend.add_key(0, "aa" * 20)
+        pool = HsmSessionPool(backend, "1234")
+        await pool.sign(0, "aa" * 20, b"digest", "RSA-PKCS")
+
+        assert threads and all(name.startswith("hsm") for name in threads)
+        await pool.close()
@@ -0,0 +1,75 @@
+"""
+KT Secure - Background Job Worker Tests
+"""
+import asyncio
+import pytest
+
+from app.core.jobs import JobWorkerPool
+
+
+class TestJobWorkerPool:
+    """Tests for the persisted-job worker pool."""
+
+    @pytest.mark.asyncio
+    async def test_submitted_jobs_are_processed_once(self):
+        """Test that duplicate submissions of a pending job run it once."""
+        seen = []
+
+        async def process(job_id):
+            await asyncio.sleep(0.01)
+            seen.append(job_id)
+
+        async def recover():
+            return []
+
+        pool = JobWorkerPool("test", process, recover, workers=2, poll_interval=60)
+        await pool.start()
+        for job_id in [1, 2, 2, 3, 1]:
+            pool.submit(job_id)
+        await pool.stop()
+
+        assert sorted(seen) == [1, 2, 3]
+        assert pool.stats()["processed"] == 3
+
+    @pytest.mark.asyncio
+    async def test_recover_picks_up_unsubmitted_jobs(self):
+        """Test that the poller processes jobs only known to the database."""
+        backlog = {"a", "b"}
+        done = asyncio.Event()
+
+        async def process(job_id):
+            backlog.discard(job_id)
+            if not backlog:
+                done.set()
+
+        async def recover():
+            return sorted(backlog)
+
+        pool = JobWorkerPool("test", process, recover, workers=1, poll_interval=0.01)
+        await pool.start()
+        await asyncio.wait_for(done.wait(), timeout=1)
+        await pool.stop()
+
+        assert not backlog
+
+    @pytest.mark.asyncio
+    async def test_failing_job_does_not_stop_workers(self):
+        """Test that an exception in one job is counted and the worker continues."""
+        seen = []
+
+        async def process(job_id):
+            if job_id == "bad":
+                raise RuntimeError("boom")
+            seen.append(job_id)
+
+        async def recover():
+            return []
+
+        pool = JobWorkerPool("test", process, recover, workers=1, poll_interval=60)
+        await pool.start()
+        pool.submit("bad")
+        pool.submit("good")
+        await pool.stop()
+
+        assert seen == ["good"]
+        assert pool.stats()["errors"] == 1
@@ -0,0 +1,123 @@
+"""
+KT Secure - Key Pool Tests
+"""
+import asyncio
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.key_pool import KeyPoolManager, key_spec, parse_targets
+from app.models.key_pool import PooledKey
+
+RSA_4096 = key_spec("RSA-4096", None, None, 0)
+P256 = key_spec("ECDSA", None, "P-256", 1)
+
+
+@pytest_asyncio.fixture
+async def sessions(tmp_path, sqlite_engine):
+    """Session factory on a file database with only the pooled_keys table."""
+    engine = await sqlite_engine([PooledKey], f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def pooled_count(sessions) -> int:
+    async with sessions() as db:
+        return (await db.execute(select(func.count()).select_from(PooledKey))).scalar()
+
+
+class TestKeyPool:
+    """Tests for the pre-generated key pool (mock signer)."""
+
+    def test_parse_targets(self):
+        """Test that combined and split algorithm names map to one spec."""
+        targets = parse_targets([
+            {"algorithm": "RSA", "key_size": 4096, "size": 3},
+            {"algorithm": "ECDSA-P256", "hsm_slot": 1},
+        ])
+
+        assert targets == {RSA_4096: 3, P256: 1}
+
+    @pytest.mark.asyncio
+    async def test_refill_reaches_targets(self, sessions):
+        """Test that a refill tops every spec up to its target."""
+        pool = KeyPoolManager({RSA_4096: 3, P256: 2}, session_factory=sessions)
+        await pool.refill()
+        await pool.refill()
+
+        assert await pooled_count(sessions) == 5
+        assert pool.stats()["generated"] == 5
+
+    @pytest.mark.asyncio
+    async def test_claim_hands_out_each_key_once(self, sessions):
+        """Test that claims return distinct keys and then run dry."""
+        pool = KeyPoolManager({RSA_4096: 2}, session_factory=sessions)
+        await pool.refill()
+
+        fingerprints = []
+        for _ in range(3):
+            async with sessions() as db:
+                fingerprints.append(await pool.claim(db, RSA_4096))
+                await db.commit()
+
+        assert fingerprints[0] and fingerprints[1] and fingerprints[0] != fingerprints[1]
+        assert fingerprints[2] is None
+        assert await pooled_count(sessions) == 0
+
+    @pytest.mark.asyncio
+    async def test_claim_is_undone_by_rollback(self, sessions):
+        """Test that a failed key creation leaves the pooled key in place."""
+        pool = KeyPoolManager({RSA_4096: 1}, session_factory=sessions)
+        await pool.refill()
+
+        async with sessions() as db:
+            assert await pool.claim(db, RSA_4096)
+            await db.rollback()
+
+        assert await pooled_count(sessions) == 1
+
+    @pytest.mark.asyncio
+    async def test_unconfigured_spec_is_not_pooled(self, sessions):
+        """Test that keys without a pool target are generated on demand."""
+        pool = KeyPoolManager({RSA_4096: 1}, session_factory=sessions)
+        await pool.refill()
+
+        async with sessions() as db:
+            assert await pool.claim(db, P256) is None
+
+    @pytest.mark.asyncio
+    async def test_claim_wakes_refiller(self, sessions):
+        """Test that the background refiller replaces a claimed key promptly."""
+        pool = KeyPoolManager({RSA_4096: 1}, refill_interval=60, session_factory=sessions)
+        await pool.start()
+        try:
+            for _ in range(50):
+                if await pooled_count(sessions) == 1:
+                    break
+                await asyncio.sleep(0.01)
+            async with sessions() as db:
+                await pool.claim(db, RSA_4096)
+                await db.commit()
+            for _ in range(50):
+                if await pooled_count(sessions) == 1:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert await pooled_count(sessions) == 1
+            assert pool.stats()["claimed"] == 1
+        finally:
+            await pool.stop()
+
+    @pytest.mark.asyncio
+    async def test_disabled_without_shared_key_storage(self, sessions, monkeypatch):
+        """Test that a signer with per-node key storage is never pooled."""
+        pool = KeyPoolManager({RSA_4096: 1}, session_factory=sessions)
+        await pool.refill()
+        monkeypatch.setattr("app.core.signer.MockSigner.shared_key_storage", False)
+
+        async with sessions() as db:
+            assert await pool.claim(db, RSA_4096) is None
+        await pool.start()
+
+        assert pool.stats()["running"] is False
+        assert await pooled_count(sessions) == 1
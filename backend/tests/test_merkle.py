@@ -0,0 +1,63 @@
+"""
+KT Secure - Merkle Tree Tests
+"""
+import hashlib
+import pytest
+
+from app.utils.merkle import MerkleTree, leaf_hash, node_hash, verify_proof
+
+
+def digests(count):
+    return [hashlib.sha256(b"ecu-%d" % i).digest() for i in range(count)]
+
+
+class TestMerkleTree:
+    """Tests for manifest Merkle trees and inclusion proofs."""
+
+    @pytest.mark.parametrize("count", [1, 2, 3, 5, 8, 13, 100])
+    def test_every_leaf_proves_inclusion(self, count):
+        """Test that each leaf's proof leads to the root."""
+        leaves = digests(count)
+        tree = MerkleTree(leaves, "sha256")
+
+        for index, digest in enumerate(leaves):
+            assert verify_proof(digest, tree.proof(index), tree.root, "sha256")
+
+    def test_proof_length_is_logarithmic(self):
+        """Test that proofs have at most ceil(log2 N) steps."""
+        tree = MerkleTree(digests(1000), "sha256")
+
+        assert max(len(tree.proof(i)) for i in range(1000)) == 10
+
+    def test_single_leaf_root(self):
+        """Test that a one-file manifest signs the leaf hash."""
+        leaf = digests(1)[0]
+
+        assert MerkleTree([leaf], "sha256").root == leaf_hash(leaf, "sha256")
+
+    def test_wrong_digest_or_root_fails(self):
+        """Test that a proof does not verify another file or another root."""
+        leaves = digests(6)
+        tree = MerkleTree(leaves, "sha256")
+
+        assert not verify_proof(leaves[1], tree.proof(0), tree.root, "sha256")
+        assert not verify_proof(leaves[0], tree.proof(0), bytes(32), "sha256")
+
+    def test_inner_node_is_not_a_leaf(self):
+        """Test that an inner node cannot be proven as a leaf."""
+        leaves = digests(4)
+        tree = MerkleTree(leaves, "sha256")
+        inner = node_hash(leaf_hash(leaves[0], "sha256"), leaf_hash(leaves[1], "sha256"), "sha256")
+
+        assert not verify_proof(inner, tree.proof(2)[1:], tree.root, "sha256")
+
+    def test_carried_node_is_not_duplicated(self):
+        """Test that [a, b, c] and [a, b, c, c] have different roots."""
+        a, b, c = digests(3)
+
+        assert MerkleTree([a, b, c], "sha256").root != MerkleTree([a, b, c, c], "sha256").root
+
+    def test_empty_tree(self):
+        """Test that a tree needs at least one leaf."""
+        with pytest.raises(ValueError):
+            MerkleTree([], "sha256")
@@ -0,0 +1,59 @@
+"""
+KT Secure - Organization Summary Tests
+"""
+import pytest
+import pytest_asyncio
+
+from app.api import organizations
+from app.models import Organization, OrganizationCounter, Pkcs11Key, User
+
+TABLES = (Organization, OrganizationCounter, User, Pkcs11Key)
+
+
+@pytest_asyncio.fixture
+async def session(sessions):
+    """Session with three orgs holding 0/1/2 users and 2/1/0 keys."""
+    async with sessions() as db:
+        orgs = [Organization(name=f"Org {i}", slug=f"org-{i}", status="active") for i in range(3)]
+        db.add_all(orgs)
+        await db.flush()
+        for i, org in enumerate(orgs):
+            for j in range(i):
+                db.add(User(email=f"u{i}{j}@example.com", name="u", role="user", organization_id=org.id))
+            for j in range(2 - i):
+                db.add(Pkcs11Key(name=f"k{i}{j}", algorithm="RSA", hsm_slot=0, organization_id=org.id))
+        await db.commit()
+        yield db, orgs
+
+
+class TestOrganizationSummaries:
+    """Tests for the shared org summary loader."""
+
+    @pytest.mark.asyncio
+    async def test_counts_in_one_query(self, engine, session, count_queries):
+        """Test that a whole page of orgs gets its counts from a single query."""
+        db, orgs = session
+        statements = count_queries(engine)
+        summaries = await organizations._load_org_summaries(db, orgs)
+
+        assert len(statements) == 1
+        assert [(s.users_count, s.keys_count) for s in summaries] == [(0, 2), (1, 1), (2, 0)]
+        assert [s.id for s in summaries] == [org.id for org in orgs]
+
+    @pytest.mark.asyncio
+    async def test_empty_page(self, session):
+        """Test that an empty page does not hit the database."""
+        db, _ = session
+        assert await organizations._load_org_summaries(db, []) == []
+
+    @pytest.mark.asyncio
+    async def test_counter_table_source(self, session, monkeypatch):
+        """Test reading counts from organization_counters; missing rows count as zero."""
+        db, orgs = session
+        db.add(OrganizationCounter(organization_id=orgs[0].id, users_count=7, keys_count=3))
+        await db.commit()
+        monkeypatch.setattr(organizations.settings, "ORG_COUNTS_SOURCE", "counters")
+
+        summaries = await organizations._load_org_summaries(db, orgs)
+
+        assert [(s.users_count, s.keys_count) for s in summaries] == [(7, 3), (0, 0), (0, 0)]
@@ -0,0 +1,82 @@
+"""
+KT Secure - Keyset Pagination Tests
+"""
+from datetime import datetime, timedelta
+import uuid
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+
+from app.models import Organization, Pkcs11Key
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, fetch_page
+
+TABLES = (Organization, Pkcs11Key)
+
+
+@pytest_asyncio.fixture
+async def session(sessions):
+    """Session with 25 keys, ten of them sharing one created_at."""
+    async with sessions() as db:
+        start = datetime(2026, 1, 1)
+        for i in range(25):
+            created_at = start if i < 10 else start + timedelta(minutes=i)
+            db.add(Pkcs11Key(name=f"k{i}", algorithm="RSA", hsm_slot=0, created_at=created_at))
+        await db.commit()
+        yield db
+
+
+async def walk(db, limit, descending=False):
+    """Follow X-Next-Cursor until the last page."""
+    pages, cursor = [], None
+    while True:
+        response = Response()
+        rows = await fetch_page(db, select(Pkcs11Key), Pkcs11Key, response, cursor, limit, descending)
+        pages.append(rows)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+
+
+class TestKeysetPagination:
+    """Tests for (created_at, id) cursor pagination."""
+
+    def test_cursor_round_trip(self):
+        """Test that a cursor decodes to the row it was made from."""
+        created_at, id = datetime(2026, 1, 1, 12, 30, 5, 123), uuid.uuid4()
+
+        assert decode_cursor(encode_cursor(created_at, id)) == (created_at, id)
+
+    def test_invalid_cursor(self):
+        """Test that a tampered cursor is a 400, not a 500."""
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor("not-a-cursor")
+        assert exc.value.status_code == 400
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("descending", [False, True])
+    async def test_pages_cover_every_row_once(self, session, descending):
+        """Test that rows sharing a timestamp are neither skipped nor repeated."""
+        pages = await walk(session, limit=4, descending=descending)
+        rows = [row for page in pages for row in page]
+        keys = [(row.created_at, row.id) for row in rows]
+
+        assert [len(page) for page in pages] == [4] * 6 + [1]
+        assert len(set(keys)) == 25
+        assert keys == sorted(keys, reverse=descending)
+
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_cursor(self, session):
+        """Test that an exactly full last page does not point past the end."""
+        pages = await walk(session, limit=5)
+
+        assert [len(page) for page in pages] == [5] * 5
+
+    @pytest.mark.asyncio
+    async def test_offset_is_refused(self, session):
+        """Test that an old client's nonzero skip is a 400, not a repeated first page."""
+        with pytest.raises(HTTPException) as exc:
+            await fetch_page(session, select(Pkcs11Key), Pkcs11Key, Response(), skip=100)
+        assert exc.value.status_code == 400
+
+        assert len(await fetch_page(session, select(Pkcs11Key), Pkcs11Key, Response(), skip=0)) == 25
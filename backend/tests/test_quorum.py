@@ -0,0 +1,540 @@
+"""
+KT Secure - Quorum Approval Tests
+"""
+from datetime import datetime, timedelta
+import asyncio
+import gc
+import json
+import uuid
+import pytest
+import pytest_asyncio
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.api import quorum
+from app.core.approval_executor import HANDLERS, ApprovalExecutor
+from app.core.policy_cache import QuorumPolicyResolver
+from app.core.quorum import ApprovalExpirySweeper, VoteError, cast_vote
+from app.models import Organization, Pkcs11Key, SigningConfig, User
+from app.models.quorum import ApprovalOperation, ApprovalRequest, ApprovalVote, QuorumPolicy
+
+TABLES = (
+    Organization, User, Pkcs11Key, SigningConfig,
+    ApprovalRequest, ApprovalVote, ApprovalOperation, QuorumPolicy
+)
+
+
+@pytest_asyncio.fixture
+async def session(sessions):
+    """Session with four admins and 20 requests, each with two votes."""
+    async with sessions() as db:
+        users = [User(email=f"admin{i}@example.com", name=f"Admin {i}", role="admin") for i in range(4)]
+        db.add_all(users)
+        await db.flush()
+        for i in range(20):
+            request = ApprovalRequest(
+                approval_type="key_generation", title=f"Request {i}", entity_type="key",
+                entity_id=uuid.uuid4(), required_approvals=3, total_approvers=4,
+                created_by_id=users[0].id
+            )
+            db.add(request)
+            await db.flush()
+            for user in users[1:3]:
+                db.add(ApprovalVote(request_id=request.id, user_id=user.id, vote="approve"))
+        await db.commit()
+        yield db, users
+
+
+class TestApprovalRequestLoading:
+    """Tests for eager loading of creators and votes."""
+
+    @pytest.mark.asyncio
+    async def test_list_uses_constant_queries(self, engine, session, count_queries):
+        """Test that a page of requests loads creators and votes in a fixed number of queries."""
+        db, users = session
+        statements = count_queries(engine)
+
+        results = await quorum.list_approval_requests(
+            Response(), status=None, organization_id=None, cursor=None, limit=50, db=db, current_user=users[0]
+        )
+
+        assert len(results) == 20
+        assert len(statements) == 3
+        assert all(r.created_by_name == "Admin 0" for r in results)
+        assert all(sorted(v.user_name for v in r.votes) == ["Admin 1", "Admin 2"] for r in results)
+
+    @pytest.mark.asyncio
+    async def test_vote_response_includes_new_vote(self, session):
+        """Test that the response to a vote reflects that vote."""
+        db, users = session
+        pages = await quorum.list_approval_requests(
+            Response(), status=None, organization_id=None, cursor=None, limit=1, db=db, current_user=users[0]
+        )
+
+        result = await quorum.vote_on_request(
+            pages[0].id, quorum.ApprovalVoteCreate(vote="approve"), db=db, current_user=users[3]
+        )
+
+        assert result.current_approvals == 1
+        assert len(result.votes) == 3
+        assert "Admin 3" in [v.user_name for v in result.votes]
+
+
+async def new_request(db, creator, required_approvals=2, total_approvers=3, expires_at=None,
+                      approval_type="key_generation", entity_id=None, entity_data=None):
+    request = ApprovalRequest(
+        approval_type=approval_type, title="Request", entity_type="key",
+        entity_id=entity_id or uuid.uuid4(), entity_data=json.dumps(entity_data) if entity_data else None,
+        required_approvals=required_approvals, total_approvers=total_approvers,
+        created_by_id=creator.id, expires_at=expires_at
+    )
+    db.add(request)
+    await db.commit()
+    return request
+
+
+class TestCastVote:
+    """Tests for atomic vote counting."""
+
+    @pytest.mark.asyncio
+    async def test_quorum_reached(self, session):
+        """Test that the M-th approval approves the request."""
+        db, users = session
+        request = await new_request(db, users[0])
+
+        first = await cast_vote(db, request.id, users[1].id, "approve")
+        second = await cast_vote(db, request.id, users[2].id, "approve")
+
+        assert first == ("pending", 1, 0)
+        assert second == ("approved", 2, 0)
+        with pytest.raises(VoteError, match="already approved"):
+            await cast_vote(db, request.id, users[3].id, "approve")
+
+    @pytest.mark.asyncio
+    async def test_rejection_threshold(self, session):
+        """Test that a request is rejected once M approvals are out of reach."""
+        db, users = session
+        request = await new_request(db, users[0])
+
+        await cast_vote(db, request.id, users[1].id, "reject")
+        result = await cast_vote(db, request.id, users[2].id, "reject")
+
+        assert result == ("rejected", 0, 2)
+
+    @pytest.mark.asyncio
+    async def test_duplicate_vote(self, session):
+        """Test that a second vote from the same user is refused and not counted."""
+        db, users = session
+        request = await new_request(db, users[0], required_approvals=3, total_approvers=4)
+        await cast_vote(db, request.id, users[1].id, "approve")
+
+        request_id, user_ids = request.id, [user.id for user in users]
+
+        with pytest.raises(VoteError, match="already voted"):
+            await cast_vote(db, request_id, user_ids[1], "approve")
+
+        result = await cast_vote(db, request_id, user_ids[2], "approve")
+        assert result.current_approvals == 2
+
+    @pytest.mark.asyncio
+    async def test_refused_votes(self, session):
+        """Test invalid, own, unknown and expired requests (expiry is left to the sweeper)."""
+        db, users = session
+        request = await new_request(db, users[0])
+        expired = await new_request(db, users[0], expires_at=datetime.utcnow() - timedelta(minutes=1))
+
+        with pytest.raises(VoteError, match="approve' or 'reject"):
+            await cast_vote(db, request.id, users[1].id, "abstain")
+        with pytest.raises(VoteError, match="own request"):
+            await cast_vote(db, request.id, users[0].id, "approve")
+        with pytest.raises(VoteError) as exc:
+            await cast_vote(db, uuid.uuid4(), users[1].id, "approve")
+        assert exc.value.status_code == 404
+        with pytest.raises(VoteError, match="expired"):
+            await cast_vote(db, expired.id, users[1].id, "approve")
+
+        await db.refresh(expired)
+        assert expired.status == "pending"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_votes(self, tmp_path, sqlite_engine):
+        """Test hundreds of simultaneous votes, each admin voting twice at once."""
+        engine = await sqlite_engine(
+            TABLES, f"sqlite+aiosqlite:///{tmp_path / 'quorum.db'}",
+            connect_args={"timeout": 60},
+            poolclass=AsyncAdaptedQueuePool, pool_size=20, pool_timeout=60
+        )
+        maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        async with maker() as db:
+            voters = [User(email=f"voter{i}@example.com", name=f"Voter {i}", role="admin") for i in range(250)]
+            creator = User(email="creator@example.com", name="Creator", role="admin")
+            db.add_all(voters + [creator])
+            await db.commit()
+            request = await new_request(db, creator, required_approvals=200, total_approvers=300)
+
+        async def vote(user):
+            async with maker() as db:
+                try:
+                    return await cast_vote(db, request.id, user.id, "approve")
+                except VoteError:
+                    return None
+
+        # Duplicate votes leave IntegrityError cycles holding sqlite3 statements.
+        # A GC pass finalizing one waits for its connection, which may be busy
+        # waiting for the write lock, and stalls the loop the lock holder needs
+        gc.disable()
+        try:
+            results = await asyncio.gather(*(vote(user) for user in voters for _ in range(2)))
+        finally:
+            gc.enable()
+        accepted = [r for r in results if r is not None]
+
+        async with maker() as db:
+            stored = await db.get(ApprovalRequest, request.id)
+            votes = (await db.execute(
+                select(ApprovalVote.user_id).where(ApprovalVote.request_id == request.id)
+            )).scalars().all()
+
+        # Exactly M votes get in: no duplicates, none lost, none after approval
+        assert len(accepted) == 200
+        assert sorted(r.current_approvals for r in accepted) == list(range(1, 201))
+        assert len(votes) == len(set(votes)) == 200
+        assert stored.current_approvals == 200
+        assert stored.status == "approved"
+
+
+class TestApprovalExpirySweeper:
+    """Tests for the background expiry sweep."""
+
+    @pytest.mark.asyncio
+    async def test_sweep_expires_overdue_requests(self, sessions, session):
+        """Test that only overdue pending requests expire, in batches, with notifications."""
+        db, users = session
+        past = datetime.utcnow() - timedelta(hours=1)
+        overdue = [await new_request(db, users[0], expires_at=past) for _ in range(7)]
+        future = await new_request(db, users[0], expires_at=datetime.utcnow() + timedelta(hours=1))
+        approved = await new_request(db, users[0], expires_at=past)
+        approved.status = "approved"
+        await db.commit()
+
+        batches = []
+
+        async def on_expired(expired):
+            batches.append(expired)
+
+        sweeper = ApprovalExpirySweeper(
+            on_expired=on_expired,
+            batch_size=3,
+            session_factory=sessions
+        )
+
+        assert await sweeper.sweep() == 7
+        assert [len(batch) for batch in batches] == [3, 3, 1]
+        assert {r.id for batch in batches for r in batch} == {r.id for r in overdue}
+        assert await sweeper.sweep() == 0
+        assert sweeper.stats()["expired"] == 7
+
+        statuses = {
+            r.id: r.status for r in
+            (await db.execute(select(ApprovalRequest).execution_options(populate_existing=True))).scalars()
+        }
+        assert all(statuses[r.id] == "expired" for r in overdue)
+        assert statuses[future.id] == "pending"
+        assert statuses[approved.id] == "approved"
+
+
+async def approve(db, users, required_approvals=2, **kwargs):
+    """Create an M-of-3 request and approve it."""
+    request = await new_request(db, users[0], required_approvals=required_approvals, total_approvers=3, **kwargs)
+    request_id = request.id
+    for user in users[1:required_approvals + 1]:
+        await cast_vote(db, request_id, user.id, "approve")
+    return request_id
+
+
+class TestApprovalExecutor:
+    """Tests for the approved-operation outbox."""
+
+    @pytest_asyncio.fixture
+    async def executor(self, sessions):
+        finished = []
+
+        async def on_finished(request, operation):
+            finished.append(operation.status)
+
+        executor = ApprovalExecutor(
+            dict(HANDLERS),
+            on_finished=on_finished,
+            max_attempts=3,
+            retry_delay=0,
+            session_factory=sessions
+        )
+        executor.finished = finished
+        return executor
+
+    async def operation(self, db, request_id):
+        return (await db.execute(
+            select(ApprovalOperation)
+            .where(ApprovalOperation.request_id == request_id)
+            .execution_options(populate_existing=True)
+        )).scalar_one()
+
+    @pytest.mark.asyncio
+    async def test_approval_enqueues_operation(self, session):
+        """Test that only the deciding vote writes the outbox row."""
+        db, users = session
+        request = await new_request(db, users[0], required_approvals=2, total_approvers=3)
+        request_id = request.id
+
+        await cast_vote(db, request_id, users[1].id, "approve")
+        assert await db.get(ApprovalOperation, request_id) is None
+
+        await cast_vote(db, request_id, users[2].id, "approve")
+        assert (await self.operation(db, request_id)).status == "pending"
+
+    @pytest.mark.asyncio
+    async def test_key_generation_runs_once(self, session, executor):
+        """Test that an approved key generation creates exactly one key."""
+        db, users = session
+        org = Organization(name="Org", slug="org")
+        db.add(org)
+        await db.commit()
+        request_id = await approve(db, users, entity_data={
+            "name": "release", "algorithm": "RSA", "key_size": 2048, "hsm_slot": 0,
+            "organization_id": str(org.id)
+        })
+
+        assert await executor.recover() == [request_id]
+        await executor.process(request_id)
+        await executor.process(request_id)
+
+        operation = await self.operation(db, request_id)
+        keys = (await db.execute(select(Pkcs11Key))).scalars().all()
+        assert operation.status == "completed"
+        assert operation.attempts == 1
+        assert [str(key.id) for key in keys] == [json.loads(operation.result)["key_id"]]
+        assert keys[0].fingerprint
+        assert executor.finished == ["completed"]
+
+    @pytest.mark.asyncio
+    async def test_unpooled_algorithm_goes_to_signer(self, session, executor):
+        """Test that an algorithm the key pool does not model is still generated."""
+        db, users = session
+        org = Organization(name="Org", slug="org")
+        db.add(org)
+        await db.commit()
+        request_id = await approve(db, users, entity_data={
+            "name": "wrap", "algorithm": "AES", "key_size": 256, "hsm_slot": 0,
+            "organization_id": str(org.id)
+        })
+
+        await executor.process(request_id)
+
+        operation = await self.operation(db, request_id)
+        assert operation.status == "completed"
+        assert json.loads(operation.result)["fingerprint"]
+
+    @pytest.mark.asyncio
+    async def test_quorum_below_minimum_needs_policy(self, session, executor):
+        """Test that a self-chosen quorum of one is refused unless a policy applies."""
+        db, users = session
+        org = Organization(name="Org", slug="org", status="pending")
+        db.add(org)
+        await db.commit()
+        org_id = org.id
+        request_id = await approve(
+            db, users, required_approvals=1, approval_type="organization_approval", entity_id=org_id
+        )
+
+        await executor.process(request_id)
+
+        operation = await self.operation(db, request_id)
+        assert operation.status == "failed"
+        assert "minimum of 2" in operation.error
+        stored = (await db.execute(
+            select(Organization).where(Organization.id == org_id).execution_options(populate_existing=True)
+        )).scalar_one()
+        assert stored.status == "pending"
+
+    @pytest.mark.asyncio
+    async def test_role_change_is_validated(self, session, executor):
+        """Test that unknown roles and roles above the requester's are refused."""
+        db, users = session
+        target = User(email="member@example.com", name="Member", role="user")
+        db.add(target)
+        await db.commit()
+        target_id = target.id
+
+        results = {}
+        for role in ("root", "super_admin", "crypto_admin"):
+            request_id = await approve(
+                db, users, approval_type="user_role_change", entity_id=target_id, entity_data={"role": role}
+            )
+            await executor.process(request_id)
+            results[role] = await self.operation(db, request_id)
+
+        assert results["root"].status == "failed"
+        assert "must be one of" in results["root"].error
+        assert results["super_admin"].status == "failed"
+        assert "cannot change" in results["super_admin"].error
+        assert results["crypto_admin"].status == "completed"
+        stored = (await db.execute(
+            select(User).where(User.id == target_id).execution_options(populate_existing=True)
+        )).scalar_one()
+        assert stored.role == "crypto_admin"
+
+    @pytest.mark.asyncio
+    async def test_permanent_failure(self, session, executor):
+        """Test that an OperationError fails the operation without retrying."""
+        db, users = session
+        request_id = await approve(db, users, approval_type="key_revocation")
+
+        await executor.process(request_id)
+
+        operation = await self.operation(db, request_id)
+        assert operation.status == "failed"
+        assert operation.attempts == 1
+        assert "not found" in operation.error
+        assert executor.finished == ["failed"]
+
+    @pytest.mark.asyncio
+    async def test_transient_failure_retried(self, session, executor):
+        """Test that other errors are retried up to max_attempts, without partial writes."""
+        db, users = session
+        calls = []
+
+        async def flaky(db, request, data, after_commit):
+            calls.append(1)
+            db.add(Organization(name=f"Partial {len(calls)}", slug=f"partial-{len(calls)}"))
+            await db.flush()
+            raise RuntimeError("HSM unavailable")
+
+        executor.handlers["key_generation"] = flaky
+        request_id = await approve(db, users)
+
+        for _ in range(5):
+            await executor.process(request_id)
+
+        operation = await self.operation(db, request_id)
+        assert len(calls) == 3
+        assert operation.status == "failed"
+        assert operation.error == "HSM unavailable"
+        assert (await db.execute(select(Organization))).scalars().all() == []
+        assert executor.stats()["retried"] == 2
+
+    @pytest.mark.asyncio
+    async def test_requeued_run_is_discarded(self, session, executor):
+        """Test that a run whose claim was taken over does not commit its effects."""
+        db, users = session
+        org = Organization(name="Org", slug="org", status="pending")
+        db.add(org)
+        await db.commit()
+        org_id = org.id
+        request_id = await approve(db, users, approval_type="organization_approval", entity_id=org_id)
+
+        async def taken_over(db, request, data, after_commit):
+            result = await HANDLERS["organization_approval"](db, request, data, after_commit)
+            # Another worker requeues and reclaims the operation meanwhile
+            async with executor._session_factory() as other:
+                operation = await other.get(ApprovalOperation, request.id)
+                operation.attempts += 1
+                await other.commit()
+            return result
+
+        executor.handlers["organization_approval"] = taken_over
+        await executor.process(request_id)
+
+        stored = (await db.execute(
+            select(Organization).where(Organization.id == org_id).execution_options(populate_existing=True)
+        )).scalar_one()
+        assert stored.status == "pending"
+        assert executor.finished == []
+
+
+class TestQuorumPolicyResolver:
+    """Tests for hierarchical, cached policy resolution."""
+
+    @pytest_asyncio.fixture
+    async def orgs(self, session):
+        """root -> child -> grandchild, plus an unrelated org."""
+        db, _ = session
+        root = Organization(name="Root", slug="root")
+        db.add(root)
+        await db.flush()
+        child = Organization(name="Child", slug="child", parent_id=root.id)
+        db.add(child)
+        await db.flush()
+        grandchild = Organization(name="Grandchild", slug="grandchild", parent_id=child.id)
+        other = Organization(name="Other", slug="other")
+        db.add_all([grandchild, other])
+        db.add_all([
+            QuorumPolicy(approval_type="key_generation", required_approvals=2, total_approvers=3),
+            QuorumPolicy(organization_id=root.id, approval_type="key_generation",
+                         required_approvals=3, total_approvers=5),
+            QuorumPolicy(organization_id=grandchild.id, approval_type="key_generation",
+                         required_approvals=4, total_approvers=4, is_enabled=False),
+            QuorumPolicy(organization_id=other.id, approval_type="key_generation",
+                         required_approvals=5, total_approvers=7),
+        ])
+        await db.commit()
+        return root, child, grandchild, other
+
+    @pytest.mark.asyncio
+    async def test_nearest_enabled_policy_wins(self, session, orgs):
+        """Test org -> parent -> global resolution, skipping disabled policies."""
+        db, _ = session
+        root, child, grandchild, other = orgs
+        resolver = QuorumPolicyResolver(max_entries=100, ttl=60)
+
+        assert (await resolver.resolve(db, grandchild.id, "key_generation")).required_approvals == 3
+        assert (await resolver.resolve(db, child.id, "key_generation")).organization_id == root.id
+        assert (await resolver.resolve(db, other.id, "key_generation")).required_approvals == 5
+        assert (await resolver.resolve(db, None, "key_generation")).organization_id is None
+        assert await resolver.resolve(db, child.id, "key_revocation") is None
+
+    @pytest.mark.asyncio
+    async def test_cached_until_invalidated(self, engine, session, orgs, count_queries):
+        """Test that repeat lookups skip the database until the type's policies change."""
+        db, _ = session
+        _, child, _, _ = orgs
+        resolver = QuorumPolicyResolver(max_entries=100, ttl=60)
+        await resolver.resolve(db, child.id, "key_generation")
+        await resolver.resolve(db, child.id, "key_revocation")
+        statements = count_queries(engine)
+
+        assert (await resolver.resolve(db, child.id, "key_generation")).required_approvals == 3
+        assert await resolver.resolve(db, child.id, "key_revocation") is None
+        assert statements == []
+
+        db.add(QuorumPolicy(organization_id=child.id, approval_type="key_generation",
+                            required_approvals=1, total_approvers=2))
+        await db.commit()
+        await resolver.invalidate("key_generation")
+        statements.clear()
+
+        assert (await resolver.resolve(db, child.id, "key_generation")).required_approvals == 1
+        assert statements
+        statements.clear()
+        # Other approval types stay cached
+        assert await resolver.resolve(db, child.id, "key_revocation") is None
+        assert statements == []
+
+    @pytest.mark.asyncio
+    async def test_create_request_uses_org_policy(self, session, orgs, monkeypatch):
+        """Test that a new request takes the policy of its organization's hierarchy."""
+        db, users = session
+        _, child, _, _ = orgs
+        monkeypatch.setattr(quorum, "quorum_policies", QuorumPolicyResolver(max_entries=100, ttl=60))
+
+        result = await quorum.create_approval_request(
+            quorum.ApprovalRequestCreate(
+                approval_type="key_generation", title="Key", entity_type="key",
+                entity_id=uuid.uuid4(), organization_id=child.id
+            ),
+            db=db, current_user=users[0]
+        )
+
+        assert (result.required_approvals, result.total_approvers) == (3, 5)
@@ -0,0 +1,122 @@
+"""
+KT Secure - Fair-Share Scheduler Tests
+"""
+import asyncio
+import pytest
+
+from app.core.scheduler import FairShareScheduler
+
+
+async def run(scheduler, org, slot, log, hold=0.01, interactive=True):
+    async with scheduler.slot(org, slot, interactive=interactive):
+        log.append(org)
+        await asyncio.sleep(hold)
+
+
+class TestQuotas:
+    """Concurrency and rate quotas."""
+
+    @pytest.mark.asyncio
+    async def test_org_concurrency_limit(self):
+        """Test that an org never exceeds its concurrency quota."""
+        scheduler = FairShareScheduler(org_max_concurrency=2, slot_max_concurrency=100)
+        peak = 0
+
+        async def op():
+            nonlocal peak
+            async with scheduler.slot("a", 0):
+                peak = max(peak, scheduler.stats()["organizations"]["a"]["in_flight"])
+                await asyncio.sleep(0.005)
+
+        await asyncio.gather(*(op() for _ in range(10)))
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_slot_concurrency_limit(self):
+        """Test that an HSM slot limit applies across orgs."""
+        scheduler = FairShareScheduler(org_max_concurrency=10, slot_max_concurrency=1)
+        peak = 0
+
+        async def op(org):
+            nonlocal peak
+            async with scheduler.slot(org, 7):
+                peak = max(peak, scheduler.stats()["hsm_slots"]["7"]["in_flight"])
+                await asyncio.sleep(0.005)
+
+        await asyncio.gather(*(op(org) for org in ["a", "b", "c"] * 3))
+        assert peak == 1
+
+    @pytest.mark.asyncio
+    async def test_rate_limit(self):
+        """Test that the token bucket spaces out grants beyond the burst."""
+        scheduler = FairShareScheduler(org_rate_per_second=100, org_burst=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(run(scheduler, "a", 0, [], hold=0) for _ in range(5)))
+
+        assert loop.time() - start >= 0.035
+
+
+class TestFairness:
+    """Weighted sharing between organizations."""
+
+    @pytest.mark.asyncio
+    async def test_flooding_org_does_not_starve_others(self):
+        """Test that a late org is served before the flooding org's backlog."""
+        scheduler = FairShareScheduler(org_max_concurrency=10, slot_max_concurrency=1)
+        log = []
+        flood = [asyncio.create_task(run(scheduler, "bulk", 0, log, hold=0.002)) for _ in range(20)]
+        await asyncio.sleep(0.005)
+        interactive = asyncio.create_task(run(scheduler, "other", 0, log, hold=0.002))
+        await asyncio.gather(*flood, interactive)
+
+        assert log.index("other") <= 5
+
+    @pytest.mark.asyncio
+    async def test_weights(self):
+        """Test that a weight-3 org gets about three grants per grant of a weight-1 org."""
+        scheduler = FairShareScheduler(
+            org_max_concurrency=10,
+            slot_max_concurrency=1,
+            org_overrides={"heavy": {"weight": 3}}
+        )
+        log = []
+        tasks = [
+            asyncio.create_task(run(scheduler, org, 0, log, hold=0.001))
+            for org in ["heavy", "light"] * 20
+        ]
+        await asyncio.gather(*tasks)
+
+        first = log[:16]
+        assert first.count("heavy") >= 3 * first.count("light") - 2
+
+    @pytest.mark.asyncio
+    async def test_interactive_before_bulk_within_org(self):
+        """Test that queued interactive requests overtake bulk ones of the same org."""
+        scheduler = FairShareScheduler(org_max_concurrency=1)
+        log = []
+        tasks = [asyncio.create_task(run(scheduler, "a", 0, log, interactive=False)) for _ in range(5)]
+        await asyncio.sleep(0)
+
+        async def interactive():
+            async with scheduler.slot("a", 0):
+                log.append("interactive")
+
+        task = asyncio.create_task(interactive())
+        await asyncio.gather(*tasks, task)
+        assert log.index("interactive") == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_is_removed(self):
+        """Test that cancelling a queued request frees its place."""
+        scheduler = FairShareScheduler(org_max_concurrency=1)
+        holder = asyncio.create_task(run(scheduler, "a", 0, [], hold=0.02))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(run(scheduler, "a", 0, []))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await holder
+
+        stats = scheduler.stats()["organizations"]["a"]
+        assert stats["queued"] == 0
+        assert stats["in_flight"] == 0
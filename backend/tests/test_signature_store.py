@@ -0,0 +1,150 @@
+"""
+KT Secure - Signature Store Tests
+"""
+import uuid
+import pytest
+import pytest_asyncio
+
+from app.core.signature_store import SignatureAddress, SignatureStore
+from app.core.signing_cache import CHANNEL
+from app.core.invalidation import bus
+from app.models import Organization, Pkcs11Key, SigningConfig, User
+from app.models.signing import SignatureRecord, SigningIdempotencyKey
+
+TABLES = (Organization, User, Pkcs11Key, SigningConfig, SignatureRecord, SigningIdempotencyKey)
+
+
+@pytest_asyncio.fixture
+async def session(sessions):
+    """Session on an in-memory database with only the store's tables."""
+    async with sessions() as db:
+        yield db
+
+
+def make_address(digest: str = "aa" * 32) -> SignatureAddress:
+    return SignatureAddress(digest, "SHA-256", uuid.uuid4(), "ab" * 20)
+
+
+class TestSignatureStore:
+    """Tests for content-addressed signature reuse."""
+
+    @pytest.mark.asyncio
+    async def test_stored_signature_is_reused(self, session):
+        """Test that a stored signature is found again, also after the LRU is cleared."""
+        store = SignatureStore(max_entries=10, max_age=60)
+        address = make_address()
+        store.add(session, address, uuid.uuid4(), "5151")
+        await store.commit(session)
+
+        assert await store.lookup(session, [address]) == {address: "5151"}
+        store.clear()
+        assert await store.lookup(session, [address]) == {address: "5151"}
+
+    @pytest.mark.asyncio
+    async def test_address_includes_key_fingerprint(self, session):
+        """Test that a signature is not reused after the config's key changes."""
+        store = SignatureStore(max_entries=10, max_age=60)
+        address = make_address()
+        store.add(session, address, uuid.uuid4(), "5151")
+        await store.commit(session)
+        store.clear()
+
+        rotated = address._replace(key_fingerprint="cd" * 20)
+        assert await store.lookup(session, [rotated]) == {}
+
+    @pytest.mark.asyncio
+    async def test_expired_records_are_ignored(self, session):
+        """Test that records older than max_age are signed again."""
+        store = SignatureStore(max_entries=10, max_age=0)
+        address = make_address()
+        store.add(session, address, uuid.uuid4(), "5151")
+        await store.commit(session)
+
+        assert await store.lookup(session, [address]) == {}
+
+    @pytest.mark.asyncio
+    async def test_duplicate_insert_is_dropped(self, session):
+        """Test that storing an address twice does not fail the request."""
+        address = make_address()
+        for _ in range(2):
+            store = SignatureStore(max_entries=10, max_age=60)
+            store.add(session, address, uuid.uuid4(), "5151")
+            await store.commit(session)
+
+        assert await store.lookup(session, [address]) == {address: "5151"}
+
+    @pytest.mark.asyncio
+    async def test_lost_race_keeps_other_staged_rows(self, session, sessions):
+        """Test that an address stored concurrently does not discard the rest of the commit."""
+        config_id = uuid.uuid4()
+        raced = make_address()._replace(config_id=config_id)
+        other = make_address("bb" * 32)._replace(config_id=config_id)
+        winner = SignatureStore(max_entries=10, max_age=60)
+        async with sessions() as db:
+            winner.add(db, raced, uuid.uuid4(), "5151")
+            await winner.commit(db)
+
+        store = SignatureStore(max_entries=10, max_age=60)
+        assert await store.claim_idempotency_keys(session, config_id, {"build-1": other.digest}) == set()
+        store.add(session, raced, uuid.uuid4(), "5252")
+        store.add(session, other, uuid.uuid4(), "5353")
+        await store.commit(session)
+
+        fresh = SignatureStore(max_entries=10, max_age=60)
+        assert await fresh.lookup(session, [raced, other]) == {raced: "5151", other: "5353"}
+        assert await fresh.claim_idempotency_keys(session, config_id, {"build-1": "cc"}) == {"build-1"}
+
+    @pytest.mark.asyncio
+    async def test_cached_only_after_commit(self, session):
+        """Test that a staged signature is not served from the LRU until it is committed."""
+        store = SignatureStore(max_entries=10, max_age=60)
+        address = make_address()
+        store.add(session, address, uuid.uuid4(), "5151")
+        await session.rollback()
+
+        assert store.stats()["cache"]["entries"] == 0
+        assert await store.lookup(session, [address]) == {}
+
+    @pytest.mark.asyncio
+    async def test_key_revocation_drops_cached_signatures(self, session):
+        """Test that a revoked key's signatures leave the LRU."""
+        store = SignatureStore(max_entries=10, max_age=60)
+        key_id = uuid.uuid4()
+        store.add(session, make_address(), key_id, "5151")
+        await store.commit(session)
+        assert store.stats()["cache"]["entries"] == 1
+
+        await bus.publish(CHANNEL, {"key_id": str(key_id)})
+        assert store.stats()["cache"]["entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_idempotency_key_conflict(self, session):
+        """Test that an idempotency key is bound to its first digest."""
+        store = SignatureStore(max_entries=10, max_age=60)
+        config_id = uuid.uuid4()
+
+        assert await store.claim_idempotency_keys(session, config_id, {"build-1": "aa"}) == set()
+        await store.commit(session)
+
+        assert await store.claim_idempotency_keys(session, config_id, {"build-1": "aa"}) == set()
+        assert await store.claim_idempotency_keys(session, config_id, {"build-1": "bb"}) == {"build-1"}
+        assert await store.claim_idempotency_keys(session, uuid.uuid4(), {"build-1": "bb"}) == set()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_claims_conflict(self, sessions):
+        """Test that of two uncommitted claims of one key for different digests, the second conflicts."""
+        store = SignatureStore(max_entries=10, max_age=60)
+        config_id = uuid.uuid4()
+        async with sessions() as first, sessions() as second:
+            assert await store.claim_idempotency_keys(first, config_id, {"build-1": "aa"}) == set()
+            assert await store.claim_idempotency_keys(second, config_id, {"build-1": "bb"}) == {"build-1"}
+
+    @pytest.mark.asyncio
+    async def test_disabled_store_never_reuses(self, session):
+        """Test that SIGNATURE_REUSE_ENABLED=false turns lookups off."""
+        store = SignatureStore(max_entries=10, max_age=60, enabled=False)
+        address = make_address()
+        store.add(session, address, uuid.uuid4(), "5151")
+        await store.commit(session)
+
+        assert await store.lookup(session, [address]) == {}
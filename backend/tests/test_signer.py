@@ -0,0 +1,144 @@
+"""
+KT Secure - Signer Backend Tests
+"""
+import hashlib
+import os
+from types import SimpleNamespace
+import pytest
+
+from app.core.hsm import FakeHsmBackend, HsmSessionPool
+from app.core.signer import HsmSigner, MockSigner, SignerError, SoftwareSigner, key_params
+
+
+def make_key(algorithm, fingerprint, key_size=None, curve=None, hsm_slot=0):
+    return SimpleNamespace(
+        algorithm=algorithm,
+        key_size=key_size,
+        curve=curve,
+        fingerprint=fingerprint,
+        hsm_slot=hsm_slot
+    )
+
+
+class TestKeyParams:
+    """Tests for key parameter normalisation."""
+
+    def test_split_and_combined_names(self):
+        """Test that RSA/ECDSA names are accepted in both forms."""
+        assert key_params("RSA", 4096) == ("RSA", 4096, None)
+        assert key_params("RSA-3072") == ("RSA", 3072, None)
+        assert key_params("ECDSA", curve="P-384") == ("EC", None, "P-384")
+        assert key_params("ECDSA-P256") == ("EC", None, "P-256")
+
+    def test_unknown_algorithm(self):
+        """Test that unsupported algorithms raise SignerError."""
+        with pytest.raises(SignerError):
+            key_params("DSA")
+
+
+class TestSoftwareSigner:
+    """Tests for the process-pool software signer."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("algorithm,hash_algorithm", [
+        ("RSA-2048", "SHA-256"),
+        ("ECDSA-P256", "SHA-256"),
+        ("ECDSA-P384", "SHA-384"),
+    ])
+    async def test_sign_and_verify(self, tmp_path, algorithm, hash_algorithm):
+        """Test that signatures verify and tampered digests do not."""
+        signer = SoftwareSigner(str(tmp_path), max_workers=1)
+        try:
+            fingerprint = await signer.generate_key(algorithm, None, None, 0)
+            key = make_key(algorithm, fingerprint)
+            digest = hashlib.new(hash_algorithm.replace("-", "").lower(), b"firmware").digest()
+
+            signature = await signer.sign_digest(key, digest, hash_algorithm)
+
+            assert await signer.verify_digest(key, digest, signature, hash_algorithm)
+            assert not await signer.verify_digest(key, bytes(len(digest)), signature, hash_algorithm)
+        finally:
+            await signer.close()
+
+    @pytest.mark.asyncio
+    async def test_verify_many_in_chunks(self, tmp_path):
+        """Test that batch verification keeps item order across chunks."""
+        signer = SoftwareSigner(str(tmp_path), max_workers=2)
+        signer.VERIFY_CHUNK_SIZE = 3
+        try:
+            fingerprint = await signer.generate_key("ECDSA-P256", None, None, 0)
+            key = make_key("ECDSA-P256", fingerprint)
+            items = []
+            for i in range(8):
+                digest = hashlib.sha256(b"bundle%d" % i).digest()
+                signature = await signer.sign_digest(key, digest, "SHA-256")
+                items.append((digest if i % 3 else bytes(32), signature))
+
+            assert await signer.verify_digests(key, items, "SHA-256") == [i % 3 != 0 for i in range(8)]
+        finally:
+            await signer.close()
+
+    @pytest.mark.asyncio
+    async def test_missing_key_material(self, tmp_path):
+        """Test that signing with an unknown fingerprint raises SignerError."""
+        signer = SoftwareSigner(str(tmp_path), max_workers=1)
+        try:
+            with pytest.raises(SignerError):
+                await signer.sign_digest(make_key("RSA", "00" * 20), bytes(32), "SHA-256")
+        finally:
+            await signer.close()
+
+
+    @pytest.mark.asyncio
+    async def test_invalid_digest_raises_signer_error(self, tmp_path):
+        """Test that cryptography's ValueError for a wrong-length digest becomes SignerError."""
+        signer = SoftwareSigner(str(tmp_path), max_workers=1)
+        try:
+            key = make_key("ECDSA-P256", await signer.generate_key("ECDSA-P256", None, None, 0))
+            with pytest.raises(SignerError):
+                await signer.sign_digest(key, bytes(20), "SHA-256")
+        finally:
+            await signer.close()
+
+    @pytest.mark.asyncio
+    async def test_pool_is_replaced_after_worker_dies(self, tmp_path):
+        """Test that a dead worker raises SignerError and the next call gets a fresh pool."""
+        signer = SoftwareSigner(str(tmp_path), max_workers=1)
+        try:
+            key = make_key("ECDSA-P256", await signer.generate_key("ECDSA-P256", None, None, 0))
+            with pytest.raises(SignerError):
+                await signer._run(os._exit, 1)
+
+            digest = hashlib.sha256(b"after crash").digest()
+            signature = await signer.sign_digest(key, digest, "SHA-256")
+            assert await signer.verify_digest(key, digest, signature, "SHA-256")
+        finally:
+            await signer.close()
+
+
+class TestOtherSigners:
+    """Tests for the mock and HSM signers."""
+
+    @pytest.mark.asyncio
+    async def test_mock_signer_round_trip(self):
+        """Test that the mock signer verifies its own signatures."""
+        signer = MockSigner()
+        key = make_key("RSA", "ab" * 20)
+        signature = await signer.sign_digest(key, bytes(32), "SHA-256")
+
+        assert await signer.verify_digest(key, bytes(32), signature, "SHA-256")
+        assert not await signer.verify_digest(key, bytes(32), b"x" * 32, "SHA-256")
+
+    @pytest.mark.asyncio
+    async def test_hsm_signer_uses_pool(self):
+        """Test that the HSM signer generates, signs and verifies through the pool."""
+        pool = HsmSessionPool(FakeHsmBackend(), "1234")
+        signer = HsmSigner(pool)
+        fingerprint = await signer.generate_key("RSA", 2048, None, 3)
+        key = make_key("RSA", fingerprint, hsm_slot=3)
+
+        signature = await signer.sign_digest(key, bytes(32), "SHA-256")
+
+        assert await signer.verify_digest(key, bytes(32), signature, "SHA-256")
+        assert pool.stats()[3]["idle"] == 1
+        await pool.close()
@@ -0,0 +1,399 @@
+"""
+KT Secure - Signing API Tests
+"""
+import base64
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException, Request
+
+from app.api import signing
+from app.api.signing import (
+    BatchSignRequest,
+    DigestSignRequest,
+    ManifestFile,
+    ManifestProofVerifyRequest,
+    ManifestSignRequest,
+    SignRequest,
+    VerifyBatchItem,
+    VerifyBatchRequest,
+)
+from app.core.signer import MockSigner
+from app.core.signing_cache import signing_targets
+from app.models import Organization, Pkcs11Key, SigningConfig, User
+from app.models.signing import SignatureRecord, SigningIdempotencyKey, SigningJob, SigningJobStatus
+
+TABLES = (Organization, User, Pkcs11Key, SigningConfig, SignatureRecord, SigningIdempotencyKey, SigningJob)
+
+
+class CountingSigner(MockSigner):
+    """Mock signer that records the digests it signs and verifies."""
+
+    def __init__(self):
+        self.signed = []
+        self.verified = []
+
+    async def sign_digest(self, key, digest, hash_algorithm):
+        self.signed.append(digest)
+        return await super().sign_digest(key, digest, hash_algorithm)
+
+    async def verify_digest(self, key, digest, signature, hash_algorithm):
+        self.verified.append(digest)
+        return await super().verify_digest(key, digest, signature, hash_algorithm)
+
+
+def encode(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def stream_request(chunks, content_type: str = "application/octet-stream") -> Request:
+    """A PUT request whose body arrives as the given chunks."""
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return messages.pop(0)
+
+    return Request({
+        "type": "http",
+        "method": "PUT",
+        "path": "/api/signing/sign/stream",
+        "query_string": b"",
+        "headers": [(b"content-type", content_type.encode())],
+    }, receive)
+
+
+@pytest_asyncio.fixture
+async def session(sessions):
+    async with sessions() as db:
+        yield db
+
+
+@pytest.fixture
+def signer(monkeypatch):
+    signer = CountingSigner()
+    monkeypatch.setattr(signing, "get_signer", lambda: signer)
+    return signer
+
+
+@pytest_asyncio.fixture
+async def config(session):
+    """An enabled SHA-256 config on an active ECDSA key."""
+    org = Organization(name="Acme", slug=f"acme-{uuid.uuid4().hex[:8]}")
+    session.add(org)
+    await session.flush()
+    key = Pkcs11Key(
+        name="release", algorithm="ECDSA", curve="P-256", fingerprint=uuid.uuid4().hex,
+        hsm_slot=0, organization_id=org.id
+    )
+    session.add(key)
+    await session.flush()
+    config = SigningConfig(name="release", key_id=key.id, hash_algorithm="SHA-256", organization_id=org.id)
+    session.add(config)
+    await session.commit()
+    return config
+
+
+class TestSignBatch:
+    """Tests for POST /sign/batch."""
+
+    @pytest.mark.asyncio
+    async def test_mixed_valid_and_invalid_items(self, session, signer, config):
+        """Test that bad items fail on their own and the rest are signed."""
+        response = await signing.sign_batch(BatchSignRequest(items=[
+            SignRequest(config_id=config.id, data=encode(b"firmware")),
+            SignRequest(config_id=config.id, data="not base64!"),
+            SignRequest(config_id=uuid.uuid4(), data=encode(b"firmware")),
+        ]), db=session)
+
+        ok, bad_data, unknown_config = response.results
+        assert ok.signature and ok.error is None
+        assert bad_data.error == "Invalid base64 data"
+        assert unknown_config.error == "Signing config not found"
+        assert (response.succeeded, response.failed) == (1, 2)
+
+    @pytest.mark.asyncio
+    async def test_duplicate_digests_signed_once(self, session, signer, config):
+        """Test that identical payloads in one batch share a single signer call."""
+        response = await signing.sign_batch(BatchSignRequest(items=[
+            SignRequest(config_id=config.id, data=encode(b"bootloader")) for _ in range(3)
+        ]), db=session)
+
+        assert len(signer.signed) == 1
+        assert len({result.signature for result in response.results}) == 1
+        assert response.succeeded == 3
+
+    @pytest.mark.asyncio
+    async def test_idempotency_conflict_within_batch(self, session, signer, config):
+        """Test that reusing an idempotency key for a different payload fails only that item."""
+        response = await signing.sign_batch(BatchSignRequest(items=[
+            SignRequest(config_id=config.id, data=encode(b"v1"), idempotency_key="build-7"),
+            SignRequest(config_id=config.id, data=encode(b"v2"), idempotency_key="build-7"),
+        ]), db=session)
+
+        first, second = response.results
+        assert first.signature and first.error is None
+        assert second.error == signing.IDEMPOTENCY_CONFLICT
+        assert (response.succeeded, response.failed) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_sign_rejects_invalid_base64(self, session, signer, config):
+        """Test that /sign answers malformed payloads with 400 instead of 500."""
+        with pytest.raises(HTTPException) as error:
+            await signing.sign_data(SignRequest(config_id=config.id, data="%%%"), db=session)
+        assert error.value.status_code == 400
+
+
+class TestSignStream:
+    """Tests for PUT /sign/stream."""
+
+    @pytest.mark.asyncio
+    async def test_chunked_body_is_hashed_whole(self, session, signer, config):
+        """Test that the digest covers every chunk of the body in order."""
+        chunks = [b"\x7fELF", b"\x00" * 65536, b"tail"]
+        response = await signing.sign_stream(config.id, stream_request(chunks), db=session)
+
+        assert signer.signed == [hashlib.sha256(b"".join(chunks)).digest()]
+        assert response.signature and not response.reused
+
+    @pytest.mark.asyncio
+    async def test_empty_body(self, session, signer, config):
+        """Test that an empty body signs the digest of zero bytes."""
+        response = await signing.sign_stream(config.id, stream_request([]), db=session)
+
+        assert signer.signed == [hashlib.sha256(b"").digest()]
+        assert response.signature
+
+    @pytest.mark.asyncio
+    async def test_matches_sign_endpoint(self, session, signer, config):
+        """Test that streaming and /sign produce the same signature for the same bytes."""
+        streamed = await signing.sign_stream(config.id, stream_request([b"app", b"image"]), db=session)
+        posted = await signing.sign_data(SignRequest(config_id=config.id, data=encode(b"appimage")), db=session)
+
+        assert posted.signature == streamed.signature
+        assert posted.reused
+
+    @pytest.mark.asyncio
+    async def test_rejects_other_content_types(self, session, signer, config):
+        """Test that only application/octet-stream bodies are accepted."""
+        with pytest.raises(HTTPException) as error:
+            await signing.sign_stream(config.id, stream_request([b"{}"], "application/json"), db=session)
+        assert error.value.status_code == 415
+
+
+class TestSignDigest:
+    """Tests for POST /sign/digest."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("digest,detail", [
+        ("ab" * 20, "SHA-256 digest must be 32 bytes, got 20"),
+        ("zz" * 32, "Digest must be hex encoded"),
+    ])
+    async def test_rejects_malformed_digests(self, session, signer, config, digest, detail):
+        """Test that wrong-length and non-hex digests get 400 without reaching the signer."""
+        with pytest.raises(HTTPException) as error:
+            await signing.sign_digest(
+                DigestSignRequest(config_id=config.id, digest=digest, hash_algorithm="SHA-256"), db=session
+            )
+        assert (error.value.status_code, error.value.detail) == (400, detail)
+        assert signer.signed == []
+
+    @pytest.mark.asyncio
+    async def test_rejects_other_hash_algorithms(self, session, signer, config):
+        """Test that the digest must use the config's hash algorithm."""
+        with pytest.raises(HTTPException) as error:
+            await signing.sign_digest(
+                DigestSignRequest(config_id=config.id, digest="ab" * 48, hash_algorithm="SHA-384"), db=session
+            )
+        assert error.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_matches_payload_signing(self, session, signer, config):
+        """Test that signing a client-side digest equals signing the payload it was computed from."""
+        digest = hashlib.sha256(b"ecu-update").hexdigest()
+        remote = await signing.sign_digest(
+            DigestSignRequest(config_id=config.id, digest=digest, hash_algorithm="sha-256"), db=session
+        )
+        posted = await signing.sign_data(SignRequest(config_id=config.id, data=encode(b"ecu-update")), db=session)
+
+        assert posted.signature == remote.signature
+        assert signer.signed == [bytes.fromhex(digest)]
+
+
+class TestSigningJobs:
+    """Tests for the /jobs worker: failures, attempt limits and fencing."""
+
+    @pytest.fixture
+    def notified(self, monkeypatch, sessions):
+        notified = []
+
+        async def notify(job_id, status, error=None, organization_id=None):
+            notified.append((job_id, status, error))
+
+        monkeypatch.setattr(signing, "AsyncSessionLocal", sessions)
+        monkeypatch.setattr(signing, "notify_signing_job", notify)
+        return notified
+
+    async def add_job(self, session, config, **values) -> SigningJob:
+        job = SigningJob(
+            config_id=config.id, digest=hashlib.sha256(b"job").hexdigest(), hash_algorithm="SHA-256", **values
+        )
+        session.add(job)
+        await session.commit()
+        return job
+
+    @pytest.mark.asyncio
+    async def test_completed_job(self, session, signer, config, notified):
+        """Test that a queued job is signed and reported once."""
+        job = await self.add_job(session, config)
+        await signing._process_signing_job(job.id)
+
+        await session.refresh(job)
+        assert job.status == SigningJobStatus.COMPLETED.value
+        assert job.signature and job.attempts == 1
+        assert notified == [(str(job.id), "completed", None)]
+
+    @pytest.mark.asyncio
+    async def test_unexpected_signer_error_fails_job(self, session, signer, config, notified, monkeypatch):
+        """Test that an error other than HTTPException marks the job failed instead of leaving it running."""
+        async def broken(key, digest, hash_algorithm):
+            raise ValueError("bad key")
+
+        monkeypatch.setattr(signer, "sign_digest", broken)
+        job = await self.add_job(session, config)
+        await signing._process_signing_job(job.id)
+
+        await session.refresh(job)
+        assert (job.status, job.error) == (SigningJobStatus.FAILED.value, "bad key")
+        assert notified == [(str(job.id), "failed", "bad key")]
+
+    @pytest.mark.asyncio
+    async def test_requeued_run_cannot_finish(self, session, sessions, signer, config, notified, monkeypatch):
+        """Test that a run whose job was requeued and claimed again does not write its result."""
+        job = await self.add_job(session, config)
+
+        async def slow(key, digest, hash_algorithm):
+            # Meanwhile the job was found stale, requeued and claimed by another worker
+            async with sessions() as db:
+                stolen = await db.get(SigningJob, job.id)
+                stolen.attempts += 1
+                await db.commit()
+            return b"late"
+
+        monkeypatch.setattr(signer, "sign_digest", slow)
+        await signing._process_signing_job(job.id)
+
+        await session.refresh(job)
+        assert (job.status, job.attempts, job.signature) == (SigningJobStatus.RUNNING.value, 2, None)
+        assert notified == []
+
+    @pytest.mark.asyncio
+    async def test_recover_fails_jobs_out_of_attempts(self, session, config, notified, monkeypatch):
+        """Test that stale jobs are requeued until SIGNING_JOB_MAX_ATTEMPTS, then failed."""
+        monkeypatch.setattr(signing.settings, "SIGNING_JOB_MAX_ATTEMPTS", 3)
+        stale = datetime.utcnow() - timedelta(hours=1)
+        retry = await self.add_job(session, config, status=SigningJobStatus.RUNNING.value, attempts=2, started_at=stale)
+        exhausted = await self.add_job(session, config, status=SigningJobStatus.RUNNING.value, attempts=3, started_at=stale)
+
+        assert await signing._recover_signing_jobs() == [retry.id]
+
+        await session.refresh(retry)
+        await session.refresh(exhausted)
+        assert retry.status == SigningJobStatus.QUEUED.value
+        assert exhausted.status == SigningJobStatus.FAILED.value
+        assert notified == [(str(exhausted.id), "failed", "Gave up after 3 attempts")]
+
+
+class TestVerifyBatch:
+    """Tests for POST /verify/batch."""
+
+    async def signed(self, session, config, data: bytes) -> str:
+        response = await signing.sign_data(SignRequest(config_id=config.id, data=encode(data)), db=session)
+        return response.signature
+
+    @pytest.mark.asyncio
+    async def test_mixed_items(self, session, signer, config):
+        """Test that valid, invalid, unknown-key and malformed items are reported one by one."""
+        signature = await self.signed(session, config, b"firmware")
+        response = await signing.verify_batch(VerifyBatchRequest(items=[
+            VerifyBatchItem(key_id=config.key_id, signature=signature, data=encode(b"firmware")),
+            VerifyBatchItem(key_id=config.key_id, signature=signature, data=encode(b"tampered")),
+            VerifyBatchItem(key_id=uuid.uuid4(), signature=signature, data=encode(b"firmware")),
+            VerifyBatchItem(key_id=config.key_id, signature=signature, data="%%%"),
+        ]), db=session)
+
+        valid, invalid, unknown_key, malformed = response.results
+        assert valid.valid and valid.key_status == "active"
+        assert not invalid.valid and invalid.error is None
+        assert unknown_key.error == "Key not found"
+        assert malformed.error == "Invalid base64 data"
+        assert (response.valid, response.invalid, response.failed) == (1, 1, 2)
+
+    @pytest.mark.asyncio
+    async def test_revocation_drops_cached_result(self, session, signer, config):
+        """Test that a cached verification is not served after the key is revoked."""
+        signature = await self.signed(session, config, b"release")
+        request = VerifyBatchRequest(items=[
+            VerifyBatchItem(key_id=config.key_id, signature=signature, data=encode(b"release"))
+        ])
+        await signing.verify_batch(request, db=session)
+        await signing.verify_batch(request, db=session)
+        assert len(signer.verified) == 1
+
+        key = await session.get(Pkcs11Key, config.key_id)
+        key.status = "revoked"
+        await session.commit()
+        await signing_targets.invalidate_key(key.id)
+
+        response = await signing.verify_batch(request, db=session)
+        assert len(signer.verified) == 2
+        assert response.results[0].key_status == "revoked"
+
+
+class TestManifestSigning:
+    """Tests for POST /sign/manifest and /verify/manifest-proof."""
+
+    async def sign_manifest(self, session, config, count: int = 5):
+        files = [
+            ManifestFile(name=f"ecu{i}.bin", digest=hashlib.sha256(b"image %d" % i).hexdigest())
+            for i in range(count)
+        ]
+        return await signing.sign_manifest(
+            ManifestSignRequest(config_id=config.id, hash_algorithm="SHA-256", files=files), db=session
+        )
+
+    def proof_request(self, config, manifest, index: int, **overrides) -> ManifestProofVerifyRequest:
+        file = manifest.files[index]
+        return ManifestProofVerifyRequest(**{
+            "key_id": config.key_id,
+            "digest": file.digest,
+            "proof": file.proof,
+            "root": manifest.root,
+            "signature": manifest.signature,
+            **overrides
+        })
+
+    @pytest.mark.asyncio
+    async def test_file_verifies_against_signed_root(self, session, signer, config):
+        """Test that one file of a signed manifest verifies with its proof and the root signature."""
+        manifest = await self.sign_manifest(session, config)
+
+        assert signer.signed == [bytes.fromhex(manifest.root)]
+        assert [file.index for file in manifest.files] == list(range(5))
+        result = await signing.verify_manifest_proof(self.proof_request(config, manifest, 3), db=session)
+        assert result == {"valid": True}
+
+    @pytest.mark.asyncio
+    async def test_tampered_proof_is_rejected(self, session, signer, config):
+        """Test that a proof for another file, or with a changed sibling, does not verify."""
+        manifest = await self.sign_manifest(session, config)
+        proof = [step.model_copy() for step in manifest.files[3].proof]
+        proof[0].hash = "00" * 32
+
+        tampered = self.proof_request(config, manifest, 3, proof=proof)
+        swapped = self.proof_request(config, manifest, 3, digest=manifest.files[2].digest)
+        assert await signing.verify_manifest_proof(tampered, db=session) == {"valid": False}
+        assert await signing.verify_manifest_proof(swapped, db=session) == {"valid": False}
+        assert signer.verified == []
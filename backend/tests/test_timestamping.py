@@ -0,0 +1,164 @@
+"""
+KT Secure - Timestamping Tests
+"""
+import asyncio
+import hashlib
+import httpx
+import pytest
+
+from app.core.timestamping import (
+    HttpTimestampAuthority,
+    StubTimestampAuthority,
+    TimestampError,
+    SIGNED_DATA_OID,
+    TimestampService,
+    _der,
+    _der_int,
+    check_timestamp_token,
+    decode_timestamp_response,
+    encode_timestamp_request,
+)
+from app.utils.merkle import root_from_proof
+
+
+def covers(signature: bytes, stamp) -> bool:
+    """Check a proof links a signature to the root inside the token."""
+    root = root_from_proof(hashlib.sha256(signature).digest(), stamp.proof, "sha256")
+    return root == stamp.root and stamp.root in stamp.token
+
+
+class TestTimestampService:
+    """Tests for batched RFC 3161 timestamping."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_signatures_share_one_token(self):
+        """Test that a window of signatures costs one TSA request."""
+        service = TimestampService(mode="merkle", window=0.01, allow_stub=True)
+        signatures = [b"sig-%d" % i for i in range(25)]
+
+        stamps = await asyncio.gather(*(service.timestamp("stub", sig) for sig in signatures))
+
+        assert service.authority("stub").requests == 1
+        assert all(stamp.batch_size == 25 for stamp in stamps)
+        assert all(covers(sig, stamp) for sig, stamp in zip(signatures, stamps))
+        assert service.stats()["avg_batch_size"] == 25
+        await service.close()
+
+    @pytest.mark.asyncio
+    async def test_full_window_flushes_early(self):
+        """Test that max_batch splits a burst into several tokens."""
+        service = TimestampService(mode="merkle", window=10, max_batch=4, allow_stub=True)
+
+        stamps = await asyncio.wait_for(
+            asyncio.gather(*(service.timestamp("stub", b"%d" % i) for i in range(8))), 1
+        )
+
+        assert service.authority("stub").requests == 2
+        assert {stamp.batch_size for stamp in stamps} == {4}
+        await service.close()
+
+    @pytest.mark.asyncio
+    async def test_individual_mode(self):
+        """Test that individual mode timestamps each signature on its own."""
+        service = TimestampService(mode="individual", allow_stub=True)
+
+        stamps = await asyncio.gather(*(service.timestamp("stub", b"%d" % i) for i in range(3)))
+
+        assert service.stats()["tsa_requests"] == 3
+        assert all(covers(b"%d" % i, stamp) for i, stamp in enumerate(stamps))
+        await service.close()
+
+    @pytest.mark.asyncio
+    async def test_unexpected_batch_error_is_not_a_tsa_error(self):
+        """Test that a bug in a batch reaches every waiting caller as itself."""
+        service = TimestampService(mode="merkle", window=0.01, allow_stub=True)
+
+        async def broken(digest):
+            raise RuntimeError("bug")
+
+        service.authority("stub").timestamp = broken
+        results = await asyncio.wait_for(asyncio.gather(
+            *(service.timestamp("stub", b"%d" % i) for i in range(3)), return_exceptions=True
+        ), 1)
+
+        assert all(type(result) is RuntimeError for result in results)
+        await service.close()
+
+    @pytest.mark.asyncio
+    async def test_stub_disabled_by_default(self):
+        """Test that the unsigned stub TSA must be enabled explicitly."""
+        service = TimestampService()
+        with pytest.raises(TimestampError):
+            await service.timestamp("stub", b"sig")
+        await service.close()
+
+
+class TestHttpTimestampAuthority:
+    """Tests for the RFC 3161 HTTP client against the stub TSA."""
+
+    @pytest.mark.asyncio
+    async def test_round_trip_over_http(self):
+        """Test that a request and response survive the DER encoding."""
+        stub = StubTimestampAuthority()
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=stub.handle(request.content)))
+        async with httpx.AsyncClient(transport=transport) as client:
+            token = await HttpTimestampAuthority("http://tsa.test", client).timestamp(bytes(32))
+
+        assert stub.requests == 1
+        assert bytes(32) in token
+
+    @pytest.mark.asyncio
+    async def test_http_error(self):
+        """Test that TSA failures surface as TimestampError."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(503))
+        async with httpx.AsyncClient(transport=transport) as client:
+            with pytest.raises(TimestampError):
+                await HttpTimestampAuthority("http://tsa.test", client).timestamp(bytes(32))
+
+    def test_rejected_status(self):
+        """Test that a rejection status raises instead of returning a token."""
+        rejection = bytes.fromhex("30053003020102")
+
+        with pytest.raises(TimestampError):
+            decode_timestamp_response(rejection)
+
+    def test_large_nonce_encoding(self):
+        """Test that a stub response carries the token after the status."""
+        response = StubTimestampAuthority().handle(encode_timestamp_request(bytes(32), 2 ** 62 + 5))
+
+        assert decode_timestamp_response(response).startswith(b"\x30")
+
+
+class TestTokenChecks:
+    """Tests that a token must answer the request it was returned for."""
+
+    def reply_with(self, response: bytes) -> httpx.MockTransport:
+        return httpx.MockTransport(lambda request: httpx.Response(200, content=response))
+
+    @pytest.mark.asyncio
+    async def test_token_for_other_digest_is_rejected(self):
+        """Test that a TSA answering for a different digest is not trusted."""
+        other = StubTimestampAuthority().handle(encode_timestamp_request(b"\x01" * 32, 7))
+        async with httpx.AsyncClient(transport=self.reply_with(other)) as client:
+            with pytest.raises(TimestampError, match="different digest"):
+                await HttpTimestampAuthority("http://tsa.test", client).timestamp(bytes(32))
+
+    @pytest.mark.asyncio
+    async def test_replayed_nonce_is_rejected(self):
+        """Test that a token for the right digest but another request's nonce is not trusted."""
+        replayed = StubTimestampAuthority().handle(encode_timestamp_request(bytes(32), 7))
+        async with httpx.AsyncClient(transport=self.reply_with(replayed)) as client:
+            with pytest.raises(TimestampError, match="nonce"):
+                await HttpTimestampAuthority("http://tsa.test", client).timestamp(bytes(32))
+
+    def test_signed_data_token(self):
+        """Test that the TSTInfo is found inside a CMS SignedData, as real TSAs send it."""
+        stub_token = decode_timestamp_response(
+            StubTimestampAuthority().handle(encode_timestamp_request(bytes(32), 2 ** 40))
+        )
+        signed_data = _der(0x30, _der_int(3) + _der(0x31, b"") + stub_token + _der(0x31, b""))
+        token = _der(0x30, SIGNED_DATA_OID + _der(0xA0, signed_data))
+
+        check_timestamp_token(token, bytes(32), 2 ** 40)
+        with pytest.raises(TimestampError):
+            check_timestamp_token(token, bytes(32), 2 ** 40 + 1)